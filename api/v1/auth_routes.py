@@ -0,0 +1,76 @@
+import uuid
+from datetime import timedelta
+from typing import Dict, Union
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.schemas import *
+from core.utility.auth import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, decode_access_token, verified_tokens
+from core.utility.responses import ORJSONResponse
+from db.connection import get_db
+from db.models.user import User, get_user_by_email, get_user_by_phone_number, get_users_by_ids, verify_user_password
+
+
+auth_router = APIRouter()
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+async def get_current_user(credentials: Union[HTTPAuthorizationCredentials, None] = Depends(bearer_scheme),
+                           db: AsyncSession = Depends(get_db)) -> Dict:
+    """
+    Dependency resolving the request's bearer token to its user, in the shape of RetrieveUser. Tokens
+    seen before are answered from the verified token cache without checking the signature or reading
+    the user again.
+    """
+    if credentials is None:
+        raise _unauthorized("Not authenticated")
+    token = credentials.credentials
+    user = verified_tokens.get(token)
+    if user is not None:
+        return user
+
+    try:
+        claims = decode_access_token(token)
+        user_id = uuid.UUID(claims["sub"])
+    except (JWTError, ValueError):
+        raise _unauthorized("Invalid or expired token")
+    user = (await get_users_by_ids(db, [user_id])).get(user_id)
+    if user is None:
+        raise _unauthorized("Invalid or expired token")
+    verified_tokens.store(token, user_id, user, claims["exp"])
+    return user
+
+
+async def _issue_token(user: Union[User, None], password: str) -> Dict:
+    # A wrong password and an unknown login get the same answer
+    if not await verify_user_password(user, password):
+        raise _unauthorized("Incorrect login or password")
+    expires_delta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    return {
+        "access_token": create_access_token({"sub": str(user.id)}, expires_delta),
+        "token_type": "bearer",
+        "expires_in": int(expires_delta.total_seconds()),
+    }
+
+
+@auth_router.post("/auth/login/email", response_model=AccessToken)
+async def login_with_email(login: UserLoginWithEmail, db: AsyncSession = Depends(get_db)):
+    user = await get_user_by_email(db, login.email)
+    return ORJSONResponse(await _issue_token(user, login.password))
+
+
+@auth_router.post("/auth/login/phone", response_model=AccessToken)
+async def login_with_phone(login: UserLoginWithPhone, db: AsyncSession = Depends(get_db)):
+    user = await get_user_by_phone_number(db, login.phone_number)
+    return ORJSONResponse(await _issue_token(user, login.password))
+
+
+@auth_router.get("/auth/me", response_model=RetrieveUser)
+async def read_current_user(user: Dict = Depends(get_current_user)):
+    return ORJSONResponse(user)
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+
+from core import settings
+from core.schemas import *
+from core.utility.compression import negotiate_encoding
+from core.utility.conditional import etag_matches, not_modified, strong_etag, with_validators
+from db.catalog_snapshot import catalog_snapshot
+
+
+catalog_router = APIRouter()
+
+
+@catalog_router.get("/catalog/snapshot", response_model=CatalogSnapshot)
+async def read_catalog_snapshot(request: Request):
+    """ Every category and exercise, served from the in-process snapshot in the best encoding the client accepts """
+    blob = await catalog_snapshot.current()
+    if blob is None:
+        raise HTTPException(status_code=503, detail="Catalog snapshot is not available yet")
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), blob.bodies)
+    # Each content coding is its own representation, so it gets its own strong ETag
+    etag = strong_etag("catalog", *blob.versions.values(), encoding)
+    if etag_matches(request, etag):
+        response = not_modified(etag, settings.CATALOG_SNAPSHOT_CACHE_CONTROL)
+    else:
+        response = Response(blob.bodies[encoding], media_type="application/json")
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        with_validators(response, etag, settings.CATALOG_SNAPSHOT_CACHE_CONTROL)
+    response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+
+@catalog_router.get("/catalog/snapshot/stats", response_model=Dict[str, Union[int, float]])
+async def read_catalog_snapshot_stats():
+    return catalog_snapshot.stats()
@@ -1,11 +1,16 @@
 from typing import Union
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core import settings
 from core.schemas import *
+from core.utility.bulk_import import parse_bulk_payload, validate_bulk_rows
+from core.utility.conditional import etag_matches, not_modified, strong_etag, with_validators
+from core.utility.responses import ORJSONResponse
 from db.connection import get_db
 from db.models.user import create_user, get_user
-from db.models.category import create_category, get_category_by_id, get_all_categories
+from db.models.category import Category, create_category, get_category_by_id, get_all_categories, category_cache, \
+    bulk_create_categories
 from db.models.exercise import create_exercise, get_exercise
 
 category_router = APIRouter()
@@ -16,17 +21,42 @@ async def create_new_category(category: CreateUpdateCategory, db: AsyncSession =
     return await create_category(db, category)
 
 
+@category_router.post("/categories/bulk", response_model=BulkImportResult)
+async def bulk_import_categories(request: Request,
+                                 batch_size: int = Query(settings.BULK_IMPORT_BATCH_SIZE, ge=1, le=10000,
+                                                        description="rows per INSERT"),
+                                 db: AsyncSession = Depends(get_db)):
+    """ Imports a JSON array or NDJSON body of categories, reporting rows that were rejected """
+    try:
+        rows, errors = parse_bulk_payload(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    categories, invalid = validate_bulk_rows(rows, CreateUpdateCategory)
+    result = await bulk_create_categories(db, categories, batch_size)
+    result.errors = sorted(errors + invalid + result.errors, key=lambda error: error.index)
+    return result
+
+
 @category_router.get("/category/{category_id}", response_model=RetrieveCategory | Dict)
 async def get_category(category_id: int, db: AsyncSession = Depends(get_db)):
     category = await get_category_by_id(db, category_id)
     if category is None:
-        return {}
-    return category
+        return ORJSONResponse({})
+    return ORJSONResponse(category)
 
 
 @category_router.get("/categories/all", response_model=List[RetrieveCategory] | List)
-async def get_categories(db: AsyncSession = Depends(get_db)):
+async def get_categories(request: Request, db: AsyncSession = Depends(get_db)):
+    version = await category_cache.current_version(db)
+    etag = strong_etag("categories", version)
+    if etag_matches(request, etag):
+        return not_modified(etag, settings.CATEGORY_CACHE_CONTROL)
     categories = await get_all_categories(db)
     if categories is None:
-        return []
-    return categories
\ No newline at end of file
+        categories = []
+    return with_validators(ORJSONResponse(categories), etag, settings.CATEGORY_CACHE_CONTROL)
+
+
+@category_router.get("/categories/cacheStats", response_model=Dict[str, int])
+async def get_category_cache_stats():
+    return category_cache.stats()
@@ -1,12 +1,22 @@
+import uuid
+from datetime import datetime
 from typing import Union
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core import settings
 from core.schemas import *
+from core.utility.bulk_import import parse_bulk_payload, validate_bulk_rows
+from core.utility.conditional import etag_matches, not_modified, strong_etag, with_validators
+from core.utility.multi_get import in_request_order, parse_ids
+from core.utility.responses import ORJSONResponse
 from db.connection import get_db
+from db.models.session_set import get_exercise_history
+from db.models.table_version import get_table_versions
 from db.models.user import create_user, get_user
 from db.models.category import create_category, get_category_by_id, get_all_categories
-from db.models.exercise import create_exercise, get_exercise, get_all_exercises_query, get_all_exercises_for_category_id
+from db.models.exercise import Exercise, create_exercise, get_exercise, get_all_exercises_query, get_all_exercises_for_category_id, \
+    get_exercises_after_cursor, search_exercises, bulk_create_exercises, get_exercises_by_ids, delete_exercises
 
 exercise_router = APIRouter()
 
@@ -16,26 +26,91 @@ async def create_new_exercise(exercise: CreateUpdateExercise, db: AsyncSession =
     return await create_exercise(db, exercise)
 
 
+@exercise_router.post("/exercises/bulk", response_model=BulkImportResult)
+async def bulk_import_exercises(request: Request,
+                                batch_size: int = Query(settings.BULK_IMPORT_BATCH_SIZE, ge=1, le=10000,
+                                                       description="rows per INSERT"),
+                                db: AsyncSession = Depends(get_db)):
+    """ Imports a JSON array or NDJSON body of exercises, reporting rows that were rejected """
+    try:
+        rows, errors = parse_bulk_payload(await request.body(), request.headers.get("content-type", ""))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    exercises, invalid = validate_bulk_rows(rows, CreateUpdateExercise)
+    result = await bulk_create_exercises(db, exercises, batch_size)
+    result.errors = sorted(errors + invalid + result.errors, key=lambda error: error.index)
+    return result
+
+
+# Declared before /exercise/{exercise_id} so that "search" is not parsed as an id
+@exercise_router.get("/exercise/search", response_model=Union[List[RetrieveExercise], List])
+async def search_exercise_by_name(query: str = Query(..., description="Term to search exercises by name"),
+                                  limit: int = Query(10, ge=1, le=100, description="maximum number of results"),
+                                  offset: int = Query(0, ge=0, description="number of results to skip"),
+                                  db: AsyncSession = Depends(get_db)):
+    return ORJSONResponse(await search_exercises(db, query, limit, offset))
+
+
 @exercise_router.get("/exercise/{exercise_id}", response_model=RetrieveExercise | None)
 async def get_exercise_by_id(exercise_id: int, db: AsyncSession = Depends(get_db)):
-    return await get_exercise(db, exercise_id)
+    return ORJSONResponse(await get_exercise(db, exercise_id))
+
+
+@exercise_router.get("/exercise/{exercise_id}/history", response_model=List[RetrieveSessionSet])
+async def get_exercise_set_history(exercise_id: int,
+                                   user_id: uuid.UUID = Query(..., description="user whose sets to return"),
+                                   since: Optional[datetime] = Query(None, description="only sets performed at or after"),
+                                   until: Optional[datetime] = Query(None, description="only sets performed before"),
+                                   limit: int = Query(100, ge=1, le=1000, description="maximum number of sets"),
+                                   db: AsyncSession = Depends(get_db)):
+    return ORJSONResponse(await get_exercise_history(db, user_id, exercise_id, since, until, limit))
+
 
+@exercise_router.get("/exercises", response_model=RetrieveExerciseBatch)
+async def get_exercises_by_id_list(ids: str = Query(..., description="comma separated exercise ids"),
+                                   db: AsyncSession = Depends(get_db)):
+    try:
+        exercise_ids = parse_ids(ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse(in_request_order(exercise_ids, await get_exercises_by_ids(db, exercise_ids)))
 
-@exercise_router.get("/exercises/all", response_model=List[RetrieveExercise] | None)
-async def get_all_exercises(db: AsyncSession = Depends(get_db),
+
+@exercise_router.delete("/exercises", response_model=BulkDeleteResult)
+async def delete_exercises_by_id_list(ids: str = Query(..., description="comma separated exercise ids"),
+                                      db: AsyncSession = Depends(get_db)):
+    try:
+        exercise_ids = parse_ids(ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    deleted = set(await delete_exercises(db, exercise_ids))
+    return BulkDeleteResult(
+        deleted=[exercise_id for exercise_id in exercise_ids if exercise_id in deleted],
+        missing=[exercise_id for exercise_id in exercise_ids if exercise_id not in deleted])
+
+
+@exercise_router.get("/exercises/all", response_model=List[RetrieveExercise] | RetrieveExercisePage | None)
+async def get_all_exercises(request: Request, db: AsyncSession = Depends(get_db),
                             page: int = Query(0, description="page of results"),
                             page_size: int = Query(10, description="size of page"),
-                            category_id: int = Query(-1, description="id of the category to get")):
-    if category_id == -1:
-        return await get_all_exercises_query(db, page, page_size)
-    else:
-        return await get_all_exercises_for_category_id(db, category_id, page, page_size)
+                            category_id: int = Query(-1, description="id of the category to get"),
+                            cursor: Optional[str] = Query(None, description="next_cursor from the previous page; "
+                                                                            "pass it empty to start cursor pagination")):
+    # Every page and filter is a function of the exercises table, so its version covers them all
+    version = (await get_table_versions(db, Exercise.__tablename__))[Exercise.__tablename__]
+    etag = strong_etag("exercises", version)
+    if etag_matches(request, etag):
+        return not_modified(etag, settings.EXERCISE_CACHE_CONTROL)
 
-
-@exercise_router.get("/exercise/search", response_model=Union[List[RetrieveExercise], List])
-async def search_exercise_by_name(query: str = Query(..., description="Term to search exercises by name"), db: AsyncSession = Depends(get_db)):
-    print(f"[search_exercise_by_name] searching for {query}")
-    exercises = await get_exercise(db, query)
-    if exercises is None:
-        return []
-    return exercises
\ No newline at end of file
+    if cursor is not None:
+        try:
+            exercises, next_cursor = await get_exercises_after_cursor(
+                db, cursor, page_size, None if category_id == -1 else category_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        response = ORJSONResponse({"items": exercises, "next_cursor": next_cursor})
+    elif category_id == -1:
+        response = ORJSONResponse(await get_all_exercises_query(db, page, page_size))
+    else:
+        response = ORJSONResponse(await get_all_exercises_for_category_id(db, category_id, page, page_size))
+    return with_validators(response, etag, settings.EXERCISE_CACHE_CONTROL)
@@ -0,0 +1,30 @@
+from typing import Dict, List, Union
+
+from fastapi import APIRouter
+
+from core.utility.admission import admission_controller
+from core.utility.auth import verified_tokens
+from db.connection import get_pool_stats
+from db.instrumentation import get_sql_log
+
+internal_router = APIRouter()
+
+
+@internal_router.get("/poolStats", response_model=Dict[str, Union[int, float, str]])
+async def read_pool_stats():
+    return get_pool_stats()
+
+
+@internal_router.get("/sqlLog", response_model=List[Dict])
+async def read_sql_log():
+    return get_sql_log()
+
+
+@internal_router.get("/tokenCacheStats", response_model=Dict[str, int])
+async def read_token_cache_stats():
+    return verified_tokens.stats()
+
+
+@internal_router.get("/admissionStats", response_model=Dict[str, Dict[str, int]])
+async def read_admission_stats():
+    return admission_controller.stats()
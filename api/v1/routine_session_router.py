@@ -0,0 +1,62 @@
+from typing import Union
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core import settings
+from core.schemas import *
+from core.utility.responses import ORJSONResponse
+from db.connection import get_db
+from db.models.routine_session import create_routine_session, bulk_create_routine_sessions, get_session_by_id, \
+    update_session, delete_routine_session, find_reference_issues
+
+routine_session_router = APIRouter()
+
+
+@routine_session_router.post("/routineSessions", response_model=Union[RetrieveRoutineSession, Dict])
+async def create_new_routine_session(routine_session: CreateUpdateRoutineSession, db: AsyncSession = Depends(get_db)):
+    session_issues = routine_session.validate()
+    session_issues.update(await find_reference_issues(db, routine_session))
+    if len(session_issues) > 0:
+        return ORJSONResponse(session_issues, status_code=422)
+
+    session = await create_routine_session(db, routine_session)
+    if session is None:
+        return {}
+    return session
+
+
+@routine_session_router.post("/routineSessions/batch", response_model=BulkImportResult)
+async def create_routine_session_batch(routine_sessions: List[CreateUpdateRoutineSession],
+                                       batch_size: int = Query(settings.BULK_IMPORT_BATCH_SIZE, ge=1, le=10000,
+                                                               description="rows per INSERT"),
+                                       db: AsyncSession = Depends(get_db)):
+    """ Ingests many completed sessions in one transaction, e.g. after an offline client reconnects """
+    return await bulk_create_routine_sessions(db, list(enumerate(routine_sessions)), batch_size)
+
+
+@routine_session_router.get("/routineSessions/{session_id}", response_model=Union[RetrieveRoutineSession, Dict])
+async def get_routine_session(session_id: int, db: AsyncSession = Depends(get_db)):
+    session = await get_session_by_id(db, session_id)
+    if session is None:
+        return {}
+    return session
+
+
+@routine_session_router.put("/routineSessions/{session_id}", response_model=Union[RetrieveRoutineSession, Dict])
+async def update_routine_session(session_id: int, routine_session: CreateUpdateRoutineSession,
+                                 db: AsyncSession = Depends(get_db)):
+    session_issues = routine_session.validate()
+    session_issues.update(await find_reference_issues(db, routine_session))
+    if len(session_issues) > 0:
+        return ORJSONResponse(session_issues, status_code=422)
+
+    session = await update_session(db, session_id, routine_session)
+    if session is None:
+        return {}
+    return session
+
+
+@routine_session_router.delete("/routineSessions/{session_id}", response_model=bool)
+async def delete_session(session_id: int, db: AsyncSession = Depends(get_db)):
+    return await delete_routine_session(db, session_id)
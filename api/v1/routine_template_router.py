@@ -1,35 +1,101 @@
-from typing import Union
+from typing import Optional, Union
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core import settings
 from core.schemas import *
+from core.utility.conditional import etag_matches, not_modified, strong_etag, with_validators
+from core.utility.multi_get import in_request_order, parse_ids
+from core.utility.responses import ORJSONResponse
 from db.connection import get_db
-from db.models.routine_template import create_template, delete_routine_template, get_template_by_id
+from db.models import Exercise
+from db.models.table_version import get_table_versions
+from db.models.user import user_exists
+from db.models.routine_template import create_template, delete_routine_template, get_template_by_id, \
+    get_sessions_for_template, get_template_version, get_templates_by_ids, delete_routine_templates
 
 routine_template_router = APIRouter()
 
 
-@routine_template_router.get("/routineTemplates/{template_id}", response_model=Union[RetrieveRoutineTemplate, Dict])
-async def get_routine_template(template_id: int, db: AsyncSession = Depends(get_db)):
+@routine_template_router.get("/routineTemplates", response_model=RetrieveRoutineTemplateBatch)
+async def get_routine_templates(ids: str = Query(..., description="comma separated routine template ids"),
+                                db: AsyncSession = Depends(get_db)):
+    try:
+        template_ids = parse_ids(ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse(in_request_order(template_ids, await get_templates_by_ids(db, template_ids)))
+
+
+@routine_template_router.get("/routineTemplates/{template_id}",
+                             response_model=Union[RetrieveRoutineTemplateWithSessions, RetrieveRoutineTemplate, Dict])
+async def get_routine_template(template_id: int, request: Request, db: AsyncSession = Depends(get_db),
+                               include: Optional[str] = Query(None, description="comma separated relations to include; "
+                                                                                 "supports 'sessions'"),
+                               sessions_limit: int = Query(20, ge=1, le=100, description="sessions to include"),
+                               sessions_cursor: Optional[str] = Query(None, description="sessions_next_cursor from "
+                                                                                         "the previous response")):
+    with_sessions = include is not None and "sessions" in include.split(",")
+    if not with_sessions:
+        # Versions are read before the template, so a concurrent write can only make the ETag stale,
+        # never let an old body pass as current
+        version = await get_template_version(db, template_id)
+        if version is None:
+            return {}
+        exercises_version = (await get_table_versions(db, Exercise.__tablename__))[Exercise.__tablename__]
+        etag = strong_etag("routineTemplate", template_id, version, exercises_version)
+        if etag_matches(request, etag):
+            return not_modified(etag, settings.ROUTINE_TEMPLATE_CACHE_CONTROL)
+
     template = await get_template_by_id(db=db, template_id=template_id)
     if template is None:
         return {}
-    return template
+    # Validated here rather than by response_model, which would also try the sessions schema
+    # against the entity and touch its unloaded routine_sessions
+    retrieved = RetrieveRoutineTemplate.model_validate(template)
+    if not with_sessions:
+        return with_validators(ORJSONResponse(retrieved), etag, settings.ROUTINE_TEMPLATE_CACHE_CONTROL)
+
+    try:
+        sessions, next_cursor = await get_sessions_for_template(db, template_id, sessions_limit, sessions_cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return RetrieveRoutineTemplateWithSessions(
+        **retrieved.model_dump(),
+        routine_sessions=sessions,
+        sessions_next_cursor=next_cursor)
 
 
 @routine_template_router.post("/routineTemplates", response_model=Union[RetrieveRoutineTemplate, Dict])
 async def create_routine_template(template: CreateUpdateRoutineTemplate, db: AsyncSession = Depends(get_db)):
     template_issues = template.validate()
+    if template.user_id is not None and not await user_exists(db, template.user_id):
+        template_issues["user_id"] = f"User (id#{template.user_id}) does not exist."
     if len(template_issues) > 0:
         return template_issues
 
-    template = await create_template(template=template, db=db)
+    template, missing_exercises = await create_template(template=template, db=db)
+    if missing_exercises:
+        return {f"exercise-{exercise_id}": f"Exercise (id#{exercise_id}) does not exist." for exercise_id in missing_exercises}
     if template is None:
         return {}
     return template
 
 
+@routine_template_router.delete("/routineTemplates", response_model=BulkDeleteResult)
+async def delete_templates(ids: str = Query(..., description="comma separated routine template ids"),
+                           db: AsyncSession = Depends(get_db)):
+    try:
+        template_ids = parse_ids(ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    deleted = set(await delete_routine_templates(db, template_ids))
+    return BulkDeleteResult(
+        deleted=[template_id for template_id in template_ids if template_id in deleted],
+        missing=[template_id for template_id in template_ids if template_id not in deleted])
+
+
 @routine_template_router.delete("/routineTemplates/{template_id}", response_model=bool)
 async def delete_template(template_id: int, db: AsyncSession = Depends(get_db)):
     return await delete_routine_template(db, template_id)
@@ -0,0 +1,30 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.schemas import *
+from core.utility.pagination import decode_cursor, encode_cursor
+from core.utility.responses import ORJSONResponse
+from db.connection import get_db
+from db.models.sync import SYNC_TABLES, get_changes, get_sync_versions
+
+
+sync_router = APIRouter()
+
+
+@sync_router.get("/sync", response_model=SyncChanges)
+async def read_changes(since: Optional[str] = Query(None, description="token from the previous sync; omit for a full sync"),
+                       user_id: Optional[UUID4] = Query(None, description="user whose templates and sessions to include"),
+                       db: AsyncSession = Depends(get_db)):
+    """ Catalog, template and session rows inserted, updated or deleted since the token, with the next token """
+    until = await get_sync_versions(db, user_id)
+    versions = None
+    if since is not None:
+        token = decode_cursor(since)
+        if (token is None or len(token) != len(SYNC_TABLES)
+                or not all(isinstance(version, int) and 0 <= version <= until[table_name]
+                           for table_name, version in zip(SYNC_TABLES, token))):
+            raise HTTPException(status_code=400, detail="since is not a valid sync token; sync again without it")
+        versions = dict(zip(SYNC_TABLES, token))
+    changes = await get_changes(db, versions, until, user_id)
+    return ORJSONResponse({"token": encode_cursor(*(until[table_name] for table_name in SYNC_TABLES)), **changes})
@@ -1,10 +1,20 @@
-from typing import Union
-from fastapi import APIRouter, Depends, Query
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from core import settings
 from core.schemas import *
-from db.connection import get_db
-from db.models.user import create_user, get_user, delete_user_from_db
+from core.utility.export import EXPORT_FORMATS, encode_csv, encode_ndjson
+from core.utility.multi_get import in_request_order, parse_ids
+from core.utility.responses import ORJSONResponse
+from db.connection import async_session, get_db
+from db.models.personal_record import get_records_for_user
+from db.models.routine_session import EXPORT_COLUMNS, get_sessions_for_user, stream_session_export
+from db.models.training_rollup import GRANULARITIES, get_training_stats
+from db.models.user import create_user, get_user, get_users_by_ids, delete_user_from_db, user_exists
 
 
 user_router = APIRouter()
@@ -15,6 +25,16 @@ async def create_new_user(user: CreateUpdateUser, db: AsyncSession = Depends(get
     return await create_user(db, user)
 
 
+@user_router.get("/users", response_model=RetrieveUserBatch)
+async def read_users_by_ids(ids: str = Query(..., description="comma separated user uuids"),
+                            db: AsyncSession = Depends(get_db)):
+    try:
+        user_ids = parse_ids(ids, uuid.UUID)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse(in_request_order(user_ids, await get_users_by_ids(db, user_ids)))
+
+
 @user_router.get("/users/{user_id}", response_model=RetrieveUser | Dict)
 async def read_user_by_id(user_id: UUID4, db: AsyncSession = Depends(get_db)):
     user = await get_user(db, user_id)
@@ -23,6 +43,66 @@ async def read_user_by_id(user_id: UUID4, db: AsyncSession = Depends(get_db)):
     return user
 
 
+@user_router.get("/users/{user_id}/records", response_model=List[ExercisePersonalRecords])
+async def read_user_records(user_id: UUID4, db: AsyncSession = Depends(get_db)):
+    """ The user's personal records per exercise, maintained as sessions are logged """
+    return ORJSONResponse(await get_records_for_user(db, user_id))
+
+
+@user_router.get("/users/{user_id}/stats", response_model=List[TrainingStatsBucket])
+async def read_user_stats(user_id: UUID4,
+                          granularity: str = Query("week", description="day, week or month"),
+                          start: Optional[date] = Query(None, alias="from", description="first day covered, defaults to a year before to"),
+                          end: Optional[date] = Query(None, alias="to", description="day after the last one covered"),
+                          db: AsyncSession = Depends(get_db)):
+    """ The user's tonnage, set counts and session durations per bucket, read from the training rollups """
+    if granularity not in GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(GRANULARITIES)}")
+    if start is None:
+        # Keep the default a bounded range read rather than the user's whole history
+        start = (end or datetime.now(timezone.utc).date()) - timedelta(days=365)
+    if end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="to must be after from")
+    return ORJSONResponse(await get_training_stats(db, user_id, granularity, start, end))
+
+
+@user_router.get("/users/{user_id}/sessions", response_model=UserSessionPage)
+async def read_user_sessions(user_id: UUID4,
+                             before: Optional[str] = Query(None, description="next_before from the previous page"),
+                             limit: int = Query(20, ge=1, le=100, description="maximum number of sessions"),
+                             db: AsyncSession = Depends(get_db)):
+    """ The user's sessions, newest first, with a summary of the template each was logged against """
+    try:
+        sessions, next_before = await get_sessions_for_user(db, user_id, limit, before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse({"sessions": sessions, "next_before": next_before})
+
+
+async def _export_body(user_id: uuid.UUID, export_format: str):
+    # The response is streamed after the request's session is released, so the export holds its own
+    async with async_session() as db:
+        if export_format == "csv":
+            yield encode_csv([], EXPORT_COLUMNS, header=True)
+        async for rows in stream_session_export(db, user_id, settings.EXPORT_CHUNK_SIZE):
+            yield encode_ndjson(rows) if export_format == "ndjson" else encode_csv(rows, EXPORT_COLUMNS)
+
+
+@user_router.get("/users/{user_id}/sessions/export")
+async def export_user_sessions(user_id: UUID4,
+                               format: str = Query("ndjson", description="ndjson or csv"),
+                               db: AsyncSession = Depends(get_db)):
+    """ The user's full session history, one row per set, streamed without building it in memory """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    if not await user_exists(db, user_id):
+        return {}
+    return StreamingResponse(
+        _export_body(user_id, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="sessions-{user_id}.{format}"'})
+
+
 @user_router.delete("/users/{user_id}", response_model=bool)
 async def delete_user(user_id: UUID4, db: AsyncSession = Depends(get_db)):
     success = await delete_user_from_db(db, user_id)
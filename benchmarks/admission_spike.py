@@ -0,0 +1,68 @@
+"""
+Sends a spike of concurrent reads at a small connection pool, with and without admission control,
+and reports status codes, latency and pool timeouts.
+
+    python -m benchmarks.admission_spike --clients 400 --mode on
+    python -m benchmarks.admission_spike --clients 400 --mode off
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+
+
+async def run(clients: int, exercises: int):
+    # Imported here because the settings are read when these modules load
+    from benchmarks.common import create_bench_database, summarize
+    import httpx
+    from sqlalchemy import insert
+
+    import main
+    from core.utility.admission import admission_controller
+    from db.connection import get_pool_stats
+    from db.models import Category, Exercise
+
+    session_factory = await create_bench_database()
+    async with session_factory() as db:
+        await db.execute(insert(Category), [{"id": 1, "name": "Strength", "description": "", "type": "exercise"}])
+        await db.execute(insert(Exercise), [{"name": f"Exercise {i:07d}", "description": "A" * 100, "category_id": 1}
+                                            for i in range(exercises)])
+        await db.commit()
+
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def request(offset: int):
+            start = time.perf_counter()
+            response = await client.get("/api/v1/exercises/all", params={"page": offset % 50, "page_size": 200})
+            return response.status_code, (time.perf_counter() - start) * 1000
+
+        results = await asyncio.gather(*(request(i) for i in range(clients)))
+
+    statuses = Counter(str(status) for status, _ in results)
+    report = {
+        "status_codes": dict(statuses),
+        "ok": summarize([ms for status, ms in results if status == 200] or [0.0]),
+        "all": summarize([ms for _, ms in results]),
+        "pool_timeouts": get_pool_stats().get("timeouts"),
+        "admission": admission_controller.stats()["read"],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=400)
+    parser.add_argument("--exercises", type=int, default=10000)
+    parser.add_argument("--mode", choices=("on", "off"), default="on")
+    args = parser.parse_args()
+    # A deliberately small pool, so the spike outgrows it
+    os.environ.setdefault("DB_POOL_SIZE", "2")
+    os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+    os.environ.setdefault("DB_POOL_TIMEOUT", "2")
+    os.environ.setdefault("ADMISSION_READ_CONCURRENCY", "2")
+    os.environ.setdefault("ADMISSION_READ_QUEUE", "50")
+    os.environ.setdefault("ADMISSION_QUEUE_TIMEOUT", "1")
+    os.environ["ADMISSION_CONTROL"] = "true" if args.mode == "on" else "false"
+    asyncio.run(run(args.clients, args.exercises))
@@ -0,0 +1,49 @@
+"""
+Compares importing exercises through POST /exercises/bulk with one POST /exercise per row.
+
+    python -m benchmarks.bulk_import --rows 100000 --single-rows 1000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import create_bench_database
+import httpx
+
+import main
+
+
+async def run(rows: int, single_rows: int, batch_size: int):
+    await create_bench_database()
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post("/api/v1/category", json={"name": "Strength", "description": "", "type": "exercise"})
+
+        start = time.perf_counter()
+        for i in range(single_rows):
+            await client.post("/api/v1/exercise", json={"name": f"Single {i}", "description": "", "category_id": 1})
+        single_elapsed = time.perf_counter() - start
+
+        body = "\n".join(json.dumps({"name": f"Bulk {i}", "description": "", "category_id": 1}) for i in range(rows))
+        start = time.perf_counter()
+        response = await client.post(f"/api/v1/exercises/bulk?batch_size={batch_size}", content=body,
+                                     headers={"content-type": "application/x-ndjson"})
+        bulk_elapsed = time.perf_counter() - start
+
+    result = response.json()
+    print(json.dumps({
+        "single": {"rows": single_rows, "seconds": round(single_elapsed, 3),
+                   "rows_per_second": round(single_rows / single_elapsed, 1)},
+        "bulk": {"rows": result["inserted"], "errors": len(result["errors"]), "batch_size": batch_size,
+                 "seconds": round(bulk_elapsed, 3), "rows_per_second": round(result["inserted"] / bulk_elapsed, 1)},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--single-rows", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.single_rows, args.batch_size))
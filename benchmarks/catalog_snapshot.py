@@ -0,0 +1,72 @@
+"""
+Compares a cold start that pages through /exercises/all and fetches /categories/all with a single
+/catalog/snapshot request, in requests, bytes on the wire and latency.
+
+    python -m benchmarks.catalog_snapshot --exercises 5000 --page-size 100 --repeat 20
+"""
+import argparse
+import asyncio
+import json
+
+from benchmarks.common import create_bench_database, summarize, time_async
+import httpx
+from sqlalchemy import insert
+
+import main
+from core.utility.compression import brotli
+from db.catalog_snapshot import catalog_snapshot
+from db.models import Category, Exercise
+
+
+async def seed(session_factory, categories: int, exercises: int):
+    async with session_factory() as db:
+        await db.execute(insert(Category), [{"id": i, "name": f"Category {i}", "description": "A" * 100, "type": "exercise"}
+                                            for i in range(1, categories + 1)])
+        await db.execute(insert(Exercise), [{"id": i, "name": f"Exercise {i:07d}", "description": "A" * 100,
+                                             "category_id": 1 + i % categories} for i in range(1, exercises + 1)])
+        await db.commit()
+
+
+async def run(categories: int, exercises: int, page_size: int, repeat: int):
+    session_factory = await create_bench_database()
+    await seed(session_factory, categories, exercises)
+
+    report = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def paged(tally):
+            response = await client.get("/api/v1/categories/all")
+            tally["requests"], tally["bytes"] = 1, response.num_bytes_downloaded
+            cursor = ""
+            while cursor is not None:
+                response = await client.get("/api/v1/exercises/all", params={"cursor": cursor, "page_size": page_size})
+                tally["requests"] += 1
+                tally["bytes"] += response.num_bytes_downloaded
+                cursor = response.json()["next_cursor"]
+
+        def snapshot(encoding):
+            async def fetch(tally):
+                response = await client.get("/api/v1/catalog/snapshot", headers={"Accept-Encoding": encoding})
+                tally["requests"], tally["bytes"] = 1, response.num_bytes_downloaded
+            return fetch
+
+        await catalog_snapshot.current()
+        cases = {"paged": paged, "snapshot identity": snapshot("identity"), "snapshot gzip": snapshot("gzip")}
+        if brotli is not None:
+            cases["snapshot br"] = snapshot("br")
+        for label, fetch in cases.items():
+            tally = {}
+            samples = await time_async(lambda: fetch(tally), repeat)
+            report[label] = {"requests": tally["requests"], "bytes": tally["bytes"], **summarize(samples)}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--exercises", type=int, default=5000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.categories, args.exercises, args.page_size, args.repeat))
@@ -0,0 +1,55 @@
+import os
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+# Benchmarks run against a throwaway local database unless told otherwise
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///./bench.sqlite")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from db.models import Base
+
+
+async def create_bench_database(url: str = None) -> async_sessionmaker:
+    """
+    Creates a fresh schema on the benchmark database.
+
+    Args:
+        url (str): database url, defaults to DATABASE_URL.
+
+    Returns:
+        async_sessionmaker: session factory bound to the benchmark engine.
+    """
+    engine: AsyncEngine = create_async_engine(url or os.environ["DATABASE_URL"])
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    return async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def time_async(fn: Callable[[], Awaitable], repeat: int = 20) -> List[float]:
+    """ Runs fn repeat times and returns each run's latency in milliseconds """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """ Nearest-rank percentile of the samples """
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> dict:
+    """ p50/p95/p99 summary of latency samples in milliseconds """
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+    }
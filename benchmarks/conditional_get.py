@@ -0,0 +1,69 @@
+"""
+Compares full responses with If-None-Match revalidation for catalog and template reads whose data
+did not change.
+
+    python -m benchmarks.conditional_get --exercises 2000 --repeat 200
+"""
+import argparse
+import asyncio
+import json
+
+from benchmarks.common import create_bench_database, summarize, time_async
+import httpx
+from sqlalchemy import insert
+
+import main
+from db.models import Category, Exercise, RoutineTemplate, exercises_routine_bridge
+
+ROUTES = [
+    "/api/v1/categories/all",
+    "/api/v1/exercises/all?page_size=500",
+    "/api/v1/routineTemplates/1",
+]
+
+
+async def seed(session_factory, categories: int, exercises: int):
+    async with session_factory() as db:
+        await db.execute(insert(Category), [{"id": i, "name": f"Category {i}", "description": "", "type": "exercise"}
+                                            for i in range(1, categories + 1)])
+        await db.execute(insert(Exercise), [{"id": i, "name": f"Exercise {i:07d}", "description": "A" * 100,
+                                             "category_id": 1 + i % categories} for i in range(1, exercises + 1)])
+        await db.execute(insert(RoutineTemplate), [{"id": 1, "name": "Full Body", "sets": {}}])
+        await db.execute(insert(exercises_routine_bridge), [{"routine_template_id": 1, "exercises_id": i}
+                                                            for i in range(1, min(exercises, 20) + 1)])
+        await db.commit()
+
+
+async def run(categories: int, exercises: int, repeat: int):
+    session_factory = await create_bench_database()
+    await seed(session_factory, categories, exercises)
+
+    report = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for route in ROUTES:
+            first = await client.get(route)
+            etag = first.headers["etag"]
+            sizes = {}
+
+            async def fetch(label, headers):
+                response = await client.get(route, headers=headers)
+                sizes[label] = len(response.content)
+
+            full = await time_async(lambda: fetch("full", {}), repeat)
+            revalidated = await time_async(lambda: fetch("revalidated", {"If-None-Match": etag}), repeat)
+            report[route] = {
+                "full": {"bytes_per_request": sizes["full"], **summarize(full)},
+                "revalidated": {"bytes_per_request": sizes["revalidated"], **summarize(revalidated)},
+            }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--exercises", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.categories, args.exercises, args.repeat))
@@ -0,0 +1,61 @@
+"""
+Compares OFFSET paging with cursor paging on the exercise listing.
+
+    python -m benchmarks.exercise_pagination --pages 10000 --page-size 10
+"""
+import argparse
+import asyncio
+import json
+
+from benchmarks.common import create_bench_database, summarize, time_async
+from sqlalchemy import insert
+
+from core.utility.pagination import encode_cursor
+from db.models import Category, Exercise
+from db.models.exercise import get_all_exercises_query, get_exercises_after_cursor
+
+
+async def seed(session_factory, rows: int):
+    async with session_factory() as db:
+        await db.execute(insert(Category), [{"id": 1, "name": "Strength", "description": "", "type": "exercise"}])
+        await db.execute(insert(Exercise), [
+            {"name": f"Exercise {i:07d}", "description": "", "category_id": 1} for i in range(rows)])
+        await db.commit()
+
+
+async def cursor_for_page(session_factory, page: int, page_size: int) -> str:
+    """ Walks to the cursor of the requested page without timing it """
+    async with session_factory() as db:
+        result = await db.execute(
+            Exercise.__table__.select()
+            .order_by(Exercise.name, Exercise.id)
+            .offset(page * page_size - 1)
+            .limit(1))
+        row = result.first()
+    return encode_cursor(row.name, row.id) if row else ""
+
+
+async def main(pages: int, page_size: int, repeat: int):
+    session_factory = await create_bench_database()
+    await seed(session_factory, pages * page_size)
+
+    report = {}
+    checkpoints = sorted({p for p in (1, 10, 100, 1000, pages) if p <= pages})
+    for page in checkpoints:
+        cursor = await cursor_for_page(session_factory, page - 1, page_size) if page > 1 else ""
+
+        async with session_factory() as db:
+            offset_samples = await time_async(lambda: get_all_exercises_query(db, page - 1, page_size), repeat)
+            cursor_samples = await time_async(lambda: get_exercises_after_cursor(db, cursor, page_size), repeat)
+        report[page] = {"offset": summarize(offset_samples), "cursor": summarize(cursor_samples)}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=10000)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.pages, args.page_size, args.repeat))
@@ -0,0 +1,57 @@
+"""
+Compares the in-process n-gram search index with the ILIKE query it replaces.
+
+    python -m benchmarks.exercise_search --rows 100000
+"""
+import argparse
+import asyncio
+import itertools
+import json
+
+from benchmarks.common import create_bench_database, summarize, time_async
+from sqlalchemy import insert, select
+
+from db.models import Category, Exercise
+from db.models.exercise import build_exercise_search_index, exercise_search_index, search_exercises
+
+MODIFIERS = ["", "Incline", "Decline", "Seated", "Standing", "Single Arm", "Close Grip", "Wide Grip", "Paused", "Tempo"]
+EQUIPMENT = ["Barbell", "Dumbbell", "Cable", "Machine", "Kettlebell", "Band", "Smith", "Landmine"]
+MOVEMENTS = ["Bench Press", "Row", "Squat", "Deadlift", "Curl", "Fly", "Lunge", "Shoulder Press", "Pulldown", "Extension"]
+QUERIES = ["b", "be", "ben", "bench", "bench press", "incline db", "row", "cable fly", "zzz"]
+
+
+def exercise_names(rows: int):
+    combos = itertools.cycle(itertools.product(MODIFIERS, EQUIPMENT, MOVEMENTS))
+    for i, (modifier, equipment, movement) in zip(range(rows), combos):
+        yield " ".join(part for part in (modifier, equipment, movement, f"v{i}") if part)
+
+
+async def main(rows: int, repeat: int):
+    session_factory = await create_bench_database()
+    async with session_factory() as db:
+        await db.execute(insert(Category), [{"id": 1, "name": "Strength", "description": "", "type": "exercise"}])
+        await db.execute(insert(Exercise), [
+            {"name": name, "description": "", "category_id": 1} for name in exercise_names(rows)])
+        await db.commit()
+
+    report = {}
+    async with session_factory() as db:
+        await build_exercise_search_index(db)
+        for query in QUERIES:
+            index_samples = await time_async(lambda: search_exercises(db, query, 10, 0), repeat)
+
+            async def ilike():
+                result = await db.execute(select(Exercise).filter(Exercise.name.ilike(f"%{query}%")))
+                return result.scalars().all()
+            ilike_samples = await time_async(ilike, max(1, repeat // 10))
+            report[query] = {"index": summarize(index_samples), "ilike": summarize(ilike_samples)}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.repeat))
@@ -0,0 +1,266 @@
+"""
+Seeds a throwaway database and drives every /api/v1 route with concurrent clients, reporting
+throughput and p50/p95/p99 latency per route as JSON.
+
+    python -m benchmarks.load_test --scale 10 --concurrency 16 --output run.json
+    python -m benchmarks.load_test --scale 10 --baseline run.json   # exits 1 on p95 regressions
+
+By default the app from main.py is served in-process against SQLite (bench.sqlite). Set DATABASE_URL
+to seed a local Postgres instead, and pass --url to load-test a server that is running against it.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import subprocess
+import sys
+import time
+import uuid
+from collections import Counter
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.common import create_bench_database, summarize
+from benchmarks.seed import BENCH_PASSWORD, SeedData, breakdown_for, seed_database
+from core.utility.auth import create_access_token
+from core.utility.pagination import encode_cursor
+import httpx
+
+API = "/api/v1"
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # Builds (url, httpx request kwargs) for the i-th request of the scenario
+    build: Callable[[int], Tuple[str, dict]]
+    # Fraction of --requests to send, for routes that are expensive by design
+    weight: float = 1.0
+
+
+def build_scenarios(data: SeedData, rng: random.Random) -> List[Scenario]:
+    def sample(ids: list, size: int) -> list:
+        # Small --scale values seed fewer rows than a scenario asks for
+        return rng.sample(ids, min(size, len(ids)))
+
+    def session_body() -> dict:
+        start = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=rng.randrange(525600))
+        exercise_ids = sample(data.exercise_ids, 5)
+        return {
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=1)).isoformat(),
+            "routine_template_id": rng.choice(data.template_ids),
+            "user_id": str(rng.choice(data.user_ids)),
+            "breakdown": breakdown_for(exercise_ids, rng),
+        }
+
+    def pop_or_missing(ids: list, missing):
+        return ids.pop() if ids else missing
+
+    # Signed with this process's SECRET_KEY; pass the server's SECRET_KEY along with --url
+    tokens = [create_access_token({"sub": str(user_id)}) for user_id in data.user_ids[:20]]
+
+    def run_id() -> str:
+        return uuid.uuid4().hex[:12]
+
+    return [
+        # Users
+        Scenario("POST /users", "POST", lambda i: (f"{API}/users", {"json": {
+            "first_name": "Load", "last_name": "Test", "username": f"load{run_id()}", "phone_number": "5550000000",
+            "email": f"{run_id()}@example.com", "password": BENCH_PASSWORD}}), weight=0.05),
+        Scenario("GET /users/{id}", "GET", lambda i: (f"{API}/users/{rng.choice(data.user_ids)}", {})),
+        Scenario("GET /users?ids", "GET", lambda i: (
+            f"{API}/users", {"params": {"ids": ",".join(str(user_id) for user_id in sample(data.user_ids, 20))}})),
+        Scenario("GET /users/{id}/records", "GET", lambda i: (f"{API}/users/{rng.choice(data.user_ids)}/records", {})),
+        Scenario("GET /users/{id}/stats", "GET",
+                 lambda i: (f"{API}/users/{rng.choice(data.user_ids)}/stats?granularity={('day', 'week', 'month')[i % 3]}", {})),
+        Scenario("GET /users/{id}/sessions", "GET",
+                 lambda i: (f"{API}/users/{rng.choice(data.user_ids)}/sessions?limit=20", {})),
+        Scenario("GET /users/{id}/sessions/export", "GET", lambda i: (
+            f"{API}/users/{rng.choice(data.user_ids)}/sessions/export?format={('ndjson', 'csv')[i % 2]}", {}), weight=0.1),
+        Scenario("POST /auth/login/email", "POST", lambda i: (f"{API}/auth/login/email", {"json": {
+            "email": f"bench{rng.randrange(len(data.user_ids))}@example.com", "password": BENCH_PASSWORD}}), weight=0.05),
+        Scenario("GET /auth/me", "GET", lambda i: (
+            f"{API}/auth/me", {"headers": {"Authorization": f"Bearer {rng.choice(tokens)}"}})),
+        Scenario("DELETE /users/{id}", "DELETE",
+                 lambda i: (f"{API}/users/{pop_or_missing(data.deletable_user_ids, uuid.uuid4())}", {})),
+
+        # Categories
+        Scenario("POST /category", "POST", lambda i: (f"{API}/category", {"json": {
+            "name": f"Load {run_id()}", "description": "Load test", "type": "exercise"}}), weight=0.2),
+        Scenario("POST /categories/bulk", "POST", lambda i: (f"{API}/categories/bulk", {"json": [
+            {"name": f"Bulk {run_id()}", "description": "Load test", "type": "exercise"} for _ in range(50)]}),
+            weight=0.1),
+        Scenario("GET /category/{id}", "GET", lambda i: (f"{API}/category/{rng.choice(data.category_ids)}", {})),
+        Scenario("GET /categories/all", "GET", lambda i: (f"{API}/categories/all", {})),
+        Scenario("GET /categories/cacheStats", "GET", lambda i: (f"{API}/categories/cacheStats", {})),
+
+        # Exercises
+        Scenario("POST /exercise", "POST", lambda i: (f"{API}/exercise", {"json": {
+            "name": f"Load Exercise {run_id()}", "description": "Load test",
+            "category_id": rng.choice(data.category_ids)}}), weight=0.2),
+        Scenario("POST /exercises/bulk", "POST", lambda i: (f"{API}/exercises/bulk", {"json": [
+            {"name": f"Bulk Exercise {run_id()}", "description": "Load test", "category_id": rng.choice(data.category_ids)}
+            for _ in range(200)]}), weight=0.1),
+        Scenario("GET /exercise/{id}", "GET", lambda i: (f"{API}/exercise/{rng.choice(data.exercise_ids)}", {})),
+        Scenario("GET /exercises?ids", "GET", lambda i: (f"{API}/exercises", {"params": {
+            "ids": ",".join(str(exercise_id) for exercise_id in sample(data.exercise_ids, 50))}})),
+        Scenario("GET /exercise/search", "GET", lambda i: (
+            f"{API}/exercise/search", {"params": {"query": rng.choice(["be", "bench", "row", "cable fly", "squat 1"])}})),
+        Scenario("GET /exercise/{id}/history", "GET", lambda i: (
+            f"{API}/exercise/{rng.choice(data.exercise_ids)}/history",
+            {"params": {"user_id": rng.choice(data.user_ids), "since": "2024-01-01T00:00:00Z"}})),
+        Scenario("GET /exercises/all?page", "GET", lambda i: (
+            f"{API}/exercises/all", {"params": {"page": rng.randrange(max(1, len(data.exercise_ids) // 10))}})),
+        Scenario("GET /exercises/all?cursor", "GET", lambda i: (f"{API}/exercises/all", {"params": {"cursor": ""}})),
+        Scenario("GET /exercises/all?category_id", "GET", lambda i: (
+            f"{API}/exercises/all", {"params": {"category_id": rng.choice(data.category_ids)}})),
+
+        # Routine templates
+        Scenario("POST /routineTemplates", "POST", lambda i: (f"{API}/routineTemplates", {"json": (lambda ids: {
+            "name": f"Load Template {run_id()}", "description": "Load test",
+            "sets": {str(exercise_id): [{"reps": 5}] for exercise_id in ids}, "exercises": ids,
+        })(sample(data.exercise_ids, 10))}), weight=0.2),
+        Scenario("GET /routineTemplates/{id}", "GET",
+                 lambda i: (f"{API}/routineTemplates/{rng.choice(data.template_ids)}", {})),
+        Scenario("GET /routineTemplates/{id}?include=sessions", "GET", lambda i: (
+            f"{API}/routineTemplates/{rng.choice(data.template_ids)}", {"params": {"include": "sessions"}})),
+        Scenario("GET /routineTemplates?ids", "GET", lambda i: (f"{API}/routineTemplates", {"params": {
+            "ids": ",".join(str(template_id) for template_id in sample(data.template_ids, 10))}})),
+        Scenario("DELETE /routineTemplates/{id}", "DELETE",
+                 lambda i: (f"{API}/routineTemplates/{pop_or_missing(data.deletable_template_ids, 0)}", {})),
+
+        # Routine sessions
+        Scenario("POST /routineSessions", "POST", lambda i: (f"{API}/routineSessions", {"json": session_body()}),
+                 weight=0.2),
+        Scenario("POST /routineSessions/batch", "POST", lambda i: (
+            f"{API}/routineSessions/batch", {"json": [session_body() for _ in range(100)]}), weight=0.1),
+        Scenario("GET /routineSessions/{id}", "GET",
+                 lambda i: (f"{API}/routineSessions/{rng.choice(data.session_ids)}", {})),
+        Scenario("PUT /routineSessions/{id}", "PUT",
+                 lambda i: (f"{API}/routineSessions/{rng.choice(data.session_ids)}", {"json": session_body()}),
+                 weight=0.2),
+        Scenario("DELETE /routineSessions/{id}", "DELETE",
+                 lambda i: (f"{API}/routineSessions/{pop_or_missing(data.deletable_session_ids, 0)}", {})),
+
+        # Catalog snapshot
+        Scenario("GET /catalog/snapshot", "GET", lambda i: (
+            f"{API}/catalog/snapshot", {"headers": {"Accept-Encoding": ("gzip", "identity")[i % 2]}})),
+
+        # Sync; seeded rows predate every table version, so this is a delta of the run's own writes
+        Scenario("GET /sync", "GET", lambda i: (
+            f"{API}/sync", {"params": {"since": encode_cursor(0, 0, 0, 0), "user_id": str(rng.choice(data.user_ids))}})),
+    ]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int) -> Dict:
+    """ Sends requests for one scenario from concurrency workers and summarizes the results """
+    samples, statuses = [], Counter()
+    pending = iter(range(requests))
+
+    async def worker():
+        for i in pending:
+            url, kwargs = scenario.build(i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, url, **kwargs)
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            samples.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "throughput_rps": round(requests / elapsed, 1),
+        **summarize(samples),
+        "errors": sum(count for status, count in statuses.items() if not (isinstance(status, int) and status < 400)),
+        "status_codes": {str(status): count for status, count in sorted(statuses.items(), key=str)},
+    }
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare_to_baseline(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """ Routes whose p95 grew by more than tolerance (a fraction) relative to the baseline run """
+    regressions = []
+    for name, result in report["routes"].items():
+        previous = baseline.get("routes", {}).get(name)
+        if previous and previous["p95_ms"] > 0 and result["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {result['p95_ms']}ms")
+    return regressions
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    session_factory = await create_bench_database()
+    seed_start = time.perf_counter()
+    data = await seed_database(
+        session_factory, users=args.scale * 10, categories=max(10, args.scale), exercises=args.scale * 100,
+        templates=args.scale * 10, sessions=args.scale * 100, deletable=args.requests, seed=args.seed)
+    seed_seconds = time.perf_counter() - seed_start
+
+    scenarios = [scenario for scenario in build_scenarios(data, rng)
+                 if args.only is None or re.search(args.only, scenario.name)]
+
+    async with AsyncExitStack() as stack:
+        if args.url:
+            client = await stack.enter_async_context(httpx.AsyncClient(base_url=args.url, timeout=None))
+        else:
+            import main as app_module
+            await stack.enter_async_context(app_module.lifespan(app_module.app))
+            # Unhandled app errors become 500s, as they would behind a real server
+            transport = httpx.ASGITransport(app=app_module.app, raise_app_exceptions=False)
+            client = await stack.enter_async_context(
+                httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None))
+
+        routes = {}
+        for scenario in scenarios:
+            requests = max(1, int(args.requests * scenario.weight))
+            routes[scenario.name] = await run_scenario(client, scenario, requests, args.concurrency)
+
+    report = {
+        "commit": current_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {"scale": args.scale, "requests": args.requests, "concurrency": args.concurrency,
+                   "seed": args.seed, "target": args.url or "in-process", "seed_seconds": round(seed_seconds, 2)},
+        "routes": routes,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_to_baseline(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=10, help="multiplier for the amount of seeded data")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route (scaled by route weight)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", help="regex selecting which routes to run")
+    parser.add_argument("--url", help="base url of a running server; defaults to serving main.app in-process")
+    parser.add_argument("--output", help="file to write the JSON report to")
+    parser.add_argument("--baseline", help="previous report to compare p95 latencies against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth before flagging, 0.2 = 20%%")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,119 @@
+import random
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+from sqlalchemy import insert
+
+from core.utility.password_hashing import hash_password_blocking
+from db.models import Category, Exercise, RoutineSession, RoutineTemplate, User, exercises_routine_bridge
+from db.models.session_set import sets_from_breakdown, write_session_sets
+from db.rebuild_personal_records import rebuild_personal_records
+from db.rebuild_training_rollups import rebuild_training_rollups
+
+BENCH_PASSWORD = "correct horse battery staple"
+MOVEMENTS = ["Bench Press", "Row", "Squat", "Deadlift", "Curl", "Fly", "Lunge", "Shoulder Press", "Pulldown", "Dip"]
+EQUIPMENT = ["Barbell", "Dumbbell", "Cable", "Machine", "Kettlebell", "Band", "Smith", "Landmine"]
+
+
+@dataclass
+class SeedData:
+    """ Ids of the rows created by seed_database, for scenarios to pick from """
+    user_ids: List[uuid.UUID] = field(default_factory=list)
+    category_ids: List[int] = field(default_factory=list)
+    exercise_ids: List[int] = field(default_factory=list)
+    template_ids: List[int] = field(default_factory=list)
+    session_ids: List[int] = field(default_factory=list)
+    # Rows set aside for DELETE scenarios so they do not remove data other scenarios read
+    deletable_user_ids: List[uuid.UUID] = field(default_factory=list)
+    deletable_template_ids: List[int] = field(default_factory=list)
+    deletable_session_ids: List[int] = field(default_factory=list)
+
+
+def breakdown_for(exercise_ids: List[int], rng: random.Random) -> dict:
+    return {
+        str(exercise_id): [{"reps": rng.randint(3, 12), "weight": rng.randint(20, 200)} for _ in range(rng.randint(3, 5))]
+        for exercise_id in exercise_ids
+    }
+
+
+async def _insert_returning_ids(db, model, rows: List[dict], batch_size: int = 1000) -> List:
+    ids = []
+    for start in range(0, len(rows), batch_size):
+        result = await db.execute(insert(model.__table__).returning(model.id), rows[start:start + batch_size])
+        ids.extend(result.scalars().all())
+    return ids
+
+
+async def seed_database(session_factory, users: int, categories: int, exercises: int, templates: int,
+                        sessions: int, deletable: int, seed: int = 0) -> SeedData:
+    """
+    Fills the benchmark database with synthetic data.
+
+    Args:
+        session_factory: async session factory bound to the benchmark database.
+        users, categories, exercises, templates, sessions (int): number of rows to create of each.
+        deletable (int): extra users, templates and sessions reserved for DELETE scenarios.
+        seed (int): random seed so runs are comparable.
+
+    Returns:
+        SeedData: ids of everything created.
+    """
+    rng = random.Random(seed)
+    data = SeedData()
+    password = hash_password_blocking(BENCH_PASSWORD)
+    start_of_history = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+    async with session_factory() as db:
+        user_rows = [{
+            "id": uuid.uuid4(), "first_name": "Bench", "last_name": f"User{i}", "username": f"bench{i}",
+            "phone_number": f"555{i:07d}", "email": f"bench{i}@example.com", "password": password,
+        } for i in range(users + deletable)]
+        await db.execute(insert(User.__table__), user_rows)
+        user_ids = [row["id"] for row in user_rows]
+        data.user_ids, data.deletable_user_ids = user_ids[:users], user_ids[users:]
+
+        data.category_ids = await _insert_returning_ids(db, Category, [
+            {"name": f"Category {i}", "description": "Synthetic category", "type": "exercise"} for i in range(categories)])
+
+        data.exercise_ids = await _insert_returning_ids(db, Exercise, [{
+            "name": f"{rng.choice(EQUIPMENT)} {rng.choice(MOVEMENTS)} {i}",
+            "description": "Synthetic exercise",
+            "category_id": rng.choice(data.category_ids),
+        } for i in range(exercises)])
+
+        template_exercises = [rng.sample(data.exercise_ids, min(len(data.exercise_ids), rng.randint(5, 15)))
+                              for _ in range(templates + deletable)]
+        template_ids = await _insert_returning_ids(db, RoutineTemplate, [{
+            "name": f"Template {i}",
+            "description": "Synthetic template",
+            "sets": breakdown_for(exercise_ids, rng),
+        } for i, exercise_ids in enumerate(template_exercises)])
+        await db.execute(insert(exercises_routine_bridge), [
+            {"routine_template_id": template_id, "exercises_id": exercise_id}
+            for template_id, exercise_ids in zip(template_ids, template_exercises) for exercise_id in exercise_ids])
+        data.template_ids, data.deletable_template_ids = template_ids[:templates], template_ids[templates:]
+
+        session_rows = []
+        for i in range(sessions + deletable):
+            template_index = rng.randrange(templates)
+            start = start_of_history + timedelta(hours=rng.randrange(24 * 365 * 2))
+            session_rows.append({
+                "start_time": start,
+                "end_time": start + timedelta(minutes=rng.randint(30, 120)),
+                "routine_template_id": template_ids[template_index],
+                "user_id": rng.choice(data.user_ids),
+                "breakdown": breakdown_for(template_exercises[template_index], rng),
+            })
+        session_ids = await _insert_returning_ids(db, RoutineSession, session_rows)
+        await write_session_sets(db, [
+            set_row for session_id, row in zip(session_ids, session_rows)
+            for set_row in sets_from_breakdown(session_id, row["breakdown"], row["start_time"], row["user_id"])])
+        data.session_ids, data.deletable_session_ids = session_ids[:sessions], session_ids[sessions:]
+
+        await db.commit()
+
+    await rebuild_personal_records(session_factory, batch_size=100000)
+    await rebuild_training_rollups(session_factory, batch_size=5000)
+    return data
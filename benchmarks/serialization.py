@@ -0,0 +1,74 @@
+"""
+Compares per-row CPU cost of the old read path (ORM entities, model_validate, response_model
+re-validation, JSON encoding) with column projection straight into dicts encoded by orjson.
+
+    python -m benchmarks.serialization --rows 5000
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+from benchmarks.common import create_bench_database
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+
+from core.schemas.common import RetrieveCategory, RetrieveExercise
+from db.models import Category, Exercise
+from db.projection import project_rows, select_projection
+
+
+async def cpu_per_row(fn, rows: int, repeat: int) -> float:
+    """ Process CPU time per row in microseconds, best of repeat runs """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.process_time()
+        await fn()
+        best = min(best, time.process_time() - start)
+    return round(best / rows * 1e6, 3)
+
+
+async def run(rows: int, repeat: int):
+    session_factory = await create_bench_database()
+    async with session_factory() as db:
+        await db.execute(insert(Category), [
+            {"id": i, "name": f"Category {i}", "description": "Synthetic", "type": "exercise"} for i in range(1, 101)])
+        await db.execute(insert(Exercise), [
+            {"name": f"Exercise {i}", "description": "Synthetic exercise", "category_id": i % 100 + 1}
+            for i in range(rows)])
+        await db.commit()
+
+    report = {}
+    async with session_factory() as db:
+        for label, model, schema, count in (("/categories/all", Category, RetrieveCategory, 100),
+                                            ("/exercises/all", Exercise, RetrieveExercise, rows)):
+            adapter = TypeAdapter(List[schema])
+
+            async def validated():
+                result = await db.scalars(select(model).order_by(model.name))
+                items = [schema.model_validate(entity) for entity in result.all()]
+                # FastAPI validates the returned objects against response_model before encoding
+                adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+                db.expunge_all()
+
+            async def projected():
+                result = await db.execute(select_projection(model, schema).order_by(model.name))
+                orjson.dumps(project_rows(result.all()))
+
+            report[label] = {
+                "rows": count,
+                "validated_us_per_row": await cpu_per_row(validated, count, repeat),
+                "projected_us_per_row": await cpu_per_row(projected, count, repeat),
+            }
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat))
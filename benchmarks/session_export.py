@@ -0,0 +1,122 @@
+"""
+Measures GET /users/{id}/sessions/export throughput and peak memory for growing histories.
+
+    python -m benchmarks.session_export --sessions 1000,10000,50000 --format ndjson
+
+Each export runs in a fresh child process that reports its own peak RSS, so a flat peak across
+history sizes shows the export streams rather than buffering. The app is driven through raw ASGI
+calls that discard the body, since httpx's ASGI transport would hold the whole response.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import create_bench_database
+from sqlalchemy import insert
+
+from db.models import Category, Exercise, RoutineSession, RoutineTemplate, User
+
+USER_ID = uuid.UUID("6c1f0c4e-3f43-4d8a-9a53-0d0bb0f2b7a1")
+EXERCISES = 10
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def seed(sessions: int):
+    session_factory = await create_bench_database()
+    start_of_history = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    async with session_factory() as db:
+        await db.execute(insert(User), [{"id": USER_ID, "first_name": "Bench", "last_name": "User",
+                                         "username": "bench", "email": "bench@example.com",
+                                         "phone_number": "0", "password": "x"}])
+        await db.execute(insert(Category), [{"id": 1, "name": "Strength", "type": "exercise"}])
+        await db.execute(insert(Exercise), [{"id": i, "name": f"Exercise {i}", "category_id": 1}
+                                            for i in range(1, EXERCISES + 1)])
+        await db.execute(insert(RoutineTemplate), [{"id": 1, "name": "Full Body", "sets": {}}])
+        for offset in range(0, sessions, 5000):
+            rows = []
+            for i in range(offset, min(sessions, offset + 5000)):
+                start = start_of_history + timedelta(hours=i)
+                rows.append({
+                    "start_time": start,
+                    "end_time": start + timedelta(hours=1),
+                    "routine_template_id": 1,
+                    "user_id": USER_ID,
+                    "breakdown": {str(1 + (i + j) % EXERCISES): [{"reps": 5, "weight": 100 + k, "rpe": 8}
+                                                                  for k in range(4)] for j in range(5)},
+                })
+            await db.execute(insert(RoutineSession), rows)
+        await db.commit()
+
+
+async def export(export_format: str) -> dict:
+    import main
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": f"/api/v1/users/{USER_ID}/sessions/export", "raw_path": b"", "root_path": "",
+        "query_string": f"format={export_format}".encode(), "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 0), "server": ("bench", 80),
+    }
+    received = {"status": None, "bytes": 0, "lines": 0}
+    requested, finished = False, asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Streaming responses watch for the client going away until the body is complete
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            received["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            received["bytes"] += len(body)
+            received["lines"] += body.count(b"\n")
+            if not message.get("more_body", False):
+                finished.set()
+
+    start = time.perf_counter()
+    await main.app(scope, receive, send)
+    elapsed = time.perf_counter() - start
+    rows = received["lines"] - (1 if export_format == "csv" else 0)
+    return {"status": received["status"], "rows": rows, "megabytes": round(received["bytes"] / 2 ** 20, 1),
+            "seconds": round(elapsed, 3), "rows_per_second": round(rows / elapsed, 1),
+            "peak_rss_mb": _peak_rss_mb()}
+
+
+def run(sizes, export_format: str):
+    results = []
+    for sessions in sizes:
+        asyncio.run(seed(sessions))
+        child = subprocess.run(
+            [sys.executable, "-m", "benchmarks.session_export", "--export-only", "--format", export_format],
+            check=True, capture_output=True, text=True)
+        results.append({"sessions": sessions, **json.loads(child.stdout.strip().splitlines()[-1])})
+    print(json.dumps({"format": export_format, "runs": results}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", default="1000,10000,50000", help="comma separated history sizes")
+    parser.add_argument("--format", default="ndjson", choices=("ndjson", "csv"))
+    parser.add_argument("--export-only", action="store_true", help="export the already seeded history")
+    args = parser.parse_args()
+    if args.export_only:
+        print(json.dumps(asyncio.run(export(args.format))))
+    else:
+        run([int(size) for size in args.sessions.split(",")], args.format)
@@ -0,0 +1,66 @@
+"""
+Measures routine session ingestion through POST /routineSessions/batch against one POST per session.
+
+    python -m benchmarks.session_ingest --sessions 20000 --per-request 500
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.common import create_bench_database
+import httpx
+from sqlalchemy import insert
+
+import main
+from db.models import Category, Exercise, RoutineTemplate
+
+
+def session_payload(i: int) -> dict:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(days=i)
+    return {
+        "start_time": start.isoformat(),
+        "end_time": (start + timedelta(hours=1)).isoformat(),
+        "routine_template_id": 1,
+        "breakdown": {"1": [{"reps": 5, "weight": 100 + i % 20}] * 5},
+    }
+
+
+async def run(sessions: int, single_sessions: int, per_request: int):
+    session_factory = await create_bench_database()
+    async with session_factory() as db:
+        await db.execute(insert(Category), [{"id": 1, "name": "Chest", "type": "exercise"}])
+        await db.execute(insert(Exercise), [{"id": 1, "name": "Bench Press", "category_id": 1}])
+        await db.execute(insert(RoutineTemplate), [{"id": 1, "name": "Bench Day", "sets": {}}])
+        await db.commit()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        for i in range(single_sessions):
+            await client.post("/api/v1/routineSessions", json=session_payload(i))
+        single_elapsed = time.perf_counter() - start
+
+        inserted = 0
+        start = time.perf_counter()
+        for offset in range(0, sessions, per_request):
+            batch = [session_payload(i) for i in range(offset, min(sessions, offset + per_request))]
+            response = await client.post("/api/v1/routineSessions/batch", json=batch)
+            inserted += response.json()["inserted"]
+        batch_elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "single": {"sessions": single_sessions, "sessions_per_second": round(single_sessions / single_elapsed, 1)},
+        "batch": {"sessions": inserted, "per_request": per_request,
+                  "sessions_per_second": round(inserted / batch_elapsed, 1)},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--single-sessions", type=int, default=500)
+    parser.add_argument("--per-request", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.single_sessions, args.per_request))
@@ -0,0 +1,77 @@
+"""
+Measures latency of a cheap route while a burst of signups is hashing passwords.
+
+    python -m benchmarks.signup_latency --signups 50 --mode pool
+    python -m benchmarks.signup_latency --signups 50 --mode inline
+
+--mode inline hashes on the event loop the way user creation used to, for comparison.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import create_bench_database, summarize
+import httpx
+
+import main
+from core.utility.password_hashing import hash_password_blocking, password_hasher
+
+
+async def probe(client: httpx.AsyncClient, stop: asyncio.Event, samples: list, interval: float = 0.01):
+    # Latency is measured from when each request was due, so time spent waiting on a blocked
+    # event loop counts against the request instead of silently delaying the next one.
+    due = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        await client.get("/healthCheck")
+        samples.append((time.perf_counter() - due) * 1000)
+        due += interval
+
+
+async def signup(client: httpx.AsyncClient, i: int):
+    await client.post("/api/v1/users", json={
+        "first_name": "Bench", "last_name": "User", "username": f"bench{i}",
+        "phone_number": f"555{i:07d}", "email": f"bench{i}@example.com", "password": "correct horse battery"})
+
+
+async def run(signups: int, mode: str):
+    await create_bench_database()
+    if mode == "inline":
+        async def hash_inline(password: str) -> str:
+            return hash_password_blocking(password)
+        password_hasher.hash = hash_inline
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle, burst = [], []
+        stop = asyncio.Event()
+        idle_probe = asyncio.create_task(probe(client, stop, idle))
+        await asyncio.sleep(1)
+        stop.set()
+        await idle_probe
+
+        stop = asyncio.Event()
+        burst_probe = asyncio.create_task(probe(client, stop, burst))
+        start = time.perf_counter()
+        await asyncio.gather(*(signup(client, i) for i in range(signups)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await burst_probe
+
+    password_hasher.shutdown()
+    print(json.dumps({
+        "mode": mode,
+        "signups": signups,
+        "signups_per_second": round(signups / elapsed, 2),
+        "healthCheck_idle": summarize(idle),
+        "healthCheck_during_signups": summarize(burst),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--signups", type=int, default=50)
+    parser.add_argument("--mode", choices=["pool", "inline"], default="pool")
+    args = parser.parse_args()
+    asyncio.run(run(args.signups, args.mode))
@@ -0,0 +1,57 @@
+"""
+Compares authenticated requests whose token is verified every time with ones answered from the
+verified token cache.
+
+    python -m benchmarks.token_cache --users 100 --repeat 500
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+
+from benchmarks.common import create_bench_database, summarize, time_async
+import httpx
+from sqlalchemy import insert
+
+import main
+from core.utility.auth import create_access_token, verified_tokens
+from db.models import User
+
+
+async def run(users: int, repeat: int):
+    session_factory = await create_bench_database()
+    user_ids = [uuid.uuid4() for _ in range(users)]
+    async with session_factory() as db:
+        await db.execute(insert(User.__table__), [{
+            "id": user_id, "first_name": "Bench", "last_name": "User", "username": f"bench{i}",
+            "phone_number": f"555{i:07d}", "email": f"bench{i}@example.com", "password": ""}
+            for i, user_id in enumerate(user_ids)])
+        await db.commit()
+    tokens = [create_access_token({"sub": str(user_id)}) for user_id in user_ids]
+    rng = random.Random(0)
+
+    report = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async def fetch():
+            response = await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {rng.choice(tokens)}"})
+            response.raise_for_status()
+
+        cache_size = verified_tokens.max_size
+        verified_tokens.max_size = 0
+        report["verify every request"] = summarize(await time_async(fetch, repeat))
+        verified_tokens.max_size = cache_size
+        for token in tokens:
+            await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+        report["cached"] = {**summarize(await time_async(fetch, repeat)), **verified_tokens.stats()}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.users, args.repeat))
@@ -6,5 +6,66 @@ class Settings(BaseSettings):
     DATABASE_URL: str = os.getenv("DATABASE_URL")
     SECRET_KEY: str = os.getenv("SECRET_KEY")
 
+    # Database engine
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30  # seconds to wait for a pooled connection
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced, -1 to disable
+    DB_QUERY_CACHE_SIZE: int = 500  # compiled SQL statements cached by SQLAlchemy
+    DB_PREPARED_STATEMENT_CACHE_SIZE: int = 100  # per connection, asyncpg only; 0 behind pgbouncer
+
+    # SQL instrumentation
+    SQL_INSTRUMENTATION: bool = True
+    SQL_LOG_SIZE: int = 200  # requests kept in the rolling log
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5  # identical statement shapes in one request before it is flagged
+
+    # Password hashing
+    PASSWORD_HASH_ROUNDS: int = 12  # bcrypt work factor, each +1 doubles the cost
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # "thread" or "process"
+    PASSWORD_HASH_WORKERS: int = 4
+
+    # Authentication
+    AUTH_TOKEN_CACHE_SIZE: int = 10000  # verified access tokens kept per worker, 0 to verify every request
+
+    # Admission control, per worker process
+    ADMISSION_CONTROL: bool = True
+    RATE_LIMIT_PER_SECOND: float = 0  # sustained requests per user or client address, 0 to disable; see the README before enabling
+    RATE_LIMIT_BURST: int = 40  # requests a client may send at once before the rate applies
+    RATE_LIMIT_MAX_CLIENTS: int = 10000  # token buckets kept, least recently seen dropped first
+    ADMISSION_READ_CONCURRENCY: int = 20  # requests running at once; keep near DB_POOL_SIZE + DB_MAX_OVERFLOW
+    ADMISSION_READ_QUEUE: int = 200  # requests waiting for a slot before new ones get a 503
+    ADMISSION_WRITE_CONCURRENCY: int = 10
+    ADMISSION_WRITE_QUEUE: int = 100
+    ADMISSION_PASSWORD_CONCURRENCY: int = 4  # signups and logins; keep near PASSWORD_HASH_WORKERS
+    ADMISSION_PASSWORD_QUEUE: int = 20
+    ADMISSION_QUEUE_TIMEOUT: float = 5  # seconds a queued request waits before a 503, below DB_POOL_TIMEOUT
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1  # Retry-After sent with a 503
+
+    # Bulk imports
+    BULK_IMPORT_BATCH_SIZE: int = 1000  # rows per multi-row INSERT
+
+    # Multi-get
+    MULTI_GET_MAX_IDS: int = 100  # ids accepted by one ?ids= request
+
+    # HTTP caching, per router; responses also carry an ETag clients revalidate with If-None-Match
+    CATEGORY_CACHE_CONTROL: str = "public, max-age=60"
+    EXERCISE_CACHE_CONTROL: str = "public, max-age=60"
+    ROUTINE_TEMPLATE_CACHE_CONTROL: str = "private, no-cache"  # templates can belong to a user
+    CATALOG_SNAPSHOT_CACHE_CONTROL: str = "public, max-age=60"
+
+    # Category cache
+    CATEGORY_CACHE_CHECK_SECONDS: float = 5  # how long other workers' category writes can go unnoticed
+
+    # Catalog snapshot
+    CATALOG_SNAPSHOT_CHECK_SECONDS: float = 5  # how long other workers' catalog writes can go unnoticed
+
+    # Internal routes
+    INTERNAL_ROUTES_ENABLED: bool = False  # mounts /internal/*, which is unauthenticated; keep off where it is reachable publicly
+
+    # Exports
+    EXPORT_CHUNK_SIZE: int = 500  # sessions fetched per server-side cursor round trip
+
 
 settings = Settings()
\ No newline at end of file
@@ -2,7 +2,7 @@ import json
 
 from pydantic import BaseModel, UUID4
 from typing import Dict, Optional, List, Union
-from datetime import datetime
+from datetime import date, datetime
 
 
 # USER
@@ -36,6 +36,14 @@ class RetrieveUser(BaseModel):
         from_attributes = True
 
 
+class RetrieveUserBatch(BaseModel):
+    """
+    Schema defining users fetched by id, in request order with None for ids that do not exist
+    """
+    items: List[Optional[RetrieveUser]]
+    missing: List[UUID4]
+
+
 class UserLoginWithEmail(BaseModel):
     """
     Schema defining attributes to login as a user
@@ -108,12 +116,58 @@ class RetrieveExercise(BaseModel):
         from_attributes = True
 
 
+class RetrieveExerciseBatch(BaseModel):
+    """
+    Schema defining exercises fetched by id, in request order with None for ids that do not exist
+    """
+    items: List[Optional[RetrieveExercise]]
+    missing: List[int]
+
+
+class RetrieveExercisePage(BaseModel):
+    """
+    Schema defining a page of exercises fetched with a cursor
+    """
+    items: List[RetrieveExercise]
+    next_cursor: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+# BULK IMPORT
+class BulkRowError(BaseModel):
+    """
+    Schema describing why one row of a bulk import was rejected
+    """
+    index: int
+    error: str
+
+
+class BulkImportResult(BaseModel):
+    """
+    Schema defining the outcome of a bulk import
+    """
+    inserted: int
+    ids: List[int]
+    errors: List[BulkRowError]
+
+
+class BulkDeleteResult(BaseModel):
+    """
+    Schema defining the outcome of a bulk delete
+    """
+    deleted: List[int]
+    missing: List[int]
+
+
 # ROUTINE TEMPLATE
 class CreateUpdateRoutineTemplate(BaseModel):
     name: str
     description: Optional[str] = None
     sets: Optional[Dict] = None
     exercises: Optional[List[int]] = None  # List of exercise IDs
+    user_id: Optional[UUID4] = None  # Owner, None for templates shared by everyone
 
     class Config:
         from_attributes = True
@@ -121,8 +175,8 @@ class CreateUpdateRoutineTemplate(BaseModel):
     def validate(self) -> Union[Dict, None]:
         """ Basic checks to validate this routine session before trying to create entity in db. """
         issues = {}
-        for key, val in self.sets.items():
-            if int(key) not in self.exercises:
+        for key, val in (self.sets or {}).items():
+            if int(key) not in (self.exercises or []):
                 issues[f"exercise-{key}"] = f"Set for exercise (id#{key}) not in exercise list."
         return issues
 
@@ -132,30 +186,204 @@ class RetrieveRoutineTemplate(BaseModel):
     name: str
     description: Optional[str] = None
     sets: Optional[Dict] = None
+    user_id: Optional[UUID4] = None
     exercises: Optional[List[RetrieveExercise]] = None
 
     class Config:
         from_attributes = True
 
 
+class RetrieveRoutineTemplateBatch(BaseModel):
+    """
+    Schema defining routine templates fetched by id, in request order with None for ids that do not exist
+    """
+    items: List[Optional[RetrieveRoutineTemplate]]
+    missing: List[int]
+
+
+class RoutineSessionSummary(BaseModel):
+    """
+    Schema defining a session as listed under its routine template
+    """
+    id: int
+    start_time: datetime
+    end_time: datetime
+    breakdown: Optional[dict] = None
+
+    class Config:
+        from_attributes = True
+
+
+class RetrieveRoutineTemplateWithSessions(RetrieveRoutineTemplate):
+    """
+    Schema defining a routine template along with a page of its most recent sessions
+    """
+    routine_sessions: List[RoutineSessionSummary] = []
+    sessions_next_cursor: Optional[str] = None
+
+
 # ROUTINE SESSION
 class CreateUpdateRoutineSession(BaseModel):
     start_time: datetime
     end_time: datetime
     routine_template_id: Optional[int] = None
+    user_id: Optional[UUID4] = None
+    breakdown: Optional[dict] = None
+
+    class Config:
+        from_attributes = True
+
+    def validate(self) -> Dict:
+        """ Basic checks to validate this routine session before trying to create entity in db. """
+        issues = {}
+        if self.end_time < self.start_time:
+            issues["end_time"] = "Session ends before it starts."
+        for key, sets in (self.breakdown or {}).items():
+            for index, entry in enumerate(sets if isinstance(sets, list) else []):
+                reps = entry.get("reps") if isinstance(entry, dict) else None
+                if isinstance(reps, float) and not reps.is_integer():
+                    issues[f"exercise-{key}-set-{index}"] = f"Reps of set {index} for exercise (id#{key}) must be a whole number."
+        return issues
+
+
+class RoutineTemplateSummary(BaseModel):
+    """
+    Schema defining the template a session was logged against, as listed in a user's history
+    """
+    id: int
+    name: str
+
+
+class UserSessionSummary(BaseModel):
+    """
+    Schema defining a session as listed in its user's history
+    """
+    id: int
+    start_time: datetime
+    end_time: datetime
+    routine_template_id: Optional[int] = None
+    routine_template: Optional[RoutineTemplateSummary] = None
     breakdown: Optional[dict] = None
-    routine_template: RetrieveRoutineTemplate
+
+
+class UserSessionPage(BaseModel):
+    """
+    Schema defining a page of a user's sessions, newest first; pass next_before as before for the next page
+    """
+    sessions: List[UserSessionSummary]
+    next_before: Optional[str] = None
+
+
+class RetrieveSessionSet(BaseModel):
+    """
+    Schema defining one logged set, as stored in session_sets
+    """
+    session_id: int
+    exercise_id: int
+    set_index: int
+    reps: Optional[int] = None
+    weight: Optional[float] = None
+    rpe: Optional[float] = None
+    performed_at: datetime
 
     class Config:
         from_attributes = True
 
 
+class PersonalRecordEntry(BaseModel):
+    """
+    Schema defining the heaviest set logged for one rep count
+    """
+    reps: int
+    weight: float
+    session_id: int
+    achieved_at: datetime
+
+
+class ExercisePersonalRecords(BaseModel):
+    """
+    Schema defining a user's records for one exercise
+    """
+    exercise_id: int
+    estimated_1rm: Optional[float] = None
+    records: List[PersonalRecordEntry]
+
+
+class CategoryTrainingStats(BaseModel):
+    """
+    Schema defining a user's training in one exercise category over one bucket
+    """
+    category_id: int
+    sessions: int
+    sets: int
+    tonnage: float
+
+
+class TrainingStatsBucket(BaseModel):
+    """
+    Schema defining a user's training over one day, week or month, starting on bucket_start
+    """
+    bucket_start: date
+    sessions: int
+    duration_seconds: float
+    sets: int
+    tonnage: float
+    categories: List[CategoryTrainingStats]
+
+
 class RetrieveRoutineSession(BaseModel):
+    id: int
     start_time: datetime
     end_time: datetime
     routine_template_id: Optional[int] = None
+    user_id: Optional[UUID4] = None
     breakdown: Optional[dict] = None
-    routine_template: RetrieveRoutineTemplate
+    routine_template: Optional[RetrieveRoutineTemplate] = None
 
     class Config:
         from_attributes = True
+
+
+class SyncRoutineSession(BaseModel):
+    """
+    Schema defining a session as sent by delta sync, without its template, which syncs on its own
+    """
+    id: int
+    start_time: datetime
+    end_time: datetime
+    routine_template_id: Optional[int] = None
+    user_id: Optional[UUID4] = None
+    breakdown: Optional[dict] = None
+
+    class Config:
+        from_attributes = True
+
+
+class SyncChanges(BaseModel):
+    """
+    Schema defining the rows written and deleted since a sync token; pass token as since for the next sync
+    """
+    token: str
+    categories: List[RetrieveCategory]
+    exercises: List[RetrieveExercise]
+    routine_templates: List[RetrieveRoutineTemplate]
+    routine_sessions: List[SyncRoutineSession]
+    deleted: Dict[str, List[int]]
+
+
+class CatalogSnapshot(BaseModel):
+    """
+    Schema defining every category and exercise, for a client's first launch; pass sync_token as since to sync from there
+    """
+    sync_token: str
+    categories: List[RetrieveCategory]
+    exercises: List[RetrieveExercise]
+
+
+class AccessToken(BaseModel):
+    """
+    Schema defining the bearer token returned by a login; send it as "Authorization: Bearer <access_token>"
+    """
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
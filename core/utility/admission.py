@@ -0,0 +1,220 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Union
+
+from starlette.responses import JSONResponse
+
+from core.config import Settings, settings
+from core.utility.auth import verified_tokens
+
+# Routes that hash or verify a password with bcrypt, admitted separately from other writes
+PASSWORD_ROUTES = {
+    ("POST", "/api/v1/users"),
+    ("POST", "/api/v1/auth/login/email"),
+    ("POST", "/api/v1/auth/login/phone"),
+}
+
+
+def route_class(method: str, path: str) -> Union[str, None]:
+    """ The concurrency class a request is admitted under, or None for requests that skip admission """
+    if method == "OPTIONS" or path == "/healthCheck" or path.startswith("/internal/"):
+        return None
+    if (method, path) in PASSWORD_ROUTES:
+        return "password"
+    if method in ("GET", "HEAD"):
+        return "read"
+    return "write"
+
+
+class RateLimiter:
+    """
+    Token bucket per client: each client may send burst requests at once and rate requests per
+    second after that. Buckets of the least recently seen clients are dropped beyond max_clients,
+    which only ever resets a client to a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.limited = 0
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def acquire(self, client: str) -> float:
+        """ Takes a token from the client's bucket; returns 0 if one was available, else seconds until one is """
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = [float(self.burst), now]
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(client)
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        self.limited += 1
+        return (1 - bucket[0]) / self.rate
+
+    def stats(self) -> Dict[str, int]:
+        return {"rate_limited": self.limited, "clients": len(self._buckets)}
+
+
+class ConcurrencyLimit:
+    """
+    Admits up to limit requests of a route class at a time. Requests beyond it wait in a FIFO queue
+    of at most max_queue, and are turned away at once when the queue is full or after waiting
+    timeout seconds, instead of piling up on the connection pool.
+    """
+
+    def __init__(self, limit: int, max_queue: int, timeout: float):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_waiting = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> bool:
+        """ Waits for a slot; False if the request should be shed """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.max_waiting = max(self.max_waiting, len(self._waiters))
+        try:
+            # release() hands its slot over by resolving the waiter, so active is not touched here
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            return False
+        except asyncio.CancelledError:
+            # The client went away; pass on a slot that was handed over just before
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+        self.admitted += 1
+        return True
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": len(self._waiters),
+            "max_waiting": self.max_waiting,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+class AdmissionController:
+    """ The rate limiter and the per route class concurrency limits one worker process admits requests with """
+
+    def __init__(self, config: Settings):
+        self.retry_after = config.ADMISSION_RETRY_AFTER_SECONDS
+        self.rate_limiter = RateLimiter(config.RATE_LIMIT_PER_SECOND, config.RATE_LIMIT_BURST, config.RATE_LIMIT_MAX_CLIENTS)
+        self.limits = {
+            "read": ConcurrencyLimit(config.ADMISSION_READ_CONCURRENCY, config.ADMISSION_READ_QUEUE,
+                                     config.ADMISSION_QUEUE_TIMEOUT),
+            "write": ConcurrencyLimit(config.ADMISSION_WRITE_CONCURRENCY, config.ADMISSION_WRITE_QUEUE,
+                                      config.ADMISSION_QUEUE_TIMEOUT),
+            "password": ConcurrencyLimit(config.ADMISSION_PASSWORD_CONCURRENCY, config.ADMISSION_PASSWORD_QUEUE,
+                                         config.ADMISSION_QUEUE_TIMEOUT),
+        }
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {"rate_limit": self.rate_limiter.stats(), **{name: limit.stats() for name, limit in self.limits.items()}}
+
+
+def client_key(scope) -> str:
+    """
+    The key a request is rate limited under: the user of a bearer token this worker has already
+    verified, otherwise the client address. Unverified tokens are not trusted to name a user. Behind
+    a proxy the address is only the client's when the server trusts the proxy's forwarded headers
+    (uvicorn --forwarded-allow-ips), which is why the rate limit is off by default.
+    """
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                subject = verified_tokens.subject(token.strip())
+                if subject is not None:
+                    return f"user:{subject}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware that rate limits each client and bounds how many reads, writes and password
+    requests run at once. Requests over a client's rate get a 429 and requests that cannot be
+    admitted soon enough get a 503, both with Retry-After, so load is shed before it reaches the
+    connection pool.
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        name = route_class(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        wait = self.controller.rate_limiter.acquire(client_key(scope))
+        if wait > 0:
+            await _reject(scope, receive, send, 429, "Too many requests", math.ceil(wait))
+            return
+        limit = self.controller.limits[name]
+        if not await limit.acquire():
+            await _reject(scope, receive, send, 503, "Server is busy", self.controller.retry_after)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limit.release()
+
+
+async def _reject(scope, receive, send, status_code: int, detail: str, retry_after: int):
+    response = JSONResponse({"detail": detail}, status_code=status_code, headers={"Retry-After": str(retry_after)})
+    await response(scope, receive, send)
+
+
+admission_controller = AdmissionController(settings)
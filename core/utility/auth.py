@@ -1,4 +1,8 @@
-from datetime import datetime, timedelta
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Tuple, Union
+
 from jose import JWTError, jwt
 from core.config import settings
 
@@ -9,9 +13,98 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 45
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
-        expire = datetime.now(datetime.UTC) + expires_delta
+        expire = datetime.now(timezone.utc) + expires_delta
     else:
-        expire = datetime.now(datetime.UTC) + timedelta(minutes=15)
+        expire = datetime.now(timezone.utc) + timedelta(minutes=15)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    return encoded_jwt
+
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """
+    Verifies a token's signature and expiry and returns its claims.
+
+    Args:
+        token (str): JWT issued by create_access_token.
+
+    Returns:
+        dict: the token's claims.
+
+    Raises:
+        JWTError: if the token is malformed, forged, expired or has no subject.
+    """
+    claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require_exp": True, "require_sub": True})
+    return claims
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of tokens that already passed decode_access_token, with what their verification
+    resolved to (e.g. the user), so repeated requests skip the HMAC check and the lookup.
+
+    Entries are dropped once their token's exp passes, and the least recently used entry is evicted
+    when the cache is full. Each worker process keeps its own copy.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[Any, Any, float]]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, token: str) -> Union[Any, None]:
+        entry = self._entries.get(token)
+        if entry is None or entry[2] <= time.time():
+            if entry is not None:
+                del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return entry[1]
+
+    def subject(self, token: str) -> Union[Any, None]:
+        """ The subject of a cached, unexpired token, without counting a hit or refreshing its recency """
+        entry = self._entries.get(token)
+        if entry is None or entry[2] <= time.time():
+            return None
+        return entry[0]
+
+    def store(self, token: str, subject: Any, principal: Any, expires_at: float):
+        """
+        Caches a verified token until expires_at.
+
+        Args:
+            token (str): the verified token.
+            subject: the token's sub, used by invalidate_subject.
+            principal: what the token resolved to, returned by get.
+            expires_at (float): the token's exp as a unix timestamp.
+        """
+        if self.max_size <= 0:
+            return
+        self._entries[token] = (subject, principal, expires_at)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate_subject(self, subject: Any):
+        """ Drops every cached token of a subject, e.g. a user that was deleted """
+        for token in [token for token, entry in self._entries.items() if entry[0] == subject]:
+            del self._entries[token]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+        }
+
+
+verified_tokens = VerifiedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
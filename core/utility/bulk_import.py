@@ -0,0 +1,59 @@
+import json
+from typing import Any, List, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from core.schemas.common import BulkRowError
+
+
+def parse_bulk_payload(body: bytes, content_type: str) -> Tuple[List[Tuple[int, Any]], List[BulkRowError]]:
+    """
+    Splits a bulk request body into rows. NDJSON bodies are parsed line by line so one bad line
+    only fails that row; anything else must be a JSON array.
+
+    Args:
+        body (bytes): raw request body.
+        content_type (str): the request's Content-Type header.
+
+    Returns:
+        tuple: (row index, decoded row) pairs and the rows that could not be decoded.
+
+    Raises:
+        ValueError: if a JSON array body cannot be decoded.
+    """
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        rows, errors = [], []
+        for index, line in enumerate(body.splitlines()):
+            if not line.strip():
+                continue
+            try:
+                rows.append((index, json.loads(line)))
+            except ValueError as e:
+                errors.append(BulkRowError(index=index, error=f"Invalid JSON: {e}"))
+        return rows, errors
+
+    payload = json.loads(body)
+    if not isinstance(payload, list):
+        raise ValueError("Expected a JSON array or NDJSON body")
+    return list(enumerate(payload)), []
+
+
+def validate_bulk_rows(rows: List[Tuple[int, Any]], schema: Type[BaseModel]) -> Tuple[List[Tuple[int, BaseModel]], List[BulkRowError]]:
+    """
+    Validates decoded rows against a schema.
+
+    Args:
+        rows: (row index, decoded row) pairs.
+        schema: pydantic model every row must satisfy.
+
+    Returns:
+        tuple: (row index, model) pairs for valid rows and an error per invalid row.
+    """
+    valid, errors = [], []
+    for index, row in rows:
+        try:
+            valid.append((index, schema.model_validate(row)))
+        except ValidationError as e:
+            messages = "; ".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors())
+            errors.append(BulkRowError(index=index, error=messages))
+    return valid, errors
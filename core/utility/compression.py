@@ -0,0 +1,58 @@
+import gzip
+from typing import Dict, Iterable, Union
+
+try:
+    import brotli
+except ImportError:  # optional; without it responses are offered gzipped and uncompressed only
+    brotli = None
+
+# Content codings in order of preference when a client accepts several equally
+ENCODINGS = ("br", "gzip", "identity")
+
+
+def compress_variants(body: bytes) -> Dict[str, bytes]:
+    """
+    Encodes a body once per supported content coding, at the highest compression level since the
+    result is meant to be stored and served many times.
+
+    Args:
+        body (bytes): uncompressed body.
+
+    Returns:
+        dict: body per content coding, always including "identity".
+    """
+    variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    return variants
+
+
+def negotiate_encoding(accept_encoding: Union[str, None], available: Iterable[str]) -> str:
+    """
+    Picks the content coding to answer with from an Accept-Encoding header.
+
+    Args:
+        accept_encoding (str | None): the request's Accept-Encoding header.
+        available (iterable): codings a body exists in, e.g. the keys from compress_variants.
+
+    Returns:
+        str: the accepted coding with the highest q-value, ties broken by ENCODINGS order.
+    """
+    if not accept_encoding:
+        return "identity"
+    weights = {}
+    for entry in accept_encoding.split(","):
+        coding, _, params = entry.strip().partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    candidates = [coding for coding in ENCODINGS if coding in available]
+    best = max(candidates, key=lambda coding: (weights.get(coding, weights.get("*", 0.0)), -ENCODINGS.index(coding)))
+    if weights.get(best, weights.get("*", 0.0)) <= 0 and best != "identity":
+        return "identity"
+    return best
@@ -0,0 +1,33 @@
+from typing import Any
+
+from fastapi import Request, Response
+
+
+def strong_etag(*parts: Any) -> str:
+    """ Quoted ETag built from the versions a representation depends on, e.g. ("exercises", 42) """
+    return '"' + ".".join(str(part) for part in parts) + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Whether the request's If-None-Match lists etag. Uses the weak comparison RFC 9110 prescribes for
+    If-None-Match, so a W/ prefix added by a proxy still matches.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """ Bodiless 304 carrying the validators a 200 would have """
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def with_validators(response: Response, etag: str, cache_control: str) -> Response:
+    """ Adds the ETag and the router's Cache-Control policy to a full response """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
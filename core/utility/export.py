@@ -0,0 +1,45 @@
+import csv
+import io
+from datetime import datetime
+from typing import Dict, List, Sequence
+
+import orjson
+
+# Media type of each supported export format
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def encode_ndjson(rows: List[Dict]) -> bytes:
+    """ One JSON object per line, newline terminated """
+    return b"".join(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def encode_csv(rows: List[Dict], columns: Sequence[str], header: bool = False) -> bytes:
+    """
+    Encodes rows as CSV lines in the order of columns.
+
+    Args:
+        rows (list): dicts holding at least the given columns.
+        columns (sequence): column names, in output order.
+        header (bool): whether to start with a line of column names, i.e. for the first chunk.
+
+    Returns:
+        bytes: UTF-8 encoded CSV.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(columns)
+    writer.writerows([_csv_value(row[column]) for column in columns] for row in rows)
+    return buffer.getvalue().encode()
@@ -0,0 +1,50 @@
+from typing import Any, Callable, Dict, Hashable, List
+
+from core import settings
+
+
+def parse_ids(raw: str, parse: Callable[[str], Hashable] = int) -> List:
+    """
+    Parses a comma separated ?ids= value, dropping duplicates but keeping the order ids were asked for.
+
+    Args:
+        raw (str): the query parameter value, e.g. "3,1,2".
+        parse: converts one id, e.g. int or uuid.UUID.
+
+    Returns:
+        list: the parsed ids.
+
+    Raises:
+        ValueError: if an id does not parse, or more than MULTI_GET_MAX_IDS ids were given.
+    """
+    ids = []
+    for part in raw.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            ids.append(parse(part))
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid id: {part}")
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > settings.MULTI_GET_MAX_IDS:
+        raise ValueError(f"At most {settings.MULTI_GET_MAX_IDS} ids can be requested at once.")
+    return ids
+
+
+def in_request_order(ids: List, found: Dict[Any, Any]) -> Dict[str, List]:
+    """
+    Lines looked up rows back up with the ids that were requested.
+
+    Args:
+        ids (list): ids in the order they were requested.
+        found (dict): rows that exist, keyed by id.
+
+    Returns:
+        dict: "items" with one entry per requested id (None where it does not exist), and
+        "missing" listing those ids.
+    """
+    return {
+        "items": [found.get(item_id) for item_id in ids],
+        "missing": [item_id for item_id in ids if item_id not in found],
+    }
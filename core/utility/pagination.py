@@ -0,0 +1,56 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Sequence, Tuple, Union
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encodes the sort key of the last row on a page into an opaque cursor.
+
+    Args:
+        values: the column values the listing is ordered by, e.g. (name, id).
+
+    Returns:
+        str: url-safe cursor string to hand back to the client.
+    """
+    raw = json.dumps(list(values), separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type] = None) -> Union[Tuple[Any, ...], None]:
+    """
+    Decodes a cursor produced by encode_cursor.
+
+    Args:
+        cursor (str): cursor string received from the client.
+        types (sequence): expected type of each value, e.g. (str, int). A datetime value is expected
+            as the ISO string encode_cursor was given and is returned parsed.
+
+    Returns:
+        tuple: the encoded sort key, or None if the cursor is malformed or does not match types.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        print(f"Invalid cursor provided: {cursor}")
+        return None
+    if not isinstance(values, list):
+        return None
+    if types is None:
+        return tuple(values)
+    if len(values) != len(types):
+        return None
+    typed = []
+    for value, expected in zip(values, types):
+        if expected is datetime:
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                return None
+        # bool is an int subclass, but never a valid key column value
+        elif not isinstance(value, expected) or isinstance(value, bool):
+            return None
+        typed.append(value)
+    return tuple(typed)
@@ -0,0 +1,93 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Union
+
+from passlib.context import CryptContext
+
+from core.config import settings
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.PASSWORD_HASH_ROUNDS)
+
+
+def hash_password_blocking(password: str) -> str:
+    """ Hashes a password on the calling thread """
+    return pwd_context.hash(password)
+
+
+def verify_password_blocking(password: str, hashed_password: str) -> bool:
+    """ Checks a password against its hash on the calling thread """
+    return pwd_context.verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification in a worker pool so a signup or login does not block the
+    event loop for the whole duration of the hash.
+    """
+
+    def __init__(self, executor_type: str, workers: int):
+        if executor_type not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {executor_type}")
+        self.executor_type = executor_type
+        self.workers = workers
+        self._executor: Union[Executor, None] = None
+        self._dummy_hash: Union[str, None] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def hash(self, password: str) -> str:
+        """
+        Hashes a password in the worker pool.
+
+        Args:
+            password (str): plain text password.
+
+        Returns:
+            str: the bcrypt hash.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), hash_password_blocking, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """
+        Checks a password against its hash in the worker pool.
+
+        Args:
+            password (str): plain text password.
+            hashed_password (str): stored bcrypt hash.
+
+        Returns:
+            bool: True if the password matches.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), verify_password_blocking, password, hashed_password)
+
+    async def verify_dummy(self, password: str) -> bool:
+        """
+        Checks a password against a fixed hash made with the same work factor, so a login for an
+        unknown account takes as long as one with a wrong password. Always False.
+
+        Args:
+            password (str): plain text password.
+
+        Returns:
+            bool: False.
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = await self.hash("liftmore-dummy-password")
+        await self.verify(password, self._dummy_hash)
+        return False
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_EXECUTOR, settings.PASSWORD_HASH_WORKERS)
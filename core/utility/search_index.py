@@ -0,0 +1,188 @@
+import heapq
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+
+def normalize(text: str) -> str:
+    """ Lowercases and collapses whitespace so lookups are case-insensitive """
+    return " ".join(text.lower().split())
+
+
+def trigrams(text: str) -> Set[str]:
+    """ All 3-character substrings of text """
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NgramSearchIndex:
+    """
+    In-memory substring index over entity names.
+
+    Matches are the same as `name ILIKE '%q%'` for queries of three or more characters, while one
+    and two character queries only match at the start of a word. Results are ranked in tiers: names
+    starting with the query, then names with a word starting with it, then any other substring
+    match. The first two tiers are read in order from sorted name and token lists, so a search
+    stops as soon as it has enough results; only the last tier has to intersect trigram postings.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._names: Dict[int, str] = {}
+        self._entries: Dict[int, Any] = {}
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._sorted_names: List[Tuple[str, int]] = []
+        self._tokens: List[Tuple[str, int]] = []
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, item_id: int) -> Any:
+        """ The entry indexed for item_id, or None """
+        return self._entries.get(item_id)
+
+    def build(self, items: Iterable[Tuple[int, str, Any]]):
+        """
+        Replaces the index contents.
+
+        Args:
+            items: (id, name, entry) tuples, where entry is what search returns for that id.
+        """
+        self._names.clear()
+        self._entries.clear()
+        self._postings.clear()
+        for item_id, name, entry in items:
+            self._add(item_id, name, entry)
+        self._sorted_names = sorted((name, item_id) for item_id, name in self._names.items())
+        self._tokens = sorted(
+            (token, item_id) for item_id, name in self._names.items() for token in set(name.split()))
+        self.ready = True
+
+    def upsert(self, item_id: int, name: str, entry: Any):
+        """ Adds an entry, or replaces it if the id is already indexed """
+        self.remove(item_id)
+        self._add(item_id, name, entry)
+        normalized = self._names[item_id]
+        insort(self._sorted_names, (normalized, item_id))
+        for token in set(normalized.split()):
+            insort(self._tokens, (token, item_id))
+
+    def upsert_many(self, items: Iterable[Tuple[int, str, Any]]):
+        """ Adds or replaces many entries, re-sorting the lookup lists once instead of per entry """
+        added = []
+        for item_id, name, entry in items:
+            if item_id in self._names:
+                self.remove(item_id)
+            self._add(item_id, name, entry)
+            added.append(item_id)
+        self._sorted_names.extend((self._names[item_id], item_id) for item_id in added)
+        self._sorted_names.sort()
+        self._tokens.extend((token, item_id) for item_id in added for token in set(self._names[item_id].split()))
+        self._tokens.sort()
+
+    def remove(self, item_id: int):
+        """ Removes an entry if present """
+        name = self._names.pop(item_id, None)
+        if name is None:
+            return
+        self._entries.pop(item_id, None)
+        for gram in trigrams(name):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(item_id)
+                if not posting:
+                    del self._postings[gram]
+        _remove_sorted(self._sorted_names, (name, item_id))
+        for token in set(name.split()):
+            _remove_sorted(self._tokens, (token, item_id))
+
+    def remove_where(self, predicate):
+        """ Removes every entry for which predicate(entry) is true """
+        for item_id in [item_id for item_id, entry in self._entries.items() if predicate(entry)]:
+            self.remove(item_id)
+
+    def search(self, query: str, limit: int = 10, offset: int = 0) -> List[Any]:
+        """
+        Finds entries whose name contains the query.
+
+        Args:
+            query (str): text to search for.
+            limit (int): maximum number of results to return.
+            offset (int): number of ranked results to skip.
+
+        Returns:
+            list: entries in rank order.
+        """
+        term = normalize(query)
+        if not term or limit <= 0:
+            return []
+
+        # Every match contains all of the query's trigrams, so a missing one means no results
+        if any(gram not in self._postings for gram in trigrams(term)):
+            return []
+
+        wanted = offset + limit
+        ranked = self._prefix_matches(term, wanted)
+        if len(ranked) < wanted:
+            ranked.extend(self._word_prefix_matches(term, wanted - len(ranked)))
+        if len(ranked) < wanted and len(term) >= 3:
+            ranked.extend(self._substring_matches(term, wanted - len(ranked)))
+        return [self._entries[item_id] for item_id in ranked[offset:wanted]]
+
+    def _add(self, item_id: int, name: str, entry: Any):
+        normalized = normalize(name)
+        self._names[item_id] = normalized
+        self._entries[item_id] = entry
+        for gram in trigrams(normalized):
+            self._postings[gram].add(item_id)
+
+    def _prefix_matches(self, term: str, wanted: int) -> List[int]:
+        matches = []
+        index = bisect_left(self._sorted_names, (term,))
+        while len(matches) < wanted and index < len(self._sorted_names):
+            name, item_id = self._sorted_names[index]
+            if not name.startswith(term):
+                break
+            matches.append(item_id)
+            index += 1
+        return matches
+
+    def _word_prefix_matches(self, term: str, wanted: int) -> List[int]:
+        # Scan tokens starting with the query's first word and keep names where the whole query
+        # starts a word other than the first one (those were already ranked as prefix matches).
+        matches, seen = [], set()
+        bounded_term = f" {term}"
+        first_word = term.split(" ", 1)[0]
+        index = bisect_left(self._tokens, (first_word,))
+        while len(matches) < wanted and index < len(self._tokens):
+            token, item_id = self._tokens[index]
+            if not token.startswith(first_word):
+                break
+            if item_id not in seen:
+                seen.add(item_id)
+                if bounded_term in self._names[item_id]:
+                    matches.append(item_id)
+            index += 1
+        return matches
+
+    def _substring_matches(self, term: str, wanted: int) -> List[int]:
+        postings = []
+        for gram in trigrams(term):
+            posting = self._postings.get(gram)
+            if not posting:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        bounded_term = f" {term}"
+        names = self._names
+        candidates = [
+            item_id for item_id in postings[0].intersection(*postings[1:])
+            if term in names[item_id] and not names[item_id].startswith(term) and bounded_term not in names[item_id]
+        ]
+        return heapq.nsmallest(wanted, candidates, key=names.__getitem__)
+
+
+def _remove_sorted(items: List[Tuple[str, int]], item: Tuple[str, int]):
+    """ Removes item from a sorted list if present """
+    index = bisect_left(items, item)
+    if index < len(items) and items[index] == item:
+        del items[index]
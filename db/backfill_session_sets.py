@@ -0,0 +1,78 @@
+"""
+Fills session_sets from the JSON breakdown of routine sessions logged before the table existed.
+
+    python -m db.backfill_session_sets --batch-size 1000
+    python -m db.backfill_session_sets --all   # rebuild the sets of every session
+
+Sessions are processed in id order, one transaction per batch, so the backfill can be stopped and
+rerun. Sets referring to exercises that no longer exist are skipped.
+"""
+import argparse
+import asyncio
+from typing import Dict
+
+from sqlalchemy import delete, exists, select
+
+from db.connection import async_session, engine
+from db.models import Exercise, RoutineSession, SessionSet
+from db.models.session_set import sets_from_breakdown, write_session_sets
+
+
+async def backfill_session_sets(session_factory, batch_size: int, rebuild: bool = False) -> Dict[str, int]:
+    """
+    Converts session breakdowns into session_sets rows.
+
+    Args:
+        session_factory: async session factory for the database to backfill.
+        batch_size (int): number of sessions per transaction.
+        rebuild (bool): replace the sets of every session instead of only sessions that have none.
+
+    Returns:
+        dict: number of sessions processed, sets written and sets skipped.
+    """
+    totals = {"sessions": 0, "sets": 0, "skipped_sets": 0}
+    last_id = 0
+    while True:
+        async with session_factory() as db:
+            query = (
+                select(RoutineSession.id, RoutineSession.start_time, RoutineSession.breakdown, RoutineSession.user_id)
+                .where(RoutineSession.id > last_id))
+            if not rebuild:
+                query = query.where(~exists().where(SessionSet.session_id == RoutineSession.id))
+            sessions = (await db.execute(query.order_by(RoutineSession.id).limit(batch_size))).all()
+            if not sessions:
+                break
+
+            rows = [row for session in sessions
+                    for row in sets_from_breakdown(session.id, session.breakdown, session.start_time, session.user_id)]
+            result = await db.execute(
+                select(Exercise.id).where(Exercise.id.in_({row["exercise_id"] for row in rows})))
+            existing_exercise_ids = set(result.scalars().all())
+            valid_rows = [row for row in rows if row["exercise_id"] in existing_exercise_ids]
+
+            session_ids = [session.id for session in sessions]
+            await db.execute(delete(SessionSet).where(SessionSet.session_id.in_(session_ids)))
+            await write_session_sets(db, valid_rows)
+            await db.commit()
+
+        last_id = session_ids[-1]
+        totals["sessions"] += len(sessions)
+        totals["sets"] += len(valid_rows)
+        totals["skipped_sets"] += len(rows) - len(valid_rows)
+        print(f"[backfill_session_sets] up to session #{last_id}: {totals}")
+    return totals
+
+
+async def main(args):
+    try:
+        totals = await backfill_session_sets(async_session, args.batch_size, args.all)
+        print(f"[backfill_session_sets] done: {totals}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=1000, help="sessions per transaction")
+    parser.add_argument("--all", action="store_true", help="rebuild sets for every session, not only missing ones")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,118 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, Union
+
+import orjson
+
+from core import settings
+from core.utility.compression import compress_variants
+from core.utility.pagination import encode_cursor
+from db.connection import async_session
+from db.projection import project_rows, select_projection
+
+# Tables whose versions a snapshot is built at
+CATALOG_TABLES = ("categories", "exercises")
+
+
+@dataclass(frozen=True)
+class CatalogBlob:
+    """ One built snapshot: the catalog table versions it was built at and its body per content coding """
+    versions: Dict[str, int]
+    bodies: Dict[str, bytes]
+    built_at: float
+
+
+class CatalogSnapshotCache:
+    """
+    In-process, pre-serialized and pre-compressed snapshot of every category and exercise.
+
+    Catalog writes made by this worker mark it stale and start a rebuild in the background; requests
+    keep getting the previous blob until the new one is ready. Writes made by other workers are
+    noticed by comparing table_versions at most every CATALOG_SNAPSHOT_CHECK_SECONDS, also in the
+    background, so serving a snapshot never waits on the database once the first one is built.
+    """
+
+    def __init__(self):
+        self.builds = 0
+        self._blob: Union[CatalogBlob, None] = None
+        self._stale = False
+        self._checked_at = 0.0
+        self._task: Union[asyncio.Task, None] = None
+        self._lock = asyncio.Lock()
+
+    async def current(self) -> Union[CatalogBlob, None]:
+        """
+        The latest snapshot; only the first call of a process builds one while the caller waits.
+        None if that build failed.
+        """
+        if self._blob is None:
+            self._stale = True
+            await self.refresh()
+        elif self._stale or time.monotonic() - self._checked_at >= settings.CATALOG_SNAPSHOT_CHECK_SECONDS:
+            self.mark_stale()
+        return self._blob
+
+    def mark_stale(self):
+        """ Called after catalog writes; schedules a rebuild once a snapshot has been served """
+        self._stale = True
+        if self._blob is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self.refresh())
+
+    async def refresh(self):
+        """ Rebuilds until no write marked the snapshot stale while the last build ran """
+        async with self._lock:
+            while self._stale:
+                self._stale = False
+                try:
+                    await self._rebuild()
+                except Exception as e:
+                    self._stale = True
+                    print(f"Error building catalog snapshot: {e}")
+                    return
+
+    async def _rebuild(self):
+        # Imported here because the models mark the snapshot stale when they write
+        from core.schemas.common import RetrieveCategory, RetrieveExercise
+        from db.models.category import Category
+        from db.models.exercise import Exercise
+        from db.models.table_version import get_table_versions
+
+        async with async_session() as db:
+            # Versions are read before the rows, so the blob is never labeled newer than its content
+            versions = await get_table_versions(db, *CATALOG_TABLES)
+            self._checked_at = time.monotonic()
+            if self._blob is not None and self._blob.versions == versions:
+                return
+            result = await db.execute(select_projection(Category, RetrieveCategory).order_by(Category.name))
+            categories = project_rows(result.all())
+            result = await db.execute(select_projection(Exercise, RetrieveExercise).order_by(Exercise.name, Exercise.id))
+            exercises = project_rows(result.all())
+
+        # Template and session versions are left at 0, so the first sync after a cold start sends those in full
+        sync_token = encode_cursor(versions["categories"], versions["exercises"], 0, 0)
+        bodies = await asyncio.to_thread(self._encode, sync_token, categories, exercises)
+        self._blob = CatalogBlob(versions=versions, bodies=bodies, built_at=time.time())
+        self.builds += 1
+
+    @staticmethod
+    def _encode(sync_token: str, categories, exercises) -> Dict[str, bytes]:
+        body = orjson.dumps({"sync_token": sync_token, "categories": categories, "exercises": exercises})
+        return compress_variants(body)
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        stats = {"builds": self.builds, "stale": int(self._stale)}
+        if self._blob is not None:
+            stats.update({f"{table_name}_version": version for table_name, version in self._blob.versions.items()})
+            stats.update({f"{coding}_bytes": len(body) for coding, body in self._blob.bodies.items()})
+            stats["built_at"] = self._blob.built_at
+        return stats
+
+
+catalog_snapshot = CatalogSnapshotCache()
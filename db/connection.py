@@ -1,11 +1,86 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import threading
+import time
+from typing import Dict, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker
-import os
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from core import settings
+from core.config import Settings
+from db.dataloader import attach_loaders
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """ Queue pool that records how long callers wait to check out a connection """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+
+
+def create_engine_from_settings(config: Settings) -> AsyncEngine:
+    """
+    Creates the application's async engine.
 
-DATABASE_URL = settings.DATABASE_URL
+    Args:
+        config (Settings): settings holding the database url and pool configuration.
 
-engine = create_async_engine(DATABASE_URL, echo=True, future=True)
+    Returns:
+        AsyncEngine: the engine.
+    """
+    url = make_url(config.DATABASE_URL)
+    options = {
+        "echo": config.DB_ECHO,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "query_cache_size": config.DB_QUERY_CACHE_SIZE,
+    }
+    if url.drivername == "postgresql+asyncpg":
+        url = url.update_query_dict({"prepared_statement_cache_size": str(config.DB_PREPARED_STATEMENT_CACHE_SIZE)})
+
+    # In-memory SQLite shares one connection, so there is no pool to size
+    if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+        )
+    engine = create_async_engine(url, **options)
+    if url.get_backend_name() == "sqlite":
+        # SQLite ignores foreign keys, and so ON DELETE CASCADE, unless asked per connection
+        event.listen(engine.sync_engine, "connect", _enable_sqlite_foreign_keys)
+    return engine
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+engine = create_engine_from_settings(settings)
 async_session = sessionmaker(
     bind=engine, 
     class_=AsyncSession,
@@ -15,4 +90,29 @@ async_session = sessionmaker(
 
 async def get_db():
     async with async_session() as session:
+        # Loaders live as long as the session, i.e. for one request
+        attach_loaders(session)
         yield session
+
+
+def get_pool_stats() -> Dict[str, Union[int, float, str]]:
+    """ Live statistics of the engine's connection pool """
+    pool = engine.sync_engine.pool
+    stats = {"pool_class": type(pool).__name__}
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=max(0, pool.overflow()),
+            max_overflow=pool._max_overflow,
+        )
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update(
+            checkouts=pool.checkouts,
+            timeouts=pool.timeouts,
+            total_wait_ms=round(pool.total_wait * 1000, 3),
+            avg_wait_ms=round(pool.total_wait * 1000 / pool.checkouts, 3) if pool.checkouts else 0.0,
+            max_wait_ms=round(pool.max_wait * 1000, 3),
+        )
+    return stats
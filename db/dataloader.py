@@ -0,0 +1,116 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, List, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Key in Session.info holding the loaders created for that session
+LOADERS_KEY = "dataloaders"
+
+
+class DataLoader:
+    """
+    Batches and memoizes lookups by key.
+
+    Every load() made before the event loop next runs its scheduled callbacks is queued, and the
+    queue is then resolved with a single call to batch_load. Results, including misses, are kept
+    so the same key is only fetched once. Loaders are created per database session (see
+    get_loader), which makes them request scoped when the session comes from get_db.
+
+    batch_load shares the caller's session, so do not gather a load() together with other
+    statements on the same session.
+    """
+
+    def __init__(self, batch_load: Callable[[List[Hashable]], Awaitable[Dict]]):
+        self._batch_load = batch_load
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Tuple[Hashable, asyncio.Future]] = []
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+
+    async def load(self, key: Hashable):
+        """ Value for key, or None if batch_load did not return it """
+        return await self._future(key)
+
+    async def load_many(self, keys: List[Hashable]) -> List:
+        """ Values for keys in the same order, None where batch_load did not return them """
+        return list(await asyncio.gather(*(self._future(key) for key in keys)))
+
+    def prime(self, key: Hashable, value):
+        """ Seeds the loader with a value that is already known, e.g. a row that was just written """
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(value)
+        self._futures[key] = future
+
+    def clear(self, key: Hashable = None):
+        """ Forgets one key, or every key when none is given; in-flight loads still complete """
+        if key is None:
+            self._futures.clear()
+        else:
+            self._futures.pop(key, None)
+
+    def _future(self, key: Hashable) -> asyncio.Future:
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._futures[key] = future
+            self._queue.append((key, future))
+            if len(self._queue) == 1:
+                loop.call_soon(self._dispatch)
+        return future
+
+    def _dispatch(self):
+        batch, self._queue = self._queue, []
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Hashable, asyncio.Future]]):
+        self.batches += 1
+        try:
+            found = await self._batch_load([key for key, _ in batch])
+        except Exception as e:
+            for key, future in batch:
+                # Do not memoize failures
+                if self._futures.get(key) is future:
+                    del self._futures[key]
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch:
+            if not future.done():
+                future.set_result(found.get(key))
+
+
+def get_loader(db, name: str, batch_load: Callable[[List[Hashable]], Awaitable[Dict]]) -> DataLoader:
+    """
+    Returns the session's loader called name, creating it with batch_load on first use.
+
+    Args:
+        db: SQLAlchemy session (sync or async) the loader belongs to.
+        name (str): identifies the loader, e.g. "exercise".
+        batch_load: coroutine function taking a list of keys and returning {key: value} for those
+            that exist.
+
+    Returns:
+        DataLoader: the loader.
+    """
+    loaders = db.info.setdefault(LOADERS_KEY, {})
+    loader = loaders.get(name)
+    if loader is None:
+        loader = loaders[name] = DataLoader(batch_load)
+    return loader
+
+
+def attach_loaders(db):
+    """ Starts the session off with an empty set of loaders """
+    db.info[LOADERS_KEY] = {}
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _clear_loaders(session):
+    # Writes can change anything a loader has memoized
+    for loader in session.info.get(LOADERS_KEY, {}).values():
+        loader.clear()
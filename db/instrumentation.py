@@ -0,0 +1,128 @@
+import re
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Deque, Dict, List, Union
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from core import settings
+
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|:\w+|\?")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """ Normalizes a statement so executions that differ only in parameters compare equal """
+    shape = _PLACEHOLDER.sub("?", statement)
+    shape = _PLACEHOLDER_LIST.sub("(?, ...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+class RequestSqlStats:
+    """ SQL statements executed while serving one request """
+
+    def __init__(self):
+        self.query_count = 0
+        self.total_time = 0.0
+        self.slowest_statement: Union[str, None] = None
+        self.slowest_time = 0.0
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, duration: float):
+        self.query_count += 1
+        self.total_time += duration
+        if duration > self.slowest_time:
+            self.slowest_time = duration
+            self.slowest_statement = statement
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated_shapes(self, threshold: int) -> Dict[str, int]:
+        """ Statement shapes executed at least threshold times, the usual signature of an N+1 """
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.total_time * 1000:.2f};desc="{self.query_count} queries"'
+
+
+_current_stats: ContextVar[Union[RequestSqlStats, None]] = ContextVar("request_sql_stats", default=None)
+sql_log: Deque[Dict] = deque(maxlen=settings.SQL_LOG_SIZE)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        context._instrumentation_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    start = getattr(context, "_instrumentation_start", None)
+    if stats is not None and start is not None:
+        stats.record(statement, time.perf_counter() - start)
+
+
+def install_sql_instrumentation(engine: AsyncEngine):
+    """ Hooks the engine so statements run during a request are recorded against it """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class SqlInstrumentationMiddleware:
+    """
+    ASGI middleware that collects per-request SQL statistics, reports them in the Server-Timing,
+    X-DB-Query-Count and X-DB-Slowest-Ms response headers, and keeps a rolling log of recent
+    requests. Statement shapes repeated within one request are flagged as likely N+1 queries.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestSqlStats()
+        token = _current_stats.set(stats)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                headers.append((b"x-db-query-count", str(stats.query_count).encode("latin-1")))
+                headers.append((b"x-db-slowest-ms", f"{stats.slowest_time * 1000:.2f}".encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_stats.reset(token)
+            if stats.query_count:
+                _log_request(scope, status_code, stats)
+
+
+def _log_request(scope, status_code: int, stats: RequestSqlStats):
+    repeated = stats.repeated_shapes(settings.SQL_N_PLUS_ONE_THRESHOLD)
+    if repeated:
+        print(f"[sql] possible N+1 in {scope['method']} {scope['path']}: {repeated}")
+    sql_log.append({
+        "method": scope["method"],
+        "path": scope["path"],
+        "status": status_code,
+        "query_count": stats.query_count,
+        "db_ms": round(stats.total_time * 1000, 3),
+        "slowest_ms": round(stats.slowest_time * 1000, 3),
+        "slowest_statement": stats.slowest_statement,
+        "n_plus_one": repeated,
+    })
+
+
+def get_sql_log() -> List[Dict]:
+    """ Most recent requests that touched the database, newest first """
+    return list(reversed(sql_log))
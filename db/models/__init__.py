@@ -3,5 +3,10 @@ from .category import Category
 from .exercise import Exercise
 from .exercises_routine_bridge import exercises_routine_bridge
 from .routine_session import RoutineSession
+from .session_set import SessionSet
+from .personal_record import PersonalRecord
+from .training_rollup import CategoryTrainingRollup, UserTrainingRollup
 from .routine_template import RoutineTemplate
+from .sync import SyncTombstone
+from .table_version import TableVersion
 from .user import User
\ No newline at end of file
@@ -1,11 +1,20 @@
-from sqlalchemy import Column, Integer, String, Sequence, select
+import time
+
+from sqlalchemy import BigInteger, Column, Integer, String, Sequence, delete, insert, select, update
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import relationship, Session
-from typing import List
+from typing import Dict, List, Tuple, Union
 
-from core.schemas.common import CreateUpdateCategory, RetrieveCategory
+from core import settings
+from core.schemas.common import BulkImportResult, BulkRowError, CreateUpdateCategory, RetrieveCategory
+from db.catalog_snapshot import catalog_snapshot
+from db.dataloader import DataLoader, get_loader
+from db.projection import project_rows, select_projection
 from db.session import Base
-from db.models.exercise import Exercise
+from db.models.exercise import Exercise, exercise_search_index
+from db.models.exercise import remove_exercises
+from db.models.sync import record_tombstones
+from db.models.table_version import get_table_versions, next_change_version
 
 
 class Category(Base):
@@ -15,6 +24,8 @@ class Category(Base):
     name = Column(String(100), nullable=False, unique=True)
     description = Column(String(300))
     type = Column(String(10), nullable=False, default='exercise', name='type')
+    # The categories table version of the last write, read by delta sync
+    change_version = Column(BigInteger, nullable=False, default=0, server_default='0', index=True)
 
     exercises = relationship('Exercise', back_populates='category')
 
@@ -22,6 +33,118 @@ class Category(Base):
         return f"<Category(id={self.id}, name='{self.name}', description='{self.description}', type='{self.type}')>"
 
 
+class CategoryCache:
+    """
+    In-process cache of the serialized category catalog.
+
+    Holds the full ordered list and a per-id map, both dropped whenever a category is written. The
+    version counter increases on every invalidation so a reader that loaded from the database while
+    a write happened does not store stale rows. Each worker process keeps its own copy, keyed on the
+    categories table version it was filled at. Writes made through this worker set that version
+    directly; writes made through other workers are noticed by re-reading table_versions at most
+    every CATEGORY_CACHE_CHECK_SECONDS, so most reads do not touch the database.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.table_version = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self._all: Union[List[Dict], None] = None
+        self._by_id: Dict[int, Dict] = {}
+
+    def get_all(self) -> Union[List[Dict], None]:
+        if self._all is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._all
+
+    def get(self, category_id: int) -> Union[Dict, None]:
+        category = self._by_id.get(category_id)
+        if category is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return category
+
+    def is_complete(self) -> bool:
+        """ True when the full list is cached, so an id missing from it does not exist """
+        return self._all is not None
+
+    def store_all(self, categories: List[Dict], version: int):
+        if version != self.version:
+            return
+        self._all = categories
+        self._by_id = {category["id"]: category for category in categories}
+
+    def store(self, category: Dict, version: int):
+        if version != self.version:
+            return
+        self._by_id[category["id"]] = category
+
+    async def current_version(self, db: Session) -> int:
+        """ The categories table version the cache is at, read from the database only when the last check is due """
+        if self.table_version is None or time.monotonic() - self._checked_at >= settings.CATEGORY_CACHE_CHECK_SECONDS:
+            version = (await get_table_versions(db, Category.__tablename__))[Category.__tablename__]
+            self._checked_at = time.monotonic()
+            if version != self.table_version:
+                self.invalidate()
+                self.table_version = version
+        return self.table_version
+
+    def written(self, table_version: int):
+        """ Drops the cache after this worker committed a categories write at table_version """
+        self.invalidate()
+        self.table_version = table_version
+
+    def invalidate(self):
+        self.version += 1
+        self._all = None
+        self._by_id = {}
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "version": self.version,
+            "table_version": self.table_version or 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._by_id),
+        }
+
+
+category_cache = CategoryCache()
+
+
+async def _select_categories_by_ids(db: Session, category_ids: List[int]) -> Dict[int, Dict]:
+    """
+    Serves what it can from the category cache, once it is at the current categories table version,
+    and fetches the rest with one IN query
+    """
+    await category_cache.current_version(db)
+    found = {}
+    for category_id in category_ids:
+        category = category_cache.get(category_id)
+        if category is not None:
+            found[category_id] = category
+    remaining = [category_id for category_id in category_ids if category_id not in found]
+    if not remaining or category_cache.is_complete():
+        return found
+
+    version = category_cache.version
+    result = await db.execute(select_projection(Category, RetrieveCategory).where(Category.id.in_(remaining)))
+    for category in project_rows(result.all()):
+        category_cache.store(category, version)
+        found[category["id"]] = category
+    return found
+
+
+def category_loader(db: Session) -> DataLoader:
+    """ Request-scoped loader of categories by id, in the shape of RetrieveCategory """
+    return get_loader(db, "category", lambda category_ids: _select_categories_by_ids(db, category_ids))
+
+
 # Create functions
 async def create_category(db: Session, category: CreateUpdateCategory):
     """
@@ -35,13 +158,16 @@ async def create_category(db: Session, category: CreateUpdateCategory):
         Category: The created category object.
     """
     try:
-        category_db_entry = Category(**category.model_dump())
+        change_version = await next_change_version(db, Category.__tablename__)
+        category_db_entry = Category(**category.model_dump(), change_version=change_version)
         db.add(category_db_entry)
         await db.commit()
         await db.refresh(category_db_entry)
+        category_cache.written(change_version)
+        catalog_snapshot.mark_stale()
         return category_db_entry
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         print(f"Error creating category: {e}")
         return None
     except Exception as e:
@@ -49,21 +175,65 @@ async def create_category(db: Session, category: CreateUpdateCategory):
         return None
 
 
+async def bulk_create_categories(db: Session, categories: List[Tuple[int, CreateUpdateCategory]],
+                                 batch_size: int) -> BulkImportResult:
+    """
+    Creates many categories in one transaction using multi-row INSERT ... RETURNING.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        categories: (row index, category) pairs that already passed validation.
+        batch_size (int): number of rows per INSERT statement.
+
+    Returns:
+        BulkImportResult: ids of the created categories, and rows that were rejected.
+    """
+    errors = []
+    try:
+        names = {category.name for _, category in categories}
+        result = await db.execute(select(Category.name).where(Category.name.in_(names)))
+        taken_names = set(result.scalars().all())
+
+        valid = []
+        for index, category in categories:
+            if category.name in taken_names:
+                errors.append(BulkRowError(index=index, error=f"Category named '{category.name}' already exists."))
+            else:
+                taken_names.add(category.name)
+                valid.append(category)
+
+        ids = []
+        change_version = await next_change_version(db, Category.__tablename__) if valid else None
+        for start in range(0, len(valid), batch_size):
+            result = await db.execute(
+                insert(Category.__table__).returning(Category.id),
+                [{**category.model_dump(), "change_version": change_version} for category in valid[start:start + batch_size]])
+            ids.extend(result.scalars().all())
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        print(f"Error bulk creating categories: {e}")
+        return BulkImportResult(inserted=0, ids=[], errors=errors + [BulkRowError(index=-1, error=str(e.__cause__ or e))])
+
+    if ids:
+        category_cache.written(change_version)
+        catalog_snapshot.mark_stale()
+    return BulkImportResult(inserted=len(ids), ids=ids, errors=errors)
+
+
 # Retrieve Functions
-async def get_category_by_id(db: Session, category_id: int):
+async def get_category_by_id(db: Session, category_id: int) -> Union[Dict, None]:
     """
-    Retrieves the category object by ID.
+    Retrieves the category by ID, from the category cache when possible.
     
     Args:
         db (Session): SQLAlchemy session.
         category_id (int): ID of the category to retrieve.
     
     Returns:
-        Category: The retrieved category object.
+        Dict: The category in the shape of RetrieveCategory, or None if it does not exist.
     """
-    result = await db.execute(select(Category).filter_by(id=category_id))
-    category = result.scalars().first()
-    return category
+    return await category_loader(db).load(category_id)
 
 
 async def get_category_by_name(db: Session, category_name: int):
@@ -82,56 +252,72 @@ async def get_category_by_name(db: Session, category_name: int):
     return category
 
 
-async def get_all_categories(db: Session) -> List[RetrieveCategory]:
+async def get_all_categories(db: Session) -> List[Dict]:
     """
-    Retrieves all the categories from the database.
+    Retrieves all the categories, from the category cache when possible.
     
     Args:
         db (Session): SQLAlchemy session
     Returns:
-        List[Category]: List of categories
+        List[Dict]: List of categories in the shape of RetrieveCategory
     """
-    result = await db.scalars(select(Category).order_by(Category.name))
-    categories = result.all()
-    return [RetrieveCategory.model_validate(category) for category in categories]
+    await category_cache.current_version(db)
+    categories = category_cache.get_all()
+    if categories is not None:
+        return categories
+
+    version = category_cache.version
+    result = await db.execute(select_projection(Category, RetrieveCategory).order_by(Category.name))
+    categories = project_rows(result.all())
+    category_cache.store_all(categories, version)
+    return categories
 
 
 # Update functions
-def update_category(db: Session, category: Category):
+async def update_category(db: Session, category_id: int, category: CreateUpdateCategory) -> Union[Dict, None]:
     """
-    Updates the category object with the specified category.
+    Updates a category with a single UPDATE ... RETURNING, stamping it with a new categories table
+    version, which delta sync reads and the category cache picks up.
     
     Args:
         db (Session): SQLAlchemy session.
-        category (Category): Category object with updated values.
+        category_id (int): ID of the category to update.
+        category (CreateUpdateCategory): New values of the category.
     
     Returns:
-        Category: The updated category object, or None if not found or on error.
+        Dict: The updated category in the shape of RetrieveCategory, or None if not found or on error.
     """
     try:
-        existing_category = db.query(Category).filter(Category.id == category.id).first()
-        if existing_category is None:
+        change_version = await next_change_version(db, Category.__tablename__)
+        result = await db.execute(
+            update(Category)
+            .where(Category.id == category_id)
+            .values(**category.model_dump(), change_version=change_version)
+            .returning(*(Category.__table__.c[name] for name in RetrieveCategory.model_fields)))
+        updated = project_rows(result.all())
+        if not updated:
+            await db.rollback()
             return None
-        else:
-            existing_category.name = category.name
-            existing_category.description = category.description
-            existing_category.type = category.type
-            db.commit()
-            db.refresh(existing_category)
-            return existing_category
+        await db.commit()
     except SQLAlchemyError as e:
-        db.rollback()
-        print(f"Error updating user: {e}")
+        await db.rollback()
+        print(f"Error updating category: {e}")
         return None
     except Exception as e:
         print(f"Unexpected Exception: {e}")
         return None
 
+    category_cache.written(change_version)
+    catalog_snapshot.mark_stale()
+    return updated[0]
+
 
 # Delete functions
-def delete_category(db: Session, category_id: int):
+async def delete_category(db: Session, category_id: int) -> bool:
     """
-    Deletes a category and all exercises associated with that category.
+    Deletes a category with a single DELETE ... RETURNING, after deleting its exercises with
+    remove_exercises. The category and its exercises are locked first, so no exercise can be added
+    to it, nor a template link to one of them, before the delete commits.
     
     Args:
         db (Session): SQLAlchemy session.
@@ -141,26 +327,27 @@ def delete_category(db: Session, category_id: int):
         bool: True if deletion was successful, False otherwise.
     """
     try:
-        # Retrieve the category to ensure it exists
-        category = db.query(Category).filter(Category.id == category_id).first()
-        if category is None:
-            print("Category not found.")
-            return False
-
-        # Delete all exercises associated with the category
-        db.query(Exercise).filter(Exercise.category_id == category_id).delete()
-
-        # Delete the category itself
-        db.delete(category)
-
-        # Commit the transaction
-        db.commit()
-        return True
+        await db.execute(select(Category.id).where(Category.id == category_id).with_for_update())
+        result = await db.execute(select(Exercise.id).where(Exercise.category_id == category_id).with_for_update())
+        await remove_exercises(db, list(result.scalars().all()))
+        result = await db.execute(delete(Category).where(Category.id == category_id).returning(Category.id))
+        deleted = result.scalar_one_or_none()
+        if deleted is not None:
+            change_version = await next_change_version(db, Category.__tablename__)
+            await record_tombstones(db, Category.__tablename__, [(deleted, None)], change_version)
+        await db.commit()
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         print(f"Error deleting category and its exercises: {e}")
         return False
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Unexpected exception: {e}")
         return False
+
+    if deleted is None:
+        return False
+    category_cache.written(change_version)
+    catalog_snapshot.mark_stale()
+    exercise_search_index.remove_where(lambda exercise: exercise["category_id"] == category_id)
+    return True
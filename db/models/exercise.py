@@ -1,19 +1,33 @@
-from typing import List, Union
-from sqlalchemy import Column, Integer, String, ForeignKey, Sequence, select
+from typing import Dict, List, Tuple, Union
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, Index, Sequence, delete, insert, select, tuple_, update
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import relationship, Session
-from core.schemas.common import CreateUpdateExercise, RetrieveExercise
+from core.schemas.common import BulkImportResult, BulkRowError, CreateUpdateExercise, RetrieveExercise
+from core.utility.pagination import decode_cursor, encode_cursor
+from core.utility.search_index import NgramSearchIndex
+from db.catalog_snapshot import catalog_snapshot
+from db.dataloader import DataLoader, get_loader
 from db.models.exercises_routine_bridge import exercises_routine_bridge
+from db.models.sync import record_tombstones
+from db.models.table_version import next_change_version
+from db.projection import project_entity, project_rows, select_projection
 from db.session import Base
 
 
 class Exercise(Base):
     __tablename__ = 'exercises'
+    # Serve the (name, id) keyset seek of cursor pagination, over all exercises and per category
+    __table_args__ = (
+        Index('ix_exercises_name_id', 'name', 'id'),
+        Index('ix_exercises_category_name_id', 'category_id', 'name', 'id'),
+    )
 
     id = Column(Integer, Sequence('exercises_id_seq'), primary_key=True)
     name = Column(String(100), nullable=False)
     description = Column(String(500))
     category_id = Column(Integer, ForeignKey('categories.id', ondelete='CASCADE'))
+    # The exercises table version of the last write, read by delta sync
+    change_version = Column(BigInteger, nullable=False, default=0, server_default='0', index=True)
 
     category = relationship('Category', back_populates='exercises')
     routine_templates = relationship('RoutineTemplate', secondary=exercises_routine_bridge, back_populates='exercises')
@@ -22,6 +36,29 @@ class Exercise(Base):
         return f"<Exercise(id={self.id}, name='{self.name}', description='{self.description}', category_id={self.category_id})>"
 
 
+# In-process name index used by the type-ahead search, built at startup
+exercise_search_index = NgramSearchIndex()
+
+
+def index_exercise(exercise: Exercise):
+    """ Adds or refreshes an exercise in the search index """
+    exercise_search_index.upsert(exercise.id, exercise.name, project_entity(exercise, RetrieveExercise))
+
+
+async def _select_exercises_by_ids(db: Session, exercise_ids: List[int]) -> Dict[int, Dict]:
+    """
+    Fetches exercises with one IN query. The search index is not used here, since other workers'
+    writes only reach it at the next restart, so it can only serve the type-ahead search.
+    """
+    result = await db.execute(select_projection(Exercise, RetrieveExercise).where(Exercise.id.in_(exercise_ids)))
+    return {exercise["id"]: exercise for exercise in project_rows(result.all())}
+
+
+def exercise_loader(db: Session) -> DataLoader:
+    """ Request-scoped loader of exercises by id, in the shape of RetrieveExercise """
+    return get_loader(db, "exercise", lambda exercise_ids: _select_exercises_by_ids(db, exercise_ids))
+
+
 # Create functions
 async def create_exercise(db: Session, exercise: CreateUpdateExercise):
     """
@@ -35,10 +72,13 @@ async def create_exercise(db: Session, exercise: CreateUpdateExercise):
         exercise: The exercise that was just created
     """
     try:
-        exercise_db_entry = Exercise(**exercise.model_dump())
+        exercise_db_entry = Exercise(**exercise.model_dump(),
+                                     change_version=await next_change_version(db, Exercise.__tablename__))
         db.add(exercise_db_entry)
         await db.commit()
         await db.refresh(exercise_db_entry)
+        index_exercise(exercise_db_entry)
+        catalog_snapshot.mark_stale()
         return exercise_db_entry
     except SQLAlchemyError as e:
         db.rollback()
@@ -49,8 +89,57 @@ async def create_exercise(db: Session, exercise: CreateUpdateExercise):
         return None
 
 
+async def bulk_create_exercises(db: Session, exercises: List[Tuple[int, CreateUpdateExercise]],
+                                batch_size: int) -> BulkImportResult:
+    """
+    Creates many exercises in one transaction using multi-row INSERT ... RETURNING.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        exercises: (row index, exercise) pairs that already passed validation.
+        batch_size (int): number of rows per INSERT statement.
+
+    Returns:
+        BulkImportResult: ids of the created exercises, and rows that were rejected.
+    """
+    # Imported here because category.py imports this module
+    from db.models.category import category_loader
+
+    errors = []
+    try:
+        category_ids = list({exercise.category_id for _, exercise in exercises})
+        categories = await category_loader(db).load_many(category_ids)
+        existing_category_ids = {category["id"] for category in categories if category is not None}
+
+        valid = []
+        for index, exercise in exercises:
+            if exercise.category_id in existing_category_ids:
+                valid.append(exercise)
+            else:
+                errors.append(BulkRowError(index=index, error=f"Category (id#{exercise.category_id}) does not exist."))
+
+        created = []
+        change_version = await next_change_version(db, Exercise.__tablename__) if valid else None
+        for start in range(0, len(valid), batch_size):
+            result = await db.execute(
+                insert(Exercise.__table__)
+                .returning(*(Exercise.__table__.c[name] for name in RetrieveExercise.model_fields)),
+                [{**exercise.model_dump(), "change_version": change_version} for exercise in valid[start:start + batch_size]])
+            created.extend(project_rows(result.all()))
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        print(f"Error bulk creating exercises: {e}")
+        return BulkImportResult(inserted=0, ids=[], errors=errors + [BulkRowError(index=-1, error=str(e.__cause__ or e))])
+
+    exercise_search_index.upsert_many((exercise["id"], exercise["name"], exercise) for exercise in created)
+    if created:
+        catalog_snapshot.mark_stale()
+    return BulkImportResult(inserted=len(created), ids=[exercise["id"] for exercise in created], errors=errors)
+
+
 # Retrieve functions
-async def get_exercise(db: Session, identifier: Union[int, str]) -> Union[RetrieveExercise | None, List[RetrieveExercise]]:
+async def get_exercise(db: Session, identifier: Union[int, str]) -> Union[Dict, None, List[Dict]]:
     """
     Retrieves exercise by exercise ID.
     
@@ -59,37 +148,128 @@ async def get_exercise(db: Session, identifier: Union[int, str]) -> Union[Retrie
         identifier (int | str): ID or name of the exercise to retrieve.
     
     Returns:
-        the exercise if found
+        the exercise if found, in the shape of RetrieveExercise
     """
     if isinstance(identifier, int):
-        result = await db.execute(select(Exercise).filter_by(id=identifier))
-        exercise = result.scalars().first()
-        return exercise
+        return await exercise_loader(db).load(identifier)
 
     if isinstance(identifier, str):
         result = await db.execute(
-            select(Exercise)
+            select_projection(Exercise, RetrieveExercise)
             .filter(Exercise.name.ilike(f"%{identifier}%"))
         )
-        exercises = result.scalars().all()
-        return [RetrieveExercise.model_validate(exercise) for exercise in exercises]
+        return project_rows(result.all())
 
     print(f"Invalid identifier provided. Unable to find exercise.")
     return None
 
 
-async def get_all_exercises_query(db: Session, page: int, page_size: int) -> List[RetrieveExercise]:
-    """ Retrieves all exercises in the database """
+async def get_exercises_by_ids(db: Session, exercise_ids: List[int]) -> Dict[int, Dict]:
+    """
+    Retrieves many exercises by ID with a single IN query.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        exercise_ids (list): IDs of the exercises to retrieve.
+
+    Returns:
+        dict: the exercises that exist, in the shape of RetrieveExercise, keyed by ID.
+    """
+    exercises = await exercise_loader(db).load_many(exercise_ids)
+    return {exercise["id"]: exercise for exercise in exercises if exercise is not None}
+
+
+async def build_exercise_search_index(db: Session):
+    """
+    Loads every exercise into the in-process search index.
+
+    Args:
+        db (Session): SQLAlchemy session.
+    """
+    result = await db.execute(select_projection(Exercise, RetrieveExercise))
+    exercise_search_index.build(
+        (exercise["id"], exercise["name"], exercise) for exercise in project_rows(result.all()))
+    print(f"[build_exercise_search_index] indexed {len(exercise_search_index)} exercises")
+
+
+async def search_exercises(db: Session, query: str, limit: int, offset: int) -> List[Dict]:
+    """
+    Searches exercises by name, ranked by how closely the name matches.
+
+    Args:
+        db (Session): SQLAlchemy session, only used if the search index has not been built.
+        query (str): text to search exercise names for.
+        limit (int): maximum number of results.
+        offset (int): number of ranked results to skip.
+
+    Returns:
+        list: matching exercises, in the shape of RetrieveExercise.
+    """
+    if exercise_search_index.ready:
+        return exercise_search_index.search(query, limit, offset)
+
     result = await db.execute(
-        select(Exercise)
-        .order_by(Exercise.name)
+        select_projection(Exercise, RetrieveExercise)
+        .filter(Exercise.name.ilike(f"%{query}%"))
+        .order_by(Exercise.name, Exercise.id)
+        .limit(limit)
+        .offset(offset))
+    return project_rows(result.all())
+
+
+async def get_all_exercises_query(db: Session, page: int, page_size: int) -> List[Dict]:
+    """ Retrieves all exercises in the database, in the shape of RetrieveExercise """
+    result = await db.execute(
+        select_projection(Exercise, RetrieveExercise)
+        .order_by(Exercise.name, Exercise.id)
         .limit(page_size)
         .offset(page * page_size))
-    exercises = result.scalars().all()
-    return exercises
+    return project_rows(result.all())
 
 
-async def get_all_exercises_for_category_id(db: Session, category_id: int, page: int, page_size: int) -> List[Exercise]:
+async def get_exercises_after_cursor(db: Session, cursor: Union[str, None], page_size: int,
+                                     category_id: Union[int, None] = None) -> Tuple[List[Dict], Union[str, None]]:
+    """
+    Retrieves a page of exercises ordered by (name, id), seeking past the given cursor instead of
+    using OFFSET so that deep pages cost the same as the first one.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        cursor (str | None): cursor returned with the previous page, or None/empty for the first page.
+        page_size (int): size of the page.
+        category_id (int | None): optionally restrict the listing to one category.
+
+    Returns:
+        tuple: the exercises on this page, in the shape of RetrieveExercise, and the cursor for the
+        next page (None on the last page).
+
+    Raises:
+        ValueError: if the cursor was not produced by this listing.
+    """
+    query = select_projection(Exercise, RetrieveExercise)
+    if category_id is not None:
+        query = query.where(Exercise.category_id == category_id)
+    if cursor:
+        last_key = decode_cursor(cursor, (str, int))
+        if last_key is None:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        query = query.where(tuple_(Exercise.name, Exercise.id) > tuple_(*last_key))
+
+    # Fetch one extra row to find out whether there is a next page
+    result = await db.execute(
+        query
+        .order_by(Exercise.name, Exercise.id)
+        .limit(page_size + 1))
+    exercises = project_rows(result.all())
+    if len(exercises) <= page_size:
+        return exercises, None
+
+    exercises = exercises[:page_size]
+    last = exercises[-1]
+    return exercises, encode_cursor(last["name"], last["id"])
+
+
+async def get_all_exercises_for_category_id(db: Session, category_id: int, page: int, page_size: int) -> List[Dict]:
     """
     Retrieves all exercises by category ID.
     
@@ -100,80 +280,149 @@ async def get_all_exercises_for_category_id(db: Session, category_id: int, page:
         category_id (int): ID of the category whose exercises to retrieve.
     
     Returns:
-        list: List of exercises for the given category ID.
+        list: List of exercises for the given category ID, in the shape of RetrieveExercise.
     """
     result = await db.execute(
-        select(Exercise)
+        select_projection(Exercise, RetrieveExercise)
         .where(Exercise.category_id == category_id)
-        .order_by(Exercise.name)
+        .order_by(Exercise.name, Exercise.id)
         .limit(page_size)
         .offset(page * page_size))
-    exercises = result.scalars().all()
-    return exercises
+    return project_rows(result.all())
 
 
 # Update functions
-def update_exercise(db: Session, exercise: Exercise):
+async def update_exercise(db: Session, exercise_id: int, exercise: CreateUpdateExercise) -> Union[Dict, None]:
     """
-    Updates an exercise with the current exercise
+    Updates an exercise with a single UPDATE ... RETURNING, stamping it with a new exercises table
+    version so delta sync picks it up, then refreshes it in the search index.
     
     Args:
         db (Session): SQLAlchemy session.
-        exercise (Exercise): Exercise object to add to database
+        exercise_id (int): ID of the exercise to update.
+        exercise (CreateUpdateExercise): New values of the exercise.
     
     Returns:
-        exercise: The exercise that was just updated
+        Dict: The updated exercise in the shape of RetrieveExercise, or None if not found or on error.
     """
     try:
-        existing_exercise = db.query(Exercise).filter(exercise.id == exercise.id).first()
-        if existing_exercise is None:
+        result = await db.execute(
+            update(Exercise)
+            .where(Exercise.id == exercise_id)
+            .values(**exercise.model_dump(), change_version=await next_change_version(db, Exercise.__tablename__))
+            .returning(*(Exercise.__table__.c[name] for name in RetrieveExercise.model_fields)))
+        updated = project_rows(result.all())
+        if not updated:
+            await db.rollback()
             return None
-        else:
-            existing_exercise.name = exercise.name
-            existing_exercise.category = exercise.category
-            existing_exercise.category_id = exercise.category_id
-            db.commit()
-            db.refresh(existing_exercise)
-            return existing_exercise
+        await db.commit()
     except SQLAlchemyError as e:
-        db.rollback()
-        print(f"Error updating user: {e}")
+        await db.rollback()
+        print(f"Error updating exercise: {e}")
         return None
     except Exception as e:
         print(f"Unexpected Exception: {e}")
         return None
 
+    updated_exercise = updated[0]
+    exercise_search_index.upsert(updated_exercise["id"], updated_exercise["name"], updated_exercise)
+    catalog_snapshot.mark_stale()
+    return updated_exercise
+
 
 # Delete functions
-def delete_exercise(db: Session, exercise_id: int):
+async def remove_exercises(db: Session, exercise_ids: List[int]) -> List[int]:
+    """
+    Deletes exercises and their links to routine templates, each with one DELETE ... RETURNING, and
+    records both for delta sync from what the deletes returned. The caller must hold the exercises
+    locked (select ... with_for_update), so no template can link them in between. Does not commit.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        exercise_ids (list): IDs of the exercises to delete.
+
+    Returns:
+        list: IDs of the exercises that were deleted.
     """
-    Deletes an exercise.
+    if not exercise_ids:
+        return []
+    result = await db.execute(
+        delete(exercises_routine_bridge)
+        .where(exercises_routine_bridge.c.exercises_id.in_(exercise_ids))
+        .returning(exercises_routine_bridge.c.routine_template_id))
+    template_ids = list(set(result.scalars().all()))
+    result = await db.execute(delete(Exercise).where(Exercise.id.in_(exercise_ids)).returning(Exercise.id))
+    deleted = list(result.scalars().all())
+    await record_exercise_deletions(db, deleted, template_ids)
+    return deleted
+
+
+async def record_exercise_deletions(db: Session, exercise_ids: List[int], template_ids: List[int]):
+    """
+    Tombstones deleted exercises for delta sync and marks the templates that listed them as changed,
+    since their exercise lists shrank. Does not commit.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        exercise_ids (list): IDs of the exercises that were deleted.
+        template_ids (list): IDs of the templates that listed them.
+    """
+    # Imported here because routine_template.py imports this module
+    from db.models.routine_template import RoutineTemplate
+
+    if not exercise_ids:
+        return
+    await record_tombstones(db, Exercise.__tablename__, [(exercise_id, None) for exercise_id in exercise_ids],
+                            await next_change_version(db, Exercise.__tablename__))
+    if template_ids:
+        await db.execute(
+            update(RoutineTemplate)
+            .where(RoutineTemplate.id.in_(template_ids))
+            .values(change_version=await next_change_version(db, RoutineTemplate.__tablename__)))
+
+
+async def delete_exercise(db: Session, exercise_id: int) -> bool:
+    """
+    Deletes an exercise with a single DELETE ... RETURNING.
     
     Args:
         db (Session): SQLAlchemy session.
-        user_id (int): ID of the exercise to delete.
+        exercise_id (int): ID of the exercise to delete.
     
     Returns:
         bool: True if deletion was successful, False otherwise.
     """
+    return exercise_id in await delete_exercises(db, [exercise_id])
+
+
+async def delete_exercises(db: Session, exercise_ids: List[int]) -> List[int]:
+    """
+    Deletes many exercises with remove_exercises, after locking them.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        exercise_ids (list): IDs of the exercises to delete.
+
+    Returns:
+        list: IDs of the exercises that were deleted.
+    """
+    if not exercise_ids:
+        return []
     try:
-        # Retrieve the user to ensure it exists
-        exercise = db.query(Exercise).filter(Exercise.id == exercise_id).first()
-        if exercise is None:
-            print("Exercise does not exist..")
-            return False
-
-        # Delete the exercise itself
-        db.delete(exercise)
-
-        # Commit the transaction
-        db.commit()
-        return True
+        result = await db.execute(select(Exercise.id).where(Exercise.id.in_(exercise_ids)).with_for_update())
+        deleted = await remove_exercises(db, list(result.scalars().all()))
+        await db.commit()
     except SQLAlchemyError as e:
-        db.rollback()
-        print(f"Error deleting exercise: {e}")
-        return False
+        await db.rollback()
+        print(f"Error deleting exercises: {e}")
+        return []
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Unexpected exception: {e}")
-        return False
+        return []
+
+    for exercise_id in deleted:
+        exercise_search_index.remove(exercise_id)
+    if deleted:
+        catalog_snapshot.mark_stale()
+    return deleted
@@ -0,0 +1,199 @@
+import uuid
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Integer, delete, func, insert, select, tuple_
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session
+
+from db.session import Base
+
+# Rep counts above this say little about a one rep max, so they do not feed the estimate
+ESTIMATED_1RM_MAX_REPS = 12
+
+RecordKey = Tuple[uuid.UUID, int, int]
+
+
+class PersonalRecord(Base):
+    """ A user's heaviest set of an exercise for one rep count """
+    __tablename__ = 'personal_records'
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    exercise_id = Column(Integer, ForeignKey('exercises.id', ondelete='CASCADE'), primary_key=True)
+    reps = Column(Integer, primary_key=True)
+    weight = Column(Float, nullable=False)
+    session_id = Column(Integer, ForeignKey('routine_sessions.id', ondelete='CASCADE'), nullable=False)
+    achieved_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<PersonalRecord(user_id={self.user_id}, exercise_id={self.exercise_id}, reps={self.reps}, weight={self.weight}, session_id={self.session_id})>"
+
+
+def estimated_1rm(weight: float, reps: int) -> float:
+    """ Epley estimate of the weight that could be lifted for a single rep """
+    return weight if reps == 1 else weight * (1 + reps / 30)
+
+
+def _counts_as_record(row: Dict) -> bool:
+    return row["reps"] is not None and row["reps"] > 0 and row["weight"] is not None and row["weight"] > 0
+
+
+def best_sets(rows: Iterable[Dict]) -> Dict[Tuple[int, int], Dict]:
+    """ The heaviest of the given session_sets rows per (exercise, reps), earliest first on ties """
+    best = {}
+    for row in rows:
+        if not _counts_as_record(row):
+            continue
+        key = (row["exercise_id"], row["reps"])
+        current = best.get(key)
+        if current is None or row["weight"] > current["weight"] or (
+                row["weight"] == current["weight"] and row["performed_at"] < current["performed_at"]):
+            best[key] = row
+    return best
+
+
+def record_keys(user_id: uuid.UUID, set_rows: Iterable[Dict]) -> Set[RecordKey]:
+    """ Keys of the records a user's session_sets rows can hold, e.g. those of a session being deleted """
+    if user_id is None:
+        return set()
+    return {(user_id, exercise_id, reps) for exercise_id, reps in best_sets(set_rows)}
+
+
+# Update functions
+async def apply_new_sets(db: Session, sets_by_user: Dict[uuid.UUID, List[Dict]]):
+    """
+    Raises users' records with newly logged sets. Only records the new sets beat are touched, so the
+    cost depends on the size of the delta rather than the users' history. Does not commit.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        sets_by_user (dict): session_sets rows that were just written, keyed by the user who logged them.
+    """
+    candidates = {
+        (user_id, exercise_id, reps): row
+        for user_id, rows in sets_by_user.items() if user_id is not None
+        for (exercise_id, reps), row in best_sets(rows).items()
+    }
+    if not candidates:
+        return
+
+    result = await db.execute(
+        select(PersonalRecord.user_id, PersonalRecord.exercise_id, PersonalRecord.reps, PersonalRecord.weight)
+        .where(tuple_(PersonalRecord.user_id, PersonalRecord.exercise_id, PersonalRecord.reps).in_(list(candidates))))
+    current = {(row.user_id, row.exercise_id, row.reps): row.weight for row in result.all()}
+
+    improved = {key: row for key, row in candidates.items() if key not in current or row["weight"] > current[key]}
+    if not improved:
+        return
+    await db.execute(
+        delete(PersonalRecord)
+        .where(tuple_(PersonalRecord.user_id, PersonalRecord.exercise_id, PersonalRecord.reps).in_(list(improved))))
+    await db.execute(insert(PersonalRecord.__table__), [_record_row(key[0], row) for key, row in improved.items()])
+
+
+async def records_set_by_sessions(db: Session, session_filter) -> Set[RecordKey]:
+    """
+    Keys of the records held by sets of the sessions matching session_filter, i.e. the records that
+    must be recomputed if those sessions change or go away.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        session_filter: SQL expression over RoutineSession selecting the sessions.
+
+    Returns:
+        set: (user_id, exercise_id, reps) keys.
+    """
+    # Imported here because routine_session.py imports this module
+    from db.models.routine_session import RoutineSession
+
+    result = await db.execute(
+        select(PersonalRecord.user_id, PersonalRecord.exercise_id, PersonalRecord.reps)
+        .join(RoutineSession, RoutineSession.id == PersonalRecord.session_id)
+        .where(session_filter))
+    return {tuple(row) for row in result.all()}
+
+
+async def recompute_records(db: Session, keys: Set[RecordKey]):
+    """
+    Recomputes the given records from the remaining session_sets, dropping those no set holds any
+    more. Does not commit.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        keys (set): (user_id, exercise_id, reps) keys to recompute.
+    """
+    # Imported here because routine_session.py imports this module
+    from db.models.session_set import SessionSet
+
+    if not keys:
+        return
+    by_user: Dict[uuid.UUID, List[Tuple[int, int]]] = defaultdict(list)
+    for user_id, exercise_id, reps in keys:
+        by_user[user_id].append((exercise_id, reps))
+
+    for user_id, exercise_reps in by_user.items():
+        ranked = (
+            select(
+                SessionSet.exercise_id, SessionSet.reps, SessionSet.weight, SessionSet.session_id,
+                SessionSet.performed_at,
+                func.row_number().over(
+                    partition_by=(SessionSet.exercise_id, SessionSet.reps),
+                    order_by=(SessionSet.weight.desc(), SessionSet.performed_at)).label("rank"))
+            .where(SessionSet.user_id == user_id)
+            .where(tuple_(SessionSet.exercise_id, SessionSet.reps).in_(exercise_reps))
+            .where(SessionSet.weight > 0)
+            .subquery())
+        result = await db.execute(select(ranked).where(ranked.c.rank == 1))
+        best = [dict(row._mapping) for row in result.all()]
+
+        await db.execute(
+            delete(PersonalRecord)
+            .where(PersonalRecord.user_id == user_id)
+            .where(tuple_(PersonalRecord.exercise_id, PersonalRecord.reps).in_(exercise_reps)))
+        if best:
+            await db.execute(insert(PersonalRecord.__table__), [_record_row(user_id, row) for row in best])
+
+
+def _record_row(user_id: uuid.UUID, row: Dict) -> Dict:
+    return {
+        "user_id": user_id,
+        "exercise_id": row["exercise_id"],
+        "reps": row["reps"],
+        "weight": row["weight"],
+        "session_id": row["session_id"],
+        "achieved_at": row["performed_at"],
+    }
+
+
+# Retrieve functions
+async def get_records_for_user(db: Session, user_id: uuid.UUID) -> List[Dict]:
+    """
+    Retrieves a user's precomputed records grouped by exercise, with an estimated one rep max.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        user_id (UUID): ID of the user.
+
+    Returns:
+        list: records in the shape of ExercisePersonalRecords, ordered by exercise.
+    """
+    result = await db.execute(
+        select(PersonalRecord.exercise_id, PersonalRecord.reps, PersonalRecord.weight, PersonalRecord.session_id,
+               PersonalRecord.achieved_at)
+        .where(PersonalRecord.user_id == user_id)
+        .order_by(PersonalRecord.exercise_id, PersonalRecord.reps))
+    exercises: Dict[int, Dict] = {}
+    for record in result.all():
+        exercise = exercises.setdefault(
+            record.exercise_id, {"exercise_id": record.exercise_id, "estimated_1rm": None, "records": []})
+        exercise["records"].append({
+            "reps": record.reps,
+            "weight": record.weight,
+            "session_id": record.session_id,
+            "achieved_at": record.achieved_at,
+        })
+        if record.reps <= ESTIMATED_1RM_MAX_REPS:
+            estimate = round(estimated_1rm(record.weight, record.reps), 2)
+            if exercise["estimated_1rm"] is None or estimate > exercise["estimated_1rm"]:
+                exercise["estimated_1rm"] = estimate
+    return list(exercises.values())
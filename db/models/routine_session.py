@@ -1,8 +1,22 @@
-from typing import Union
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Tuple, Union
 
-from sqlalchemy import JSON, Column, DateTime, ForeignKey, Integer, String, Sequence
+from collections import defaultdict
+
+from sqlalchemy import JSON, BigInteger, Column, DateTime, ForeignKey, Index, Integer, String, Sequence, delete, insert, select, tuple_
+from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import relationship, Session
+
+from core.schemas.common import BulkImportResult, BulkRowError, CreateUpdateRoutineSession, RetrieveRoutineSession
+from core.utility.pagination import decode_cursor, encode_cursor
+from db.models.exercise import exercise_loader
+from db.models.personal_record import apply_new_sets, recompute_records, record_keys, records_set_by_sessions
+from db.models.session_set import SessionSet, breakdown_exercise_ids, sets_from_breakdown, write_session_sets
+from db.models.sync import next_session_versions, record_session_tombstones, record_tombstones
+from db.models.training_rollup import apply_session_rollups, rollup_source
+from db.projection import loader_options_for
+from db.models.user import User, user_exists
 from db.session import Base
 
 
@@ -14,119 +28,440 @@ class RoutineSession(Base):
     end_time = Column(DateTime(timezone=True), nullable=False)
     routine_template_id = Column(Integer, ForeignKey('routine_templates.id', ondelete='CASCADE'))
     breakdown = Column(JSON)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'))
+    # The routine_sessions table version of the last write, read by delta sync
+    change_version = Column(BigInteger, nullable=False, default=0, server_default='0')
 
     # Define a relationship to the RoutineTemplate model
     routine_template = relationship('RoutineTemplate', back_populates='routine_sessions')
 
     def __repr__(self):
-        return f"<RoutineSession(id={self.id}, start_time='{self.start_time}', end_time='{self.end_time}', routine_template_id={self.routine_template_id}, breakdown={self.breakdown})>"
+        return f"<RoutineSession(id={self.id}, start_time='{self.start_time}', end_time='{self.end_time}', routine_template_id={self.routine_template_id}, user_id={self.user_id}, breakdown={self.breakdown})>"
+
+
+# Serves a template's session history, newest first
+Index('ix_routine_sessions_template_id_start_time_id',
+      RoutineSession.routine_template_id, RoutineSession.start_time, RoutineSession.id)
+# Serves a user's session history, newest first, and exports
+Index('ix_routine_sessions_user_id_start_time_id',
+      RoutineSession.user_id, RoutineSession.start_time.desc(), RoutineSession.id.desc())
+# Serves delta sync of a user's sessions
+Index('ix_routine_sessions_user_id_change_version', RoutineSession.user_id, RoutineSession.change_version)
+
+
+def to_retrieve_routine_session(session: RoutineSession) -> RetrieveRoutineSession:
+    """ Builds the response for a session whose template relationship was not loaded """
+    return RetrieveRoutineSession(
+        id=session.id,
+        start_time=session.start_time,
+        end_time=session.end_time,
+        routine_template_id=session.routine_template_id,
+        user_id=session.user_id,
+        breakdown=session.breakdown)
+
+
+def template_usable_by(template_user_id, session_user_id) -> bool:
+    """
+    Whether a session of session_user_id may be logged against a template. A user's templates are
+    private and are deleted with them, so only shared templates and the user's own qualify.
+    """
+    return template_user_id is None or template_user_id == session_user_id
+
+
+async def find_reference_issues(db: Session, routine_session: CreateUpdateRoutineSession) -> Dict:
+    """
+    Issues for the session's template, user and breakdown exercises that do not exist, and for a
+    template that is private to another user
+    """
+    # Imported here because routine_template.py imports the models package
+    from db.models.routine_template import RoutineTemplate
+
+    exercise_ids = breakdown_exercise_ids(routine_session.breakdown)
+    exercises = await exercise_loader(db).load_many(exercise_ids)
+    issues = {
+        f"exercise-{exercise_id}": f"Exercise (id#{exercise_id}) in breakdown does not exist."
+        for exercise_id, exercise in zip(exercise_ids, exercises) if exercise is None
+    }
+    if routine_session.routine_template_id is not None:
+        result = await db.execute(
+            select(RoutineTemplate.user_id).where(RoutineTemplate.id == routine_session.routine_template_id))
+        template = result.one_or_none()
+        if template is None:
+            issues["routine_template_id"] = f"Routine template (id#{routine_session.routine_template_id}) does not exist."
+        elif not template_usable_by(template.user_id, routine_session.user_id):
+            issues["routine_template_id"] = f"Routine template (id#{routine_session.routine_template_id}) belongs to another user."
+    if routine_session.user_id is not None and not await user_exists(db, routine_session.user_id):
+        issues["user_id"] = f"User (id#{routine_session.user_id}) does not exist."
+    return issues
 
 
 # Create functions
-def create_routine_session(db: Session, routine_session: RoutineSession) -> Union[RoutineSession, None]:
+async def create_routine_session(db: Session, routine_session: CreateUpdateRoutineSession) -> Union[RetrieveRoutineSession, None]:
     """
-    Creates a new routine session in the database.
-    
+    Creates a new routine session in the database, along with its session_sets rows, raises the
+    user's personal records with it and adds it to the user's training rollups.
+
     Args:
         db (Session): SQLAlchemy session.
-        routine_session (RoutineSession): RoutineSession object to be created.
-    
+        routine_session (CreateUpdateRoutineSession): routine session to be created.
+
     Returns:
-        RoutineSession: The created RoutineSession object.
+        RetrieveRoutineSession: The created routine session.
     """
     try:
-        db.add(routine_session)
-        db.commit()
-        db.refresh(routine_session)
-        return routine_session
+        change_versions = await next_session_versions(db, [routine_session.user_id])
+        session_db_entry = RoutineSession(**routine_session.model_dump(),
+                                          change_version=change_versions[routine_session.user_id])
+        db.add(session_db_entry)
+        await db.flush()
+        set_rows = sets_from_breakdown(session_db_entry.id, session_db_entry.breakdown, session_db_entry.start_time,
+                                       session_db_entry.user_id)
+        await write_session_sets(db, set_rows)
+        await apply_new_sets(db, {session_db_entry.user_id: set_rows})
+        await apply_session_rollups(db, [rollup_source(
+            session_db_entry.user_id, session_db_entry.start_time, session_db_entry.end_time, session_db_entry.breakdown,
+            set_rows)])
+        await db.commit()
+        return to_retrieve_routine_session(session_db_entry)
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         print(f"Error creating routine session: {e}")
         return None
     except Exception as e:
+        await db.rollback()
         print(f"Unexpected Exception: {e}")
         return None
 
 
+async def bulk_create_routine_sessions(db: Session, routine_sessions: List[Tuple[int, CreateUpdateRoutineSession]],
+                                       batch_size: int) -> BulkImportResult:
+    """
+    Creates many completed routine sessions and their session_sets rows in one transaction using
+    multi-row INSERT ... RETURNING, then raises the personal records and training rollups of their
+    users.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        routine_sessions: (row index, routine session) pairs to create.
+        batch_size (int): number of rows per INSERT statement.
+
+    Returns:
+        BulkImportResult: ids of the created sessions, and rows that were rejected.
+    """
+    # Imported here because routine_template.py imports the models package
+    from db.models.routine_template import RoutineTemplate
+
+    errors = []
+    try:
+        template_ids = {session.routine_template_id for _, session in routine_sessions if session.routine_template_id is not None}
+        result = await db.execute(
+            select(RoutineTemplate.id, RoutineTemplate.user_id).where(RoutineTemplate.id.in_(template_ids)))
+        template_owners = {row.id: row.user_id for row in result.all()}
+
+        exercise_ids = list({exercise_id for _, session in routine_sessions
+                             for exercise_id in breakdown_exercise_ids(session.breakdown)})
+        exercises = await exercise_loader(db).load_many(exercise_ids)
+        existing_exercise_ids = {exercise["id"] for exercise in exercises if exercise is not None}
+
+        user_ids = {session.user_id for _, session in routine_sessions if session.user_id is not None}
+        result = await db.execute(select(User.id).where(User.id.in_(user_ids)))
+        existing_user_ids = set(result.scalars().all())
+
+        valid = []
+        for index, session in routine_sessions:
+            issues = session.validate()
+            if session.routine_template_id is not None:
+                if session.routine_template_id not in template_owners:
+                    issues["routine_template_id"] = f"Routine template (id#{session.routine_template_id}) does not exist."
+                elif not template_usable_by(template_owners[session.routine_template_id], session.user_id):
+                    issues["routine_template_id"] = f"Routine template (id#{session.routine_template_id}) belongs to another user."
+            for exercise_id in breakdown_exercise_ids(session.breakdown):
+                if exercise_id not in existing_exercise_ids:
+                    issues[f"exercise-{exercise_id}"] = f"Exercise (id#{exercise_id}) in breakdown does not exist."
+            if session.user_id is not None and session.user_id not in existing_user_ids:
+                issues["user_id"] = f"User (id#{session.user_id}) does not exist."
+            if issues:
+                errors.append(BulkRowError(index=index, error=" ".join(issues.values())))
+            else:
+                valid.append(session)
+
+        ids, set_rows, sets_by_user, sources = [], [], defaultdict(list), []
+        change_versions = await next_session_versions(db, {session.user_id for session in valid})
+        for start in range(0, len(valid), batch_size):
+            # The sets are built from the returned rows, since RETURNING order is not guaranteed to
+            # follow parameter order and asking for it disables multi-row inserts on some backends
+            result = await db.execute(
+                insert(RoutineSession.__table__)
+                .returning(RoutineSession.id, RoutineSession.start_time, RoutineSession.end_time,
+                           RoutineSession.breakdown, RoutineSession.user_id),
+                [{**session.model_dump(), "change_version": change_versions[session.user_id]}
+                 for session in valid[start:start + batch_size]])
+            for row in result.all():
+                ids.append(row.id)
+                session_set_rows = sets_from_breakdown(row.id, row.breakdown, row.start_time, row.user_id)
+                set_rows.extend(session_set_rows)
+                if row.user_id is not None:
+                    sets_by_user[row.user_id].extend(session_set_rows)
+                    sources.append(rollup_source(row.user_id, row.start_time, row.end_time, row.breakdown, session_set_rows))
+        await write_session_sets(db, set_rows, batch_size)
+        await apply_new_sets(db, sets_by_user)
+        await apply_session_rollups(db, sources)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        print(f"Error bulk creating routine sessions: {e}")
+        return BulkImportResult(inserted=0, ids=[], errors=errors + [BulkRowError(index=-1, error=str(e.__cause__ or e))])
+
+    return BulkImportResult(inserted=len(ids), ids=ids, errors=errors)
+
+
 # Retrieve functions
-def get_session_by_id(db: Session, session_id: int) -> RoutineSession:
+async def get_session_by_id(db: Session, session_id: int) -> Union[RoutineSession, None]:
     """
-    Retrieves the routine session object by ID.
-    
+    Retrieves the routine session object by ID, along with its template and the template's exercises.
+
     Args:
         db (Session): SQLAlchemy session.
         session_id (int): ID of the RoutineSession to retrieve.
-    
+
+    Returns:
+        RoutineSession: The retrieved routine session object.
+    """
+    result = await db.execute(
+        select(RoutineSession)
+        .where(RoutineSession.id == session_id)
+        .options(*loader_options_for(RoutineSession, RetrieveRoutineSession)))
+    return result.scalars().first()
+
+
+async def get_sessions_for_user(db: Session, user_id, limit: int,
+                                before: Union[str, None] = None) -> Tuple[List[Dict], Union[str, None]]:
+    """
+    Retrieves a page of a user's sessions, most recent first, as a seek on the
+    (user_id, start_time DESC, id DESC) index. The templates of the page's sessions are summarized with
+    one IN query.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        user_id (UUID): ID of the user whose sessions to retrieve.
+        limit (int): maximum number of sessions to return.
+        before (str | None): next_before of the previous page, or None for the most recent sessions.
+
     Returns:
-        Category: The retrieved category object.
+        tuple: the sessions on this page, in the shape of UserSessionSummary, and the cursor for the
+        next page (None on the last page).
+
+    Raises:
+        ValueError: if before was not produced by this listing.
     """
-    session = db.query(RoutineSession).filter(RoutineSession.id == session_id).first()
-    return session
+    # Imported here because routine_template.py imports this module
+    from db.models.routine_template import RoutineTemplate
+
+    query = (
+        select(RoutineSession.id, RoutineSession.start_time, RoutineSession.end_time,
+               RoutineSession.routine_template_id, RoutineSession.breakdown)
+        .where(RoutineSession.user_id == user_id))
+    if before:
+        last_key = decode_cursor(before, (datetime, int))
+        if last_key is None:
+            raise ValueError(f"Invalid cursor: {before}")
+        query = query.where(tuple_(RoutineSession.start_time, RoutineSession.id) < tuple_(*last_key))
+
+    # Fetch one extra row to find out whether there is a next page
+    result = await db.execute(
+        query
+        .order_by(RoutineSession.start_time.desc(), RoutineSession.id.desc())
+        .limit(limit + 1))
+    sessions = [dict(row._mapping) for row in result.all()]
+    next_before = None
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        next_before = encode_cursor(sessions[-1]["start_time"].isoformat(), sessions[-1]["id"])
+
+    template_ids = {session["routine_template_id"] for session in sessions if session["routine_template_id"] is not None}
+    templates = {}
+    if template_ids:
+        result = await db.execute(
+            select(RoutineTemplate.id, RoutineTemplate.name).where(RoutineTemplate.id.in_(template_ids)))
+        templates = {row.id: {"id": row.id, "name": row.name} for row in result.all()}
+    for session in sessions:
+        session["routine_template"] = templates.get(session["routine_template_id"])
+    return sessions, next_before
+
+
+EXPORT_COLUMNS = (
+    "session_id", "start_time", "end_time", "duration_seconds", "routine_template_id", "routine_template_name",
+    "exercise_id", "set_index", "reps", "weight", "rpe", "performed_at",
+)
+
+
+def export_rows(session) -> List[Dict]:
+    """ Flattens a session row into one EXPORT_COLUMNS row per set, or one row without set values if it has none """
+    base = {
+        "session_id": session.id,
+        "start_time": session.start_time,
+        "end_time": session.end_time,
+        "duration_seconds": (session.end_time - session.start_time).total_seconds(),
+        "routine_template_id": session.routine_template_id,
+        "routine_template_name": session.routine_template_name,
+    }
+    set_rows = sets_from_breakdown(session.id, session.breakdown, session.start_time)
+    if not set_rows:
+        return [{**base, "exercise_id": None, "set_index": None, "reps": None, "weight": None, "rpe": None,
+                 "performed_at": None}]
+    return [{
+        **base,
+        "exercise_id": row["exercise_id"],
+        "set_index": row["set_index"],
+        "reps": row["reps"],
+        "weight": row["weight"],
+        "rpe": row["rpe"],
+        "performed_at": row["performed_at"],
+    } for row in set_rows]
+
+
+async def stream_session_export(db: Session, user_id, chunk_size: int) -> AsyncIterator[List[Dict]]:
+    """
+    Streams a user's sessions, oldest first, as flattened export rows. Sessions are read through a
+    server-side cursor chunk_size at a time, so memory does not grow with the user's history.
+
+    Args:
+        db (Session): SQLAlchemy session, held for as long as the stream is consumed.
+        user_id (UUID): ID of the user.
+        chunk_size (int): sessions fetched per round trip.
+
+    Yields:
+        list: EXPORT_COLUMNS rows for one chunk of sessions.
+    """
+    # Imported here because routine_template.py imports this module
+    from db.models.routine_template import RoutineTemplate
+
+    result = await db.stream(
+        select(RoutineSession.id, RoutineSession.start_time, RoutineSession.end_time,
+               RoutineSession.routine_template_id, RoutineTemplate.name.label("routine_template_name"),
+               RoutineSession.breakdown)
+        .outerjoin(RoutineTemplate, RoutineTemplate.id == RoutineSession.routine_template_id)
+        .where(RoutineSession.user_id == user_id)
+        .order_by(RoutineSession.start_time, RoutineSession.id)
+        .execution_options(yield_per=chunk_size))
+    async for sessions in result.partitions():
+        yield [row for session in sessions for row in export_rows(session)]
 
 
 # Update functions
-def update_session(db: Session, routine_session: RoutineSession) -> Union[RoutineSession, None]:
+async def update_session(db: Session, session_id: int, routine_session: CreateUpdateRoutineSession) -> Union[RetrieveRoutineSession, None]:
     """
-    Updates the session object with the specified session.
-    
+    Updates the session object with the specified session, replacing its session_sets rows. Personal
+    records the old sets held are recomputed and the new sets are applied, and the training rollups
+    move from the old values to the new ones.
+
     Args:
         db (Session): SQLAlchemy session.
-        routine_session (RoutineSession): Session object with updated values.
-    
+        session_id (int): ID of the routine session to update.
+        routine_session (CreateUpdateRoutineSession): Session values to store.
+
     Returns:
-        session: The updated routine session object, or None if not found or on error.
+        RetrieveRoutineSession: The updated routine session, or None if not found or on error.
     """
     try:
-        existing_session = db.query(RoutineSession).filter(RoutineSession.id == routine_session.id).first()
+        result = await db.execute(select(RoutineSession).where(RoutineSession.id == session_id))
+        existing_session = result.scalars().first()
         if existing_session is None:
             return None
         else:
+            stale_records = await records_set_by_sessions(db, RoutineSession.id == session_id)
+            previous = rollup_source(existing_session.user_id, existing_session.start_time,
+                                     existing_session.end_time, existing_session.breakdown)
+            change_versions = await next_session_versions(db, {existing_session.user_id, routine_session.user_id})
+            # Moving a session to another user deletes it from the previous user's devices
+            if existing_session.user_id is not None and existing_session.user_id != routine_session.user_id:
+                await record_tombstones(db, RoutineSession.__tablename__,
+                                        [(session_id, existing_session.user_id)], change_versions[existing_session.user_id])
+            change_version = change_versions[routine_session.user_id]
             existing_session.start_time = routine_session.start_time
             existing_session.end_time = routine_session.end_time
+            existing_session.routine_template_id = routine_session.routine_template_id
             existing_session.breakdown = routine_session.breakdown
+            existing_session.user_id = routine_session.user_id
+            existing_session.change_version = change_version
 
-            db.commit()
-            db.refresh(existing_session)
-            return existing_session
+            await db.execute(delete(SessionSet).where(SessionSet.session_id == session_id))
+            set_rows = sets_from_breakdown(session_id, routine_session.breakdown, routine_session.start_time,
+                                           routine_session.user_id)
+            await write_session_sets(db, set_rows)
+            await db.flush()
+            await recompute_records(db, stale_records)
+            await apply_new_sets(db, {routine_session.user_id: set_rows})
+            await apply_session_rollups(db, [previous], sign=-1)
+            await apply_session_rollups(db, [rollup_source(
+                routine_session.user_id, routine_session.start_time, routine_session.end_time, routine_session.breakdown,
+                set_rows)])
+            await db.commit()
+            return to_retrieve_routine_session(existing_session)
     except SQLAlchemyError as e:
-        db.rollback()
-        print(f"Error updating user: {e}")
+        await db.rollback()
+        print(f"Error updating routine session: {e}")
         return None
     except Exception as e:
+        await db.rollback()
         print(f"Unexpected Exception: {e}")
         return None
 
 
 # Delete functions
-def delete_exercise(db: Session, session_id: int) -> bool:
+async def remove_sessions(db: Session, session_filter) -> List[int]:
+    """
+    Deletes the sessions matching session_filter with a single DELETE ... RETURNING, then, from the
+    returned rows, recomputes the personal records their sets held, takes them out of the training
+    rollups and tombstones them for delta sync. Does not commit.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        session_filter: SQL expression over RoutineSession selecting the sessions.
+
+    Returns:
+        list: IDs of the sessions that were deleted.
     """
-    Deletes an exercise.
-    
+    result = await db.execute(
+        delete(RoutineSession)
+        .where(session_filter)
+        .returning(RoutineSession.id, RoutineSession.user_id, RoutineSession.start_time, RoutineSession.end_time,
+                   RoutineSession.breakdown))
+    deleted = result.all()
+    stale_records, sources = set(), []
+    for row in deleted:
+        if row.user_id is None:
+            continue
+        set_rows = sets_from_breakdown(row.id, row.breakdown, row.start_time, row.user_id)
+        stale_records |= record_keys(row.user_id, set_rows)
+        sources.append(rollup_source(row.user_id, row.start_time, row.end_time, row.breakdown, set_rows))
+    await recompute_records(db, stale_records)
+    await apply_session_rollups(db, sources, sign=-1)
+    await record_session_tombstones(db, [(row.id, row.user_id) for row in deleted])
+    return [row.id for row in deleted]
+
+
+async def delete_routine_session(db: Session, session_id: int) -> bool:
+    """
+    Deletes a routine session with a single DELETE ... RETURNING, then recomputes the personal records
+    its sets held, takes it out of the user's training rollups and tombstones it for delta sync.
+
     Args:
         db (Session): SQLAlchemy session.
         session_id (int): ID of the routine session to delete.
-    
+
     Returns:
         bool: True if deletion was successful, False otherwise.
     """
     try:
-        # Retrieve the user to ensure it exists
-        session = db.query(RoutineSession).filter(RoutineSession.id == session_id).first()
-        if session is None:
-            print("RoutineSession does not exist..")
-            return False
-        
-        # Delete the exercise itself
-        db.delete(session)
-        
-        # Commit the transaction
-        db.commit()
-        return True
+        deleted = await remove_sessions(db, RoutineSession.id == session_id)
+        await db.commit()
+        return bool(deleted)
     except SQLAlchemyError as e:
-        db.rollback()
+        await db.rollback()
         print(f"Error deleting routine session: {e}")
         return False
     except Exception as e:
-        db.rollback()
-        print(f"Unexpected routine session: {e}")
+        await db.rollback()
+        print(f"Unexpected exception: {e}")
         return False
@@ -1,12 +1,21 @@
-from typing import Union, List
+from datetime import datetime
+from typing import Dict, Union, List, Tuple
 
-from sqlalchemy import Column, Integer, String, ForeignKey, Sequence, JSON, DateTime, Table, select, delete
+from sqlalchemy import BigInteger, Column, Integer, String, ForeignKey, Sequence, JSON, DateTime, Table, select, delete, insert, literal, tuple_
+from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import relationship, Session, selectinload
 
-from core.schemas import CreateUpdateRoutineTemplate
+from core.schemas import CreateUpdateRoutineTemplate, RetrieveExercise, RetrieveRoutineTemplate, RoutineSessionSummary
+from core.utility.pagination import decode_cursor, encode_cursor
 from db.models import Exercise
+from db.models.exercise import exercise_loader
+from db.dataloader import DataLoader, get_loader
 from db.models.exercises_routine_bridge import exercises_routine_bridge
+from db.models.routine_session import RoutineSession, remove_sessions
+from db.models.sync import record_tombstones
+from db.models.table_version import next_change_version
+from db.projection import loader_options_for, project_rows, select_projection
 from db.session import Base
 
 
@@ -17,74 +26,181 @@ class RoutineTemplate(Base):
     name = Column(String(100), nullable=False)
     description = Column(String(300))
     sets = Column(JSON)
+    # A user's templates are private, so they go with their owner; delete_user_from_db removes them
+    # through remove_routine_templates first, so the sessions that cascade are accounted for
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), index=True)
+    # Bumped whenever the row changes; part of the template's ETag
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+    # The routine_templates table version of the last write, read by delta sync
+    change_version = Column(BigInteger, nullable=False, default=0, server_default='0', index=True)
 
     routine_sessions = relationship('RoutineSession', back_populates='routine_template')
     exercises = relationship('Exercise', secondary=exercises_routine_bridge, back_populates='routine_templates')
 
     def __repr__(self):
-        return f"<RoutineTemplate(id={self.id}, name='{self.name}', description='{self.description}', sets={self.sets})>"
+        return f"<RoutineTemplate(id={self.id}, name='{self.name}', description='{self.description}', sets={self.sets}, user_id={self.user_id})>"
 
 
 # Create functions
-async def create_template(db: Session, template: CreateUpdateRoutineTemplate) -> Union[RoutineTemplate, None]:
+async def create_template(db: Session, template: CreateUpdateRoutineTemplate) -> Tuple[Union[RetrieveRoutineTemplate, None], List[int]]:
     """
-    Creates a new Routine Template in the database.
+    Creates a new Routine Template in the database with one INSERT ... RETURNING for the template
+    and one INSERT ... SELECT for its exercises, which links only exercises that exist and returns
+    their ids. If any requested exercise was not linked, nothing is created.
     
     Args:
         db (Session): SQLAlchemy session.
-        template (RoutineTemplate): Routine Template object to be created.
+        template (CreateUpdateRoutineTemplate): Routine Template to be created.
     
     Returns:
-        Routine Template: The created routine template object.
+        Tuple: The created routine template, or None if it was not created, and the ids of the
+        requested exercises that do not exist.
     """
     try:
-        # print("Template Info:")
-        # print(template.name)
-        # print(template.description)
-        # print(template.sets)
-        # print(template.exercises)
-        # print("\n")
-        # Get the exercises first
-        get_exercises_query = await db.execute(select(Exercise).filter(Exercise.id.in_(template.exercises)))
-        exercises = get_exercises_query.scalars().all()
-        template_db_entry = RoutineTemplate(
+        exercise_ids = list(dict.fromkeys(template.exercises or []))
+        result = await db.execute(
+            insert(RoutineTemplate.__table__)
+            .values(name=template.name, description=template.description, sets=template.sets, user_id=template.user_id,
+                    change_version=await next_change_version(db, RoutineTemplate.__tablename__))
+            .returning(RoutineTemplate.id))
+        template_id = result.scalar_one()
+
+        exercises = []
+        if exercise_ids:
+            result = await db.execute(
+                insert(exercises_routine_bridge)
+                .from_select(["routine_template_id", "exercises_id"],
+                             select(literal(template_id), Exercise.id).where(Exercise.id.in_(exercise_ids)))
+                .returning(exercises_routine_bridge.c.exercises_id))
+            linked = set(result.scalars().all())
+            missing = [exercise_id for exercise_id in exercise_ids if exercise_id not in linked]
+            if missing:
+                await db.rollback()
+                return None, missing
+            exercises = await exercise_loader(db).load_many(exercise_ids)
+        await db.commit()
+        return RetrieveRoutineTemplate(
+            id=template_id,
             name=template.name,
             description=template.description,
-            sets=template.sets)
-        template_db_entry.exercises = exercises
-        db.add(template_db_entry)
-        await db.commit()
-        await db.refresh(template_db_entry)
-        return template_db_entry
+            sets=template.sets,
+            user_id=template.user_id,
+            exercises=exercises), []
     except SQLAlchemyError as e:
         await db.rollback()
-        print(f"Error updating user: {e}")
-        return None
+        print(f"Error creating routine template: {e}")
+        return None, []
     except Exception as e:
+        await db.rollback()
         print(f"Unexpected Exception: {e}")
-        return None
+        return None, []
 
 
 # Retrieve functions
 async def get_template_by_id(db: Session, template_id: int) -> Union[RoutineTemplate, None]:
     """
-    Retrieves the routine template object by ID.
+    Retrieves the routine template object by ID. Only the relationships RetrieveRoutineTemplate
+    serializes are loaded; sessions are read separately with get_sessions_for_template.
     
     Args:
         db (Session): SQLAlchemy session.
         template_id (int): ID of the template to retrieve.
     
     Returns:
-        Template: The retrieved routine template object.
+        Template: The retrieved routine template object, or None if it does not exist.
     """
     result = await db.execute(
         select(RoutineTemplate)
         .where(RoutineTemplate.id == template_id)
-        .options(selectinload(RoutineTemplate.exercises), selectinload(RoutineTemplate.routine_sessions)))
-    template = result.scalars().first()
-    if template is None:
+        .options(*loader_options_for(RoutineTemplate, RetrieveRoutineTemplate)))
+    return result.scalars().first()
+
+
+async def _select_templates_by_ids(db: Session, template_ids: List[int]) -> Dict[int, Dict]:
+    # One IN query for the templates and one join through the bridge table for all their exercises
+    template_fields = [name for name in RetrieveRoutineTemplate.model_fields if name != "exercises"]
+    result = await db.execute(
+        select(*(getattr(RoutineTemplate, name).label(name) for name in template_fields))
+        .where(RoutineTemplate.id.in_(template_ids)))
+    templates = {template["id"]: {**template, "exercises": []} for template in project_rows(result.all())}
+    if not templates:
         return {}
-    return template
+
+    result = await db.execute(
+        select_projection(Exercise, RetrieveExercise)
+        .add_columns(exercises_routine_bridge.c.routine_template_id.label("routine_template_id"))
+        .join(exercises_routine_bridge, exercises_routine_bridge.c.exercises_id == Exercise.id)
+        .where(exercises_routine_bridge.c.routine_template_id.in_(list(templates)))
+        .order_by(exercises_routine_bridge.c.routine_template_id, Exercise.id))
+    for exercise in project_rows(result.all()):
+        templates[exercise.pop("routine_template_id")]["exercises"].append(exercise)
+    return templates
+
+
+def routine_template_loader(db: Session) -> DataLoader:
+    """ Request-scoped loader of routine templates by id, in the shape of RetrieveRoutineTemplate """
+    return get_loader(db, "routine_template", lambda template_ids: _select_templates_by_ids(db, template_ids))
+
+
+async def get_templates_by_ids(db: Session, template_ids: List[int]) -> Dict[int, Dict]:
+    """
+    Retrieves many routine templates by ID in two queries: one IN query for the templates and one
+    join through the bridge table for the exercises of all of them.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        template_ids (list): IDs of the templates to retrieve.
+
+    Returns:
+        dict: the templates that exist, in the shape of RetrieveRoutineTemplate, keyed by ID.
+    """
+    templates = await routine_template_loader(db).load_many(template_ids)
+    return {template["id"]: template for template in templates if template is not None}
+
+
+async def get_sessions_for_template(db: Session, template_id: int, limit: int,
+                                    cursor: Union[str, None] = None) -> Tuple[List[Dict], Union[str, None]]:
+    """
+    Retrieves a page of a template's sessions, most recent first, seeking past the given cursor.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        template_id (int): ID of the template whose sessions to retrieve.
+        limit (int): maximum number of sessions to return.
+        cursor (str | None): cursor returned with the previous page, or None for the first page.
+
+    Returns:
+        tuple: the sessions on this page, in the shape of RoutineSessionSummary, and the cursor for
+        the next page (None on the last page).
+
+    Raises:
+        ValueError: if the cursor was not produced by this listing.
+    """
+    query = select_projection(RoutineSession, RoutineSessionSummary).where(RoutineSession.routine_template_id == template_id)
+    if cursor:
+        last_key = decode_cursor(cursor, (datetime, int))
+        if last_key is None:
+            raise ValueError(f"Invalid cursor: {cursor}")
+        query = query.where(tuple_(RoutineSession.start_time, RoutineSession.id) < tuple_(*last_key))
+
+    # Fetch one extra row to find out whether there is a next page
+    result = await db.execute(
+        query
+        .order_by(RoutineSession.start_time.desc(), RoutineSession.id.desc())
+        .limit(limit + 1))
+    sessions = project_rows(result.all())
+    if len(sessions) <= limit:
+        return sessions, None
+
+    sessions = sessions[:limit]
+    last = sessions[-1]
+    return sessions, encode_cursor(last["start_time"].isoformat(), last["id"])
+
+
+async def get_template_version(db: Session, template_id: int) -> Union[int, None]:
+    """ The template's row version, or None if it does not exist """
+    result = await db.execute(select(RoutineTemplate.version).where(RoutineTemplate.id == template_id))
+    return result.scalar_one_or_none()
 
 
 # Update functions
@@ -107,6 +223,7 @@ def update_routine(db: Session, template: RoutineTemplate) -> Union[RoutineTempl
             existing_template.name = template.name
             existing_template.description = template.description
             existing_template.exercises = template.exercises
+            existing_template.version += 1
             db.commit()
             db.refresh(existing_template)
             return existing_template
@@ -138,7 +255,8 @@ async def get_exercises_from_routine(db: Session, template_id: int) -> List[Exer
 # Delete functions
 async def delete_routine_template(db: Session, template_id: int) -> bool:
     """
-    Deletes a routine template and all exercises associated with that routine template.
+    Deletes a routine template and its sessions through delete_routine_templates. Its exercise links
+    are removed by the foreign key's ON DELETE CASCADE.
     
     Args:
         db (Session): SQLAlchemy session.
@@ -147,28 +265,60 @@ async def delete_routine_template(db: Session, template_id: int) -> bool:
     Returns:
         bool: True if deletion was successful, False otherwise.
     """
+    return template_id in await delete_routine_templates(db, [template_id])
+
+
+async def remove_routine_templates(db: Session, template_ids: List[int]) -> List[int]:
+    """
+    The body of delete_routine_templates, for callers that delete templates as part of a larger
+    transaction. Does not commit.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        template_ids (list): IDs of the routine templates to delete.
+
+    Returns:
+        list: IDs of the templates that were deleted.
+    """
+    # Locking the templates first keeps sessions from being logged against them until this commits,
+    # so the foreign key has no sessions left to cascade to
+    await db.execute(select(RoutineTemplate.id).where(RoutineTemplate.id.in_(template_ids)).with_for_update())
+    await remove_sessions(db, RoutineSession.routine_template_id.in_(template_ids))
+    result = await db.execute(
+        delete(RoutineTemplate)
+        .where(RoutineTemplate.id.in_(template_ids))
+        .returning(RoutineTemplate.id, RoutineTemplate.user_id))
+    deleted_rows = [tuple(row) for row in result.all()]
+    if deleted_rows:
+        await record_tombstones(db, RoutineTemplate.__tablename__, deleted_rows,
+                                await next_change_version(db, RoutineTemplate.__tablename__))
+    return [template_id for template_id, _ in deleted_rows]
+
+
+async def delete_routine_templates(db: Session, template_ids: List[int]) -> List[int]:
+    """
+    Deletes many routine templates with a single DELETE ... RETURNING, after deleting their sessions
+    with remove_sessions, which recomputes the personal records they held, takes them out of the
+    training rollups and tombstones them. The templates are tombstoned for delta sync too.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        template_ids (list): IDs of the routine templates to delete.
+
+    Returns:
+        list: IDs of the templates that were deleted.
+    """
+    if not template_ids:
+        return []
     try:
-        print("hello")
-        # Retrieve the routine template to ensure it exists
-        template = await get_template_by_id(db, template_id)
-        if template is None:
-            print("Routine Template not found.")
-            return False
-        delete_template_by_id = (
-            delete(RoutineTemplate)
-            .where(RoutineTemplate.id == template_id)
-        )
-        result = await db.execute(delete_template_by_id)
+        deleted = await remove_routine_templates(db, template_ids)
         await db.commit()
-        if result.rowcount == 1:
-            return True
-        else:
-            return False
+        return deleted
     except SQLAlchemyError as e:
         await db.rollback()
-        print(f"Error deleting routine template: {e}")
-        return False
+        print(f"Error deleting routine templates: {e}")
+        return []
     except Exception as e:
         await db.rollback()
         print(f"Unexpected exception: {e}")
-        return False
+        return []
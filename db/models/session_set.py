@@ -0,0 +1,150 @@
+import math
+import uuid
+from datetime import datetime
+from typing import Dict, List, Union
+
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, Sequence, insert, select
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session
+
+from core.schemas.common import RetrieveSessionSet
+from db.projection import project_rows, select_projection
+from db.session import Base
+
+
+class SessionSet(Base):
+    """ One logged set of a routine session, normalized out of the session's breakdown """
+    __tablename__ = 'session_sets'
+    __table_args__ = (
+        # A user's per-exercise history is a range scan over performed_at
+        Index('ix_session_sets_user_id_exercise_id_performed_at', 'user_id', 'exercise_id', 'performed_at'),
+        Index('ix_session_sets_session_id', 'session_id'),
+    )
+
+    id = Column(Integer, Sequence('session_sets_id_seq'), primary_key=True)
+    session_id = Column(Integer, ForeignKey('routine_sessions.id', ondelete='CASCADE'), nullable=False)
+    # The session's user, copied here so history is scoped without a join; rewritten with the session's sets
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'))
+    exercise_id = Column(Integer, ForeignKey('exercises.id', ondelete='CASCADE'), nullable=False)
+    set_index = Column(Integer, nullable=False)
+    reps = Column(Integer)
+    weight = Column(Float)
+    rpe = Column(Float)
+    performed_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<SessionSet(id={self.id}, session_id={self.session_id}, exercise_id={self.exercise_id}, set_index={self.set_index}, reps={self.reps}, weight={self.weight}, rpe={self.rpe})>"
+
+
+def _number(value, cast) -> Union[int, float, None]:
+    """ value as cast, or None if it is not a finite number, or with cast int, not a whole one """
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        return None
+    try:
+        if cast is int and isinstance(value, float):
+            # int() would truncate 5.9 to 5; inf and nan are not integers either
+            return int(value) if value.is_integer() else None
+        number = cast(value)
+    except (ValueError, OverflowError):
+        return None
+    return number if cast is int or math.isfinite(number) else None
+
+
+def _timestamp(value, default: datetime) -> datetime:
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return default
+
+
+def breakdown_exercise_ids(breakdown: Union[Dict, None]) -> List[int]:
+    """ Exercise ids a breakdown logs sets for; keys that are not ids are ignored """
+    return list(dict.fromkeys(
+        exercise_id for exercise_id in (_number(key, int) for key in (breakdown or {})) if exercise_id is not None))
+
+
+def sets_from_breakdown(session_id: int, breakdown: Union[Dict, None], performed_at: datetime,
+                        user_id: uuid.UUID = None) -> List[Dict]:
+    """
+    Converts a session breakdown, {"<exercise id>": [{"reps": 5, "weight": 100, "rpe": 8}, ...]}, into
+    session_sets rows.
+
+    Args:
+        session_id (int): ID of the session the breakdown belongs to.
+        breakdown (dict): the session's breakdown.
+        performed_at (datetime): timestamp for sets that do not carry their own "performed_at",
+            normally the session's start time.
+        user_id (UUID): ID of the session's user, if it has one.
+
+    Returns:
+        list: rows for the session_sets table. Entries that are not objects are skipped.
+    """
+    rows = []
+    for key, sets in (breakdown or {}).items():
+        exercise_id = _number(key, int)
+        if exercise_id is None or not isinstance(sets, list):
+            continue
+        for set_index, entry in enumerate(sets):
+            if not isinstance(entry, dict):
+                continue
+            rows.append({
+                "session_id": session_id,
+                "user_id": user_id,
+                "exercise_id": exercise_id,
+                "set_index": set_index,
+                "reps": _number(entry.get("reps"), int),
+                "weight": _number(entry.get("weight"), float),
+                "rpe": _number(entry.get("rpe"), float),
+                "performed_at": _timestamp(entry.get("performed_at"), performed_at),
+            })
+    return rows
+
+
+# Create functions
+async def write_session_sets(db: Session, rows: List[Dict], batch_size: int = 1000):
+    """
+    Inserts session_sets rows with multi-row INSERTs. Does not commit, so the sets land in the same
+    transaction as the session they belong to.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        rows (list): rows built by sets_from_breakdown.
+        batch_size (int): number of rows per INSERT statement.
+    """
+    for start in range(0, len(rows), batch_size):
+        await db.execute(insert(SessionSet.__table__), rows[start:start + batch_size])
+
+
+# Retrieve functions
+async def get_exercise_history(db: Session, user_id: uuid.UUID, exercise_id: int, since: Union[datetime, None],
+                               until: Union[datetime, None], limit: int) -> List[Dict]:
+    """
+    Retrieves the sets a user logged for an exercise, most recent first, as a range scan of the
+    (user_id, exercise_id, performed_at) index.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        user_id (UUID): ID of the user whose sets to retrieve.
+        exercise_id (int): ID of the exercise.
+        since (datetime | None): only sets performed at or after this time.
+        until (datetime | None): only sets performed before this time.
+        limit (int): maximum number of sets to return.
+
+    Returns:
+        list: sets in the shape of RetrieveSessionSet.
+    """
+    query = (
+        select_projection(SessionSet, RetrieveSessionSet)
+        .where(SessionSet.user_id == user_id)
+        .where(SessionSet.exercise_id == exercise_id))
+    if since is not None:
+        query = query.where(SessionSet.performed_at >= since)
+    if until is not None:
+        query = query.where(SessionSet.performed_at < until)
+    result = await db.execute(
+        query
+        .order_by(SessionSet.performed_at.desc())
+        .limit(limit))
+    return project_rows(result.all())
@@ -0,0 +1,193 @@
+import uuid
+from datetime import datetime, timezone
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple, Union
+
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String, Sequence, insert, or_, select
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session
+
+from db.models.table_version import bump_table_versions, get_table_versions
+from db.projection import project_rows, select_projection
+from db.session import Base
+
+# Tables delta sync covers, in the order their versions appear in a sync token
+SYNC_TABLES = ("categories", "exercises", "routine_templates", "routine_sessions")
+
+
+def session_version_name(user_id: uuid.UUID) -> str:
+    """
+    The table_versions row that versions one user's sessions. Sessions are versioned per user, since
+    a sync only reads one user's sessions, so session writes of different users do not queue on the
+    lock of a single counter row.
+    """
+    return f"routine_sessions:{user_id}"
+
+
+class SyncTombstone(Base):
+    """ Records a deleted row so clients that synced it before can drop it """
+    __tablename__ = 'sync_tombstones'
+    __table_args__ = (
+        Index('ix_sync_tombstones_table_name_change_version', 'table_name', 'change_version'),
+    )
+
+    id = Column(Integer, Sequence('sync_tombstones_id_seq'), primary_key=True)
+    table_name = Column(String(100), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    # Owner of a user's template or session, so only their devices are told
+    user_id = Column(UUID(as_uuid=True))
+    change_version = Column(BigInteger, nullable=False)
+    deleted_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<SyncTombstone(table_name='{self.table_name}', row_id={self.row_id}, change_version={self.change_version})>"
+
+
+# Update functions
+async def next_session_versions(db: Session, user_ids: Iterable[Union[uuid.UUID, None]]) -> Dict[Union[uuid.UUID, None], int]:
+    """
+    Bumps the session version of each user, to stamp their written sessions with. Sessions without
+    a user are never synced and get 0. Does not commit.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        user_ids: users whose sessions the transaction writes; None stands for sessions without one.
+
+    Returns:
+        dict: the new session version per user.
+    """
+    versions = {user_id: 0 for user_id in user_ids if user_id is None}
+    names = {session_version_name(user_id): user_id for user_id in user_ids if user_id is not None}
+    if names:
+        # Counter rows are locked in name order, so transactions writing for the same users cannot deadlock
+        bumped = await bump_table_versions(db, *sorted(names))
+        versions.update((names[name], version) for name, version in bumped.items())
+    return versions
+
+
+# Create functions
+async def record_tombstones(db: Session, table_name: str, rows: Iterable[Tuple[int, Union[uuid.UUID, None]]],
+                            change_version: int):
+    """
+    Records deleted rows in the transaction that deletes them. Does not commit.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        table_name (str): table the rows were deleted from.
+        rows: (row id, owning user id or None) pairs.
+        change_version (int): the table's version bumped by the delete.
+    """
+    deleted_at = datetime.now(timezone.utc)
+    tombstones = [{"table_name": table_name, "row_id": row_id, "user_id": user_id,
+                   "change_version": change_version, "deleted_at": deleted_at} for row_id, user_id in rows]
+    if tombstones:
+        await db.execute(insert(SyncTombstone.__table__), tombstones)
+
+
+async def record_session_tombstones(db: Session, rows: Iterable[Tuple[int, Union[uuid.UUID, None]]]):
+    """
+    Records deleted sessions, each at a new session version of its user. Sessions without a user were
+    never synced and are skipped. Does not commit.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        rows: (session id, user id or None) pairs.
+    """
+    by_user: Dict[uuid.UUID, List[Tuple[int, uuid.UUID]]] = defaultdict(list)
+    for session_id, user_id in rows:
+        if user_id is not None:
+            by_user[user_id].append((session_id, user_id))
+    if not by_user:
+        return
+    versions = await next_session_versions(db, by_user)
+    for user_id, user_rows in by_user.items():
+        await record_tombstones(db, "routine_sessions", user_rows, versions[user_id])
+
+
+# Retrieve functions
+async def get_sync_versions(db: Session, user_id: Union[uuid.UUID, None]) -> Dict[str, int]:
+    """ The current version of each of SYNC_TABLES, with user_id's session version for routine_sessions """
+    names = ["categories", "exercises", "routine_templates"]
+    if user_id is not None:
+        names.append(session_version_name(user_id))
+    versions = await get_table_versions(db, *names)
+    return {
+        "categories": versions["categories"],
+        "exercises": versions["exercises"],
+        "routine_templates": versions["routine_templates"],
+        "routine_sessions": versions[session_version_name(user_id)] if user_id is not None else 0,
+    }
+
+
+async def get_changes(db: Session, since: Union[Dict[str, int], None], until: Dict[str, int],
+                      user_id: Union[uuid.UUID, None]) -> Dict:
+    """
+    Collects the rows of SYNC_TABLES written or deleted after since and up to until, each table
+    read as one range scan over its change_version index.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        since (dict | None): per-table versions the client already has, or None for everything.
+        until (dict): per-table versions read at the start of the sync, so rows committed while
+            it runs are left for the next one.
+        user_id (UUID | None): user whose templates and sessions to include alongside the shared
+            catalog; without one, only shared rows are returned.
+
+    Returns:
+        dict: upserted rows per table in the shape of their Retrieve schema, and deleted ids per table.
+    """
+    # Imported here because the models import this module
+    from core.schemas.common import RetrieveCategory, RetrieveExercise, SyncRoutineSession
+    from db.models.category import Category
+    from db.models.exercise import Exercise
+    from db.models.routine_session import RoutineSession
+    from db.models.routine_template import RoutineTemplate, get_templates_by_ids
+
+    def in_range(model, table_name: str):
+        conditions = [model.change_version <= until[table_name]]
+        if since is not None:
+            conditions.append(model.change_version > since[table_name])
+        return conditions
+
+    result = await db.execute(select_projection(Category, RetrieveCategory).where(*in_range(Category, "categories")))
+    categories = project_rows(result.all())
+    result = await db.execute(select_projection(Exercise, RetrieveExercise).where(*in_range(Exercise, "exercises")))
+    exercises = project_rows(result.all())
+
+    owned = [RoutineTemplate.user_id.is_(None)]
+    if user_id is not None:
+        owned.append(RoutineTemplate.user_id == user_id)
+    result = await db.execute(
+        select(RoutineTemplate.id).where(*in_range(RoutineTemplate, "routine_templates")).where(or_(*owned)))
+    template_ids = list(result.scalars().all())
+    templates = list((await get_templates_by_ids(db, template_ids)).values()) if template_ids else []
+
+    sessions = []
+    if user_id is not None:
+        result = await db.execute(
+            select_projection(RoutineSession, SyncRoutineSession)
+            .where(RoutineSession.user_id == user_id)
+            .where(*in_range(RoutineSession, "routine_sessions")))
+        sessions = project_rows(result.all())
+
+    deleted = {table_name: [] for table_name in SYNC_TABLES}
+    # A full sync has nothing to remove
+    if since is not None:
+        owned = [SyncTombstone.user_id.is_(None)]
+        if user_id is not None:
+            owned.append(SyncTombstone.user_id == user_id)
+        for table_name in SYNC_TABLES:
+            result = await db.execute(
+                select(SyncTombstone.row_id)
+                .where(SyncTombstone.table_name == table_name)
+                .where(*in_range(SyncTombstone, table_name))
+                .where(or_(*owned)))
+            deleted[table_name] = list(dict.fromkeys(result.scalars().all()))
+
+    return {
+        "categories": categories,
+        "exercises": exercises,
+        "routine_templates": templates,
+        "routine_sessions": sessions,
+        "deleted": deleted,
+    }
@@ -0,0 +1,55 @@
+from typing import Dict
+
+from sqlalchemy import BigInteger, Column, String, select
+from sqlalchemy.orm import Session
+
+from db.session import Base
+from db.upsert import upsert_increments
+
+
+class TableVersion(Base):
+    """
+    Counter bumped by every write to a table, so readers can tell whether it changed. Rows written
+    by the bump's transaction are stamped with the new value as their change_version; the row lock
+    the bump takes makes versions commit in order, which is what lets sync tokens skip nothing.
+    Sessions are counted per user, in rows named by sync.session_version_name.
+    """
+    __tablename__ = 'table_versions'
+
+    name = Column(String(100), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<TableVersion(name='{self.name}', version={self.version})>"
+
+
+# Update functions
+async def bump_table_versions(db: Session, *names: str) -> Dict[str, int]:
+    """
+    Marks tables as changed. Call it in the transaction that writes them, so the new version
+    becomes visible together with the new rows. Does not commit.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        names (str): table names, e.g. Exercise.__tablename__.
+
+    Returns:
+        dict: each table's new version, to stamp the written rows with.
+    """
+    rows = await upsert_increments(db, TableVersion.__table__, ("name",),
+                                   [{"name": name, "version": 1} for name in names], returning=("name", "version"))
+    return {row.name: row.version for row in rows}
+
+
+async def next_change_version(db: Session, name: str) -> int:
+    """ Bumps one table's version and returns it """
+    return (await bump_table_versions(db, name))[name]
+
+
+# Retrieve functions
+async def get_table_versions(db: Session, *names: str) -> Dict[str, int]:
+    """ Current version of each named table, 0 for tables that were never written """
+    result = await db.execute(select(TableVersion.name, TableVersion.version).where(TableVersion.name.in_(names)))
+    versions = dict.fromkeys(names, 0)
+    versions.update((row.name, row.version) for row in result.all())
+    return versions
@@ -0,0 +1,180 @@
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Tuple, Union
+
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer, String, delete, select
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session
+
+from db.models.exercise import exercise_loader
+from db.models.session_set import breakdown_exercise_ids, sets_from_breakdown
+from db.session import Base
+from db.upsert import upsert_increments
+
+GRANULARITIES = ("day", "week", "month")
+
+
+class UserTrainingRollup(Base):
+    """ A user's training totals for one day, week or month """
+    __tablename__ = 'user_training_rollups'
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    granularity = Column(String(5), primary_key=True)
+    bucket_start = Column(Date, primary_key=True)
+    sessions = Column(Integer, nullable=False, default=0)
+    duration_seconds = Column(Float, nullable=False, default=0)
+    sets = Column(Integer, nullable=False, default=0)
+    tonnage = Column(Float, nullable=False, default=0)
+
+
+class CategoryTrainingRollup(Base):
+    """ A user's training totals in one exercise category for one day, week or month """
+    __tablename__ = 'category_training_rollups'
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    granularity = Column(String(5), primary_key=True)
+    bucket_start = Column(Date, primary_key=True)
+    category_id = Column(Integer, ForeignKey('categories.id', ondelete='CASCADE'), primary_key=True)
+    sessions = Column(Integer, nullable=False, default=0)
+    sets = Column(Integer, nullable=False, default=0)
+    tonnage = Column(Float, nullable=False, default=0)
+
+
+def bucket_start(moment: Union[datetime, date], granularity: str) -> date:
+    """ First day of the UTC day, ISO week or month containing moment """
+    if isinstance(moment, datetime):
+        # SQLite hands back naive datetimes for timezone aware columns; they are stored as UTC
+        day = (moment.astimezone(timezone.utc) if moment.tzinfo else moment).date()
+    else:
+        day = moment
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+async def _rollup_deltas(db: Session, sessions: List[Dict], sign: int) -> Tuple[Dict, Dict]:
+    """ Sums the sessions' contributions per user bucket and per user category bucket """
+    exercise_ids = list({exercise_id for session in sessions for exercise_id in breakdown_exercise_ids(session["breakdown"])})
+    exercises = await exercise_loader(db).load_many(exercise_ids)
+    categories = {exercise["id"]: exercise["category_id"] for exercise in exercises if exercise is not None}
+
+    user_deltas = defaultdict(lambda: {"sessions": 0, "duration_seconds": 0.0, "sets": 0, "tonnage": 0.0})
+    category_deltas = defaultdict(lambda: {"sessions": 0, "sets": 0, "tonnage": 0.0})
+    for session in sessions:
+        if session["user_id"] is None:
+            continue
+        sets, tonnage = 0, 0.0
+        per_category = defaultdict(lambda: [0, 0.0])
+        set_rows = session["sets"]
+        if set_rows is None:
+            set_rows = sets_from_breakdown(0, session["breakdown"], session["start_time"])
+        for row in set_rows:
+            volume = row["reps"] * row["weight"] if row["reps"] is not None and row["weight"] is not None else 0.0
+            sets += 1
+            tonnage += volume
+            category_id = categories.get(row["exercise_id"])
+            if category_id is not None:
+                per_category[category_id][0] += 1
+                per_category[category_id][1] += volume
+        duration = (session["end_time"] - session["start_time"]).total_seconds()
+
+        for granularity in GRANULARITIES:
+            bucket = (session["user_id"], granularity, bucket_start(session["start_time"], granularity))
+            totals = user_deltas[bucket]
+            totals["sessions"] += sign
+            totals["duration_seconds"] += sign * duration
+            totals["sets"] += sign * sets
+            totals["tonnage"] += sign * tonnage
+            for category_id, (category_sets, category_tonnage) in per_category.items():
+                category_totals = category_deltas[bucket + (category_id,)]
+                category_totals["sessions"] += sign
+                category_totals["sets"] += sign * category_sets
+                category_totals["tonnage"] += sign * category_tonnage
+    return user_deltas, category_deltas
+
+
+def rollup_source(user_id, start_time: datetime, end_time: datetime, breakdown: Union[Dict, None],
+                  set_rows: Union[List[Dict], None] = None) -> Dict:
+    """ What apply_session_rollups needs to know about a session; pass set_rows when they were already built """
+    return {"user_id": user_id, "start_time": start_time, "end_time": end_time, "breakdown": breakdown,
+            "sets": set_rows}
+
+
+# Update functions
+async def apply_session_rollups(db: Session, sessions: List[Dict], sign: int = 1):
+    """
+    Adds sessions to, or with sign=-1 removes them from, the day, week and month rollups of their
+    users. Only the buckets the sessions fall in are touched. Does not commit.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        sessions (list): dicts built by rollup_source.
+        sign (int): 1 when the sessions were written, -1 when they were removed or are being replaced.
+
+    Sets are attributed to the category their exercise has now, so recategorized exercises leave
+    the category rollups stale until python -m db.rebuild_training_rollups runs.
+    """
+    user_deltas, category_deltas = await _rollup_deltas(db, sessions, sign)
+    user_keys = ("user_id", "granularity", "bucket_start")
+    category_keys = user_keys + ("category_id",)
+    await upsert_increments(db, UserTrainingRollup.__table__, user_keys,
+                            [{**dict(zip(user_keys, key)), **totals} for key, totals in user_deltas.items()])
+    await upsert_increments(db, CategoryTrainingRollup.__table__, category_keys,
+                            [{**dict(zip(category_keys, key)), **totals} for key, totals in category_deltas.items()])
+    if sign < 0:
+        # Buckets whose sessions were all removed
+        user_ids = {key[0] for key in user_deltas}
+        await db.execute(delete(UserTrainingRollup)
+                         .where(UserTrainingRollup.user_id.in_(user_ids))
+                         .where(UserTrainingRollup.sessions <= 0))
+        await db.execute(delete(CategoryTrainingRollup)
+                         .where(CategoryTrainingRollup.user_id.in_(user_ids))
+                         .where(CategoryTrainingRollup.sessions <= 0))
+
+
+# Retrieve functions
+async def get_training_stats(db: Session, user_id: uuid.UUID, granularity: str, start: date,
+                             end: Union[date, None]) -> List[Dict]:
+    """
+    Reads a user's rollups for a range of buckets, with per-category totals nested in each bucket.
+
+    Args:
+        db (Session): SQLAlchemy session.
+        user_id (UUID): ID of the user.
+        granularity (str): "day", "week" or "month".
+        start (date): the bucket containing this day is the first one returned.
+        end (date | None): buckets starting on or after this day are left out.
+
+    Returns:
+        list: buckets in the shape of TrainingStatsBucket, oldest first.
+    """
+    start = bucket_start(start, granularity)
+    filters = [UserTrainingRollup.user_id == user_id, UserTrainingRollup.granularity == granularity,
+               UserTrainingRollup.bucket_start >= start]
+    category_filters = [CategoryTrainingRollup.user_id == user_id, CategoryTrainingRollup.granularity == granularity,
+                        CategoryTrainingRollup.bucket_start >= start]
+    if end is not None:
+        filters.append(UserTrainingRollup.bucket_start < end)
+        category_filters.append(CategoryTrainingRollup.bucket_start < end)
+
+    result = await db.execute(
+        select(UserTrainingRollup.bucket_start, UserTrainingRollup.sessions, UserTrainingRollup.duration_seconds,
+               UserTrainingRollup.sets, UserTrainingRollup.tonnage)
+        .where(*filters)
+        .order_by(UserTrainingRollup.bucket_start))
+    buckets = {row.bucket_start: {**row._mapping, "categories": []} for row in result.all()}
+
+    result = await db.execute(
+        select(CategoryTrainingRollup.bucket_start, CategoryTrainingRollup.category_id,
+               CategoryTrainingRollup.sessions, CategoryTrainingRollup.sets, CategoryTrainingRollup.tonnage)
+        .where(*category_filters)
+        .order_by(CategoryTrainingRollup.bucket_start, CategoryTrainingRollup.category_id))
+    for row in result.all():
+        bucket = buckets.get(row.bucket_start)
+        if bucket is not None:
+            bucket["categories"].append({
+                "category_id": row.category_id, "sessions": row.sessions, "sets": row.sets, "tonnage": row.tonnage})
+    return list(buckets.values())
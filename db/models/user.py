@@ -3,9 +3,14 @@ from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import Column, Integer, String, select, delete
+from typing import Dict, List, Union
+from db.models.sync import session_version_name
+from db.models.table_version import TableVersion
+from db.projection import project_rows, select_projection
 from db.session import Base
 from core.schemas.common import CreateUpdateUser, RetrieveUser
-from passlib.context import CryptContext
+from core.utility.auth import verified_tokens
+from core.utility.password_hashing import password_hasher
 
 
 class User(Base):
@@ -20,13 +25,6 @@ class User(Base):
     password = Column(String)
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-
 # Create Functions
 async def create_user(db: Session, user: CreateUpdateUser):
     """ creates a new user given a defined user object """
@@ -36,7 +34,7 @@ async def create_user(db: Session, user: CreateUpdateUser):
         username=user.username,
         phone_number=user.phone_number,
         email=user.email,
-        password=get_password_hash(user.password))
+        password=await password_hasher.hash(user.password))
 
     db.add(user_db_entry)
     await db.commit()
@@ -59,6 +57,43 @@ async def get_user(db: Session, user_id: uuid):
     return user
 
 
+async def get_user_by_email(db: Session, email: str) -> Union[User, None]:
+    """ Retrieves a user by their email, which is unique """
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+
+async def get_user_by_phone_number(db: Session, phone_number: str) -> Union[User, None]:
+    """
+    Retrieves a user by their phone number. Phone numbers are not unique, so a number shared by
+    several users identifies none of them and None is returned.
+    """
+    result = await db.execute(select(User).where(User.phone_number == phone_number).limit(2))
+    users = result.scalars().all()
+    return users[0] if len(users) == 1 else None
+
+
+async def user_exists(db: Session, user_id: uuid.UUID) -> bool:
+    """ Whether a user with this uuid exists, without loading the row """
+    result = await db.execute(select(User.id).where(User.id == user_id))
+    return result.scalar_one_or_none() is not None
+
+
+async def get_users_by_ids(db: Session, user_ids: List[uuid.UUID]) -> Dict[uuid.UUID, Dict]:
+    """ Retrieves many users with a single IN query, keyed by uuid, in the shape of RetrieveUser """
+    if not user_ids:
+        return {}
+    result = await db.execute(select_projection(User, RetrieveUser).where(User.id.in_(user_ids)))
+    return {user["id"]: user for user in project_rows(result.all())}
+
+
+async def verify_user_password(user: User, password: str) -> bool:
+    """ Checks a login attempt's password against the user's stored hash, or a dummy one if there is no user """
+    if user is None or not user.password:
+        return await password_hasher.verify_dummy(password)
+    return await password_hasher.verify(password, user.password)
+
+
 # Update Functions
 def update_user(db: Session, user: User):
     """ Updates an existing user """
@@ -84,7 +119,9 @@ def update_user(db: Session, user: User):
 # Delete functions
 async def delete_user_from_db(db: Session, user_id: uuid) -> bool:
     """
-    Deletes a user.
+    Deletes a user with a single DELETE ... RETURNING. Their private templates are deleted with them,
+    along with other users' sessions logged against those templates, and their cached access tokens
+    are dropped.
     
     Args:
         db (Session): SQLAlchemy session.
@@ -93,21 +130,22 @@ async def delete_user_from_db(db: Session, user_id: uuid) -> bool:
     Returns:
         bool: True if deletion was successful, False otherwise.
     """
+    # Imported here because routine_template.py imports this module
+    from db.models.routine_template import RoutineTemplate, remove_routine_templates
+
     try:
-        # Retrieve the user to ensure it exists
-        user = await get_user(db, user_id)
-        if user is None:
-            return False
-        # Delete the user itself
-        result = await db.execute(
-            delete(User)
-            .where(User.id == user.id)
-        )
+        result = await db.execute(select(RoutineTemplate.id).where(RoutineTemplate.user_id == user_id))
+        owned_template_ids = list(result.scalars().all())
+        if owned_template_ids:
+            await remove_routine_templates(db, owned_template_ids)
+        result = await db.execute(delete(User).where(User.id == user_id).returning(User.id))
+        deleted = result.scalar_one_or_none()
+        await db.execute(delete(TableVersion).where(TableVersion.name == session_version_name(user_id)))
         await db.commit()
-        if result.rowcount == 1:
-            return True
-        else:
-            return False
+        if deleted is not None:
+            # Tokens other workers cached stay usable until they expire
+            verified_tokens.invalidate_subject(deleted)
+        return deleted is not None
     except SQLAlchemyError as e:
         await db.rollback()
         print(f"Error deleting user: {e}")
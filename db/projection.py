@@ -0,0 +1,68 @@
+from typing import Dict, List, Type, Union, get_args
+
+from pydantic import BaseModel
+from sqlalchemy import Select, inspect, select
+from sqlalchemy.orm import selectinload
+
+
+def select_projection(model, schema: Type[BaseModel]) -> Select:
+    """
+    Builds a column-only select of the model's columns named like the schema's fields, so rows can
+    be returned in the schema's shape without loading ORM entities or validating them.
+
+    Args:
+        model: SQLAlchemy model to select from.
+        schema: pydantic schema whose fields are all columns on the model.
+
+    Returns:
+        Select: the select statement.
+    """
+    return select(*(getattr(model, name).label(name) for name in schema.model_fields))
+
+
+def project_rows(rows) -> List[Dict]:
+    """ Converts result rows from select_projection into plain dicts """
+    return [dict(row._mapping) for row in rows]
+
+
+def project_entity(entity, schema: Type[BaseModel]) -> Dict:
+    """ Copies the schema's fields off an already loaded ORM entity into a plain dict """
+    return {name: getattr(entity, name) for name in schema.model_fields}
+
+
+def _nested_schema(annotation) -> Union[Type[BaseModel], None]:
+    """ Finds the schema inside annotations like Optional[List[Schema]] """
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        schema = _nested_schema(arg)
+        if schema is not None:
+            return schema
+    return None
+
+
+def loader_options_for(model, schema: Type[BaseModel]) -> List:
+    """
+    Builds selectinload options for exactly the relationships the schema serializes, recursing into
+    nested schemas, so a read never loads relationships its response would throw away.
+
+    Args:
+        model: SQLAlchemy model being queried.
+        schema: pydantic schema the result will be returned as.
+
+    Returns:
+        list: loader options to pass to Select.options.
+    """
+    options = []
+    relationships = inspect(model).relationships
+    for name, field in schema.model_fields.items():
+        if name not in relationships:
+            continue
+        loader = selectinload(getattr(model, name))
+        nested_schema = _nested_schema(field.annotation)
+        if nested_schema is not None:
+            nested_options = loader_options_for(relationships[name].mapper.class_, nested_schema)
+            if nested_options:
+                loader = loader.options(*nested_options)
+        options.append(loader)
+    return options
@@ -0,0 +1,135 @@
+"""
+Rebuilds the personal_records table from session_sets, e.g. after backfilling session_sets or to
+repair records.
+
+    python -m db.rebuild_personal_records --batch-size 100000
+
+Sets are read in id order in batches. Each batch is reduced to the best set per (user, exercise,
+reps) with vectorized NumPy operations and merged into the running best, so memory stays bounded
+by the number of records rather than the number of sets.
+"""
+import argparse
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import delete, insert, select
+
+from db.connection import async_session, engine
+from db.models import PersonalRecord, RoutineSession, SessionSet
+
+COLUMNS = ("user", "exercise", "reps", "weight", "performed_at", "session")
+
+
+def best_per_key(batch: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Keeps the heaviest row per (user, exercise, reps), the earliest one on ties.
+
+    Args:
+        batch (dict): equal length column arrays named like COLUMNS; user is an integer code and
+            performed_at a POSIX timestamp.
+
+    Returns:
+        dict: the same columns holding one row per key.
+    """
+    if len(batch["user"]) == 0:
+        return batch
+    # lexsort sorts by the last key first
+    order = np.lexsort((batch["performed_at"], -batch["weight"], batch["reps"], batch["exercise"], batch["user"]))
+    ordered = {name: column[order] for name, column in batch.items()}
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = ((ordered["user"][1:] != ordered["user"][:-1])
+                 | (ordered["exercise"][1:] != ordered["exercise"][:-1])
+                 | (ordered["reps"][1:] != ordered["reps"][:-1]))
+    return {name: column[first] for name, column in ordered.items()}
+
+
+def _timestamp(value: datetime) -> float:
+    # SQLite hands back naive datetimes for timezone aware columns; they are stored as UTC
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).timestamp()
+
+
+async def compute_personal_records(session_factory, batch_size: int) -> List[Dict]:
+    """
+    Computes every user's personal records from session_sets.
+
+    Args:
+        session_factory: async session factory for the database.
+        batch_size (int): number of sets read and reduced at a time.
+
+    Returns:
+        list: rows for the personal_records table.
+    """
+    user_codes: Dict[uuid.UUID, int] = {}
+    best = {name: np.empty(0, dtype=np.float64 if name in ("weight", "performed_at") else np.int64)
+            for name in COLUMNS}
+    last_id, sets_read = 0, 0
+
+    async with session_factory() as db:
+        while True:
+            result = await db.execute(
+                select(SessionSet.id, RoutineSession.user_id, SessionSet.exercise_id, SessionSet.reps,
+                       SessionSet.weight, SessionSet.performed_at, SessionSet.session_id)
+                .join(RoutineSession, RoutineSession.id == SessionSet.session_id)
+                .where(SessionSet.id > last_id)
+                .where(RoutineSession.user_id.is_not(None))
+                .where(SessionSet.reps > 0)
+                .where(SessionSet.weight > 0)
+                .order_by(SessionSet.id)
+                .limit(batch_size))
+            rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            sets_read += len(rows)
+
+            batch = {
+                "user": np.fromiter((user_codes.setdefault(row.user_id, len(user_codes)) for row in rows),
+                                    dtype=np.int64, count=len(rows)),
+                "exercise": np.fromiter((row.exercise_id for row in rows), dtype=np.int64, count=len(rows)),
+                "reps": np.fromiter((row.reps for row in rows), dtype=np.int64, count=len(rows)),
+                "weight": np.fromiter((row.weight for row in rows), dtype=np.float64, count=len(rows)),
+                "performed_at": np.fromiter((_timestamp(row.performed_at) for row in rows), dtype=np.float64,
+                                            count=len(rows)),
+                "session": np.fromiter((row.session_id for row in rows), dtype=np.int64, count=len(rows)),
+            }
+            batch = best_per_key(batch)
+            best = best_per_key({name: np.concatenate((best[name], batch[name])) for name in COLUMNS})
+            print(f"[rebuild_personal_records] read {sets_read} sets, {len(best['user'])} records so far")
+
+    users = list(user_codes)
+    return [{
+        "user_id": users[user],
+        "exercise_id": int(exercise),
+        "reps": int(reps),
+        "weight": float(weight),
+        "session_id": int(session),
+        "achieved_at": datetime.fromtimestamp(performed_at, tz=timezone.utc),
+    } for user, exercise, reps, weight, performed_at, session in zip(*(best[name].tolist() for name in COLUMNS))]
+
+
+async def rebuild_personal_records(session_factory, batch_size: int) -> int:
+    """ Replaces the personal_records table with records computed from session_sets """
+    records = await compute_personal_records(session_factory, batch_size)
+    async with session_factory() as db:
+        await db.execute(delete(PersonalRecord))
+        for start in range(0, len(records), 1000):
+            await db.execute(insert(PersonalRecord.__table__), records[start:start + 1000])
+        await db.commit()
+    return len(records)
+
+
+async def main(args):
+    try:
+        count = await rebuild_personal_records(async_session, args.batch_size)
+        print(f"[rebuild_personal_records] wrote {count} records")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=100000, help="sets reduced per batch")
+    asyncio.run(main(parser.parse_args()))
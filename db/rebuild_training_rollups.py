@@ -0,0 +1,56 @@
+"""
+Rebuilds the user and category training rollups from routine_sessions, e.g. after deploying the
+rollup tables onto an existing database or after exercises moved to another category.
+
+    python -m db.rebuild_training_rollups --batch-size 5000
+
+Sessions are read in id order in batches and added to the rollups with the same upserts session
+writes use. The whole rebuild is one transaction, so readers never see half-built rollups.
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import delete, select
+
+from db.connection import async_session, engine
+from db.models import CategoryTrainingRollup, RoutineSession, UserTrainingRollup
+from db.models.training_rollup import apply_session_rollups, rollup_source
+
+
+async def rebuild_training_rollups(session_factory, batch_size: int) -> int:
+    """ Replaces the training rollups with totals computed from every session that has a user """
+    last_id, sessions_read = 0, 0
+    async with session_factory() as db:
+        await db.execute(delete(UserTrainingRollup))
+        await db.execute(delete(CategoryTrainingRollup))
+        while True:
+            result = await db.execute(
+                select(RoutineSession.id, RoutineSession.user_id, RoutineSession.start_time,
+                       RoutineSession.end_time, RoutineSession.breakdown)
+                .where(RoutineSession.id > last_id)
+                .where(RoutineSession.user_id.is_not(None))
+                .order_by(RoutineSession.id)
+                .limit(batch_size))
+            rows = result.all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            sessions_read += len(rows)
+            await apply_session_rollups(db, [rollup_source(*row[1:]) for row in rows])
+            print(f"[rebuild_training_rollups] rolled up {sessions_read} sessions")
+        await db.commit()
+    return sessions_read
+
+
+async def main(args):
+    try:
+        count = await rebuild_training_rollups(async_session, args.batch_size)
+        print(f"[rebuild_training_rollups] rolled up {count} sessions in total")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-size", type=int, default=5000, help="sessions read per batch")
+    asyncio.run(main(parser.parse_args()))
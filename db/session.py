@@ -1,23 +1,4 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from core.config import settings
+from sqlalchemy.orm import declarative_base
 
-# Create the SQLAlchemy engine
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Declarative base shared by every model. Engines and sessions are created in db/connection.py.
 Base = declarative_base()
-
-
-def get_db():
-    """
-    Creates a db session.
-    
-    Returns:
-        bool: a db session and closes it once we leave scope.
-    """
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
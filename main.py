@@ -1,29 +1,71 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api.v1 import user_router, category_router, exercise_router
 from api.v1.routine_template_router import routine_template_router
+from api.v1.routine_session_router import routine_session_router
+from api.v1.sync_routes import sync_router
+from api.v1.catalog_routes import catalog_router
+from api.v1.auth_routes import auth_router
+from api.v1.internal_routes import internal_router
+from core import settings
+from core.utility.admission import AdmissionControlMiddleware, admission_controller
+from core.utility.password_hashing import password_hasher
+from db.catalog_snapshot import catalog_snapshot
+from db.connection import async_session, engine
+from db.instrumentation import SqlInstrumentationMiddleware, install_sql_instrumentation
+from db.models.exercise import build_exercise_search_index
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """ Warms the in-process indexes and the catalog snapshot before serving requests """
+    async with async_session() as db:
+        await build_exercise_search_index(db)
+    await catalog_snapshot.current()
+    yield
+    password_hasher.shutdown()
+    await engine.dispose()
+
 
 app = FastAPI(
     title="LiftMoreAPI", 
-    description="API specification for the LiftMore app.")
+    description="API specification for the LiftMore app.",
+    lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",
     "http://10.8.62.184"
 ]
 
+if settings.ADMISSION_CONTROL:
+    # Added before CORS so rejected requests still carry CORS headers
+    app.add_middleware(AdmissionControlMiddleware, controller=admission_controller)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-DB-Query-Count", "X-DB-Slowest-Ms", "Retry-After"],
 )
 
+if settings.SQL_INSTRUMENTATION:
+    install_sql_instrumentation(engine)
+    app.add_middleware(SqlInstrumentationMiddleware)
+
 app.include_router(user_router, prefix="/api/v1")
 app.include_router(category_router, prefix="/api/v1")
 app.include_router(exercise_router, prefix="/api/v1")
 app.include_router(routine_template_router, prefix="/api/v1")
+app.include_router(routine_session_router, prefix="/api/v1")
+app.include_router(sync_router, prefix="/api/v1")
+app.include_router(catalog_router, prefix="/api/v1")
+app.include_router(auth_router, prefix="/api/v1")
+if settings.INTERNAL_ROUTES_ENABLED:
+    app.include_router(internal_router, prefix="/internal")
 
 @app.get("/healthCheck")
 async def root():
@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+# The settings are read when the app modules load, so the test database is configured first
+DATABASE_PATH = os.path.join(tempfile.gettempdir(), "liftmore_test.sqlite")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DATABASE_PATH}"
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ["RATE_LIMIT_PER_SECOND"] = "0"
+os.environ["PASSWORD_HASH_ROUNDS"] = "4"
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+
+import main
+from core.utility.auth import verified_tokens
+from db.catalog_snapshot import catalog_snapshot
+from db.connection import async_session, engine
+from db.models.category import category_cache
+from db.models.exercise import exercise_search_index
+from db.session import Base
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+def reset_process_state():
+    """ Empties the per-worker caches, which would otherwise outlive the database they were filled from """
+    for cache in (category_cache, catalog_snapshot, exercise_search_index):
+        cache.__init__()
+    verified_tokens.__init__(verified_tokens.max_size)
+
+
+@pytest.fixture
+async def client():
+    await engine.dispose()
+    sync_engine = create_engine(f"sqlite:///{DATABASE_PATH}")
+    Base.metadata.drop_all(sync_engine)
+    Base.metadata.create_all(sync_engine)
+    sync_engine.dispose()
+    reset_process_state()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as http_client:
+        yield http_client
+    await engine.dispose()
+
+
+@pytest.fixture
+async def db(client):
+    async with async_session() as session:
+        yield session
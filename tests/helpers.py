@@ -0,0 +1,52 @@
+""" Builders for the rows most tests need, going through the API like a client would """
+
+API = "/api/v1"
+
+
+async def create_user(client, name: str, phone_number: str = None) -> str:
+    response = await client.post(f"{API}/users", json={
+        "first_name": name, "last_name": "Test", "username": name, "phone_number": phone_number or name,
+        "email": f"{name}@example.com", "password": "password"})
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+async def create_catalog(client, exercises=("Bench Press", "Squat")):
+    """ One category with the given exercises; returns the exercise ids """
+    response = await client.post(f"{API}/category", json={"name": "Strength", "description": "", "type": "exercise"})
+    category_id = response.json()["id"]
+    ids = []
+    for name in exercises:
+        response = await client.post(f"{API}/exercise", json={"name": name, "description": "", "category_id": category_id})
+        ids.append(response.json()["id"])
+    return ids
+
+
+async def create_template(client, exercise_ids, user_id: str = None, name: str = "Template") -> int:
+    response = await client.post(f"{API}/routineTemplates", json={
+        "name": name, "sets": {}, "exercises": list(exercise_ids), "user_id": user_id})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def session_body(template_id, user_id, breakdown, day: int = 1, month: int = 1) -> dict:
+    return {
+        "start_time": f"2026-{month:02d}-{day:02d}T10:00:00+00:00",
+        "end_time": f"2026-{month:02d}-{day:02d}T11:00:00+00:00",
+        "routine_template_id": template_id,
+        "user_id": user_id,
+        "breakdown": breakdown,
+    }
+
+
+async def records(client, user_id) -> dict:
+    """ The user's personal records as {(exercise id, reps): weight} """
+    return {(exercise["exercise_id"], record["reps"]): record["weight"]
+            for exercise in (await client.get(f"{API}/users/{user_id}/records")).json()
+            for record in exercise["records"]}
+
+
+async def monthly_stats(client, user_id) -> list:
+    """ (sessions, sets, tonnage) per month since 2026 """
+    response = await client.get(f"{API}/users/{user_id}/stats", params={"granularity": "month", "from": "2026-01-01"})
+    return [(bucket["sessions"], bucket["sets"], bucket["tonnage"]) for bucket in response.json()]
@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import text
+
+from core import settings
+from tests.helpers import API
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_revalidated_category_list_is_answered_without_a_query(client):
+    await client.post(f"{API}/category", json={"name": "Strength", "description": "", "type": "exercise"})
+    response = await client.get(f"{API}/categories/all")
+    etag = response.headers["etag"]
+    assert [category["name"] for category in response.json()] == ["Strength"]
+
+    response = await client.get(f"{API}/categories/all", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["x-db-query-count"] == "0"
+
+    response = await client.get(f"{API}/categories/all")
+    assert response.status_code == 200
+    assert response.headers["x-db-query-count"] == "0"
+
+    await client.post(f"{API}/category", json={"name": "Cardio", "description": "", "type": "exercise"})
+    response = await client.get(f"{API}/categories/all", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert [category["name"] for category in response.json()] == ["Cardio", "Strength"]
+
+
+async def test_category_writes_from_other_workers_are_noticed(client, db, monkeypatch):
+    await client.post(f"{API}/category", json={"name": "Strength", "description": "", "type": "exercise"})
+    etag = (await client.get(f"{API}/categories/all")).headers["etag"]
+
+    # Another worker renames the category, which this worker's cache does not hear about
+    await db.execute(text("UPDATE categories SET name = 'Power' WHERE id = 1"))
+    await db.execute(text("UPDATE table_versions SET version = version + 1 WHERE name = 'categories'"))
+    await db.commit()
+    assert (await client.get(f"{API}/categories/all", headers={"If-None-Match": etag})).status_code == 304
+
+    monkeypatch.setattr(settings, "CATEGORY_CACHE_CHECK_SECONDS", 0)
+    response = await client.get(f"{API}/categories/all", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [category["name"] for category in response.json()] == ["Power"]
+    assert (await client.get(f"{API}/category/1")).json()["name"] == "Power"
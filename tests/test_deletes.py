@@ -0,0 +1,57 @@
+import pytest
+
+from tests.helpers import API, create_catalog, create_template, create_user, monthly_stats, records, session_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_deleting_a_template_accounts_for_its_sessions(client):
+    user = await create_user(client, "lifter")
+    bench, squat = await create_catalog(client)
+    kept_template, deleted_template = await create_template(client, [bench]), await create_template(client, [bench, squat])
+    await client.post(f"{API}/routineSessions", json=session_body(
+        kept_template, user, {str(bench): [{"reps": 5, "weight": 100}]}, day=1))
+    response = await client.post(f"{API}/routineSessions", json=session_body(
+        deleted_template, user, {str(bench): [{"reps": 5, "weight": 120}], str(squat): [{"reps": 3, "weight": 150}]}, day=2))
+    deleted_session = response.json()["id"]
+    token = (await client.get(f"{API}/sync", params={"user_id": user})).json()["token"]
+    assert await records(client, user) == {(bench, 5): 120.0, (squat, 3): 150.0}
+
+    response = await client.delete(f"{API}/routineTemplates", params={"ids": f"{deleted_template},999"})
+    assert response.json() == {"deleted": [deleted_template], "missing": [999]}
+
+    assert await records(client, user) == {(bench, 5): 100.0}
+    assert await monthly_stats(client, user) == [(1, 1, 500.0)]
+    changes = (await client.get(f"{API}/sync", params={"user_id": user, "since": token})).json()
+    assert changes["deleted"]["routine_templates"] == [deleted_template]
+    assert changes["deleted"]["routine_sessions"] == [deleted_session]
+
+
+async def test_deleting_a_session_recomputes_records_and_rollups(client):
+    user = await create_user(client, "lifter")
+    bench, _ = await create_catalog(client)
+    template = await create_template(client, [bench])
+    for day, weight in ((1, 100), (2, 110)):
+        response = await client.post(f"{API}/routineSessions", json=session_body(
+            template, user, {str(bench): [{"reps": 5, "weight": weight}]}, day=day))
+    heaviest = response.json()["id"]
+
+    assert (await client.delete(f"{API}/routineSessions/{heaviest}")).json() is True
+    assert (await client.delete(f"{API}/routineSessions/{heaviest}")).json() is False
+    assert await records(client, user) == {(bench, 5): 100.0}
+    assert await monthly_stats(client, user) == [(1, 1, 500.0)]
+
+
+async def test_deleting_exercises_marks_their_templates_changed(client):
+    user = await create_user(client, "lifter")
+    bench, squat = await create_catalog(client)
+    template = await create_template(client, [bench, squat])
+    token = (await client.get(f"{API}/sync", params={"user_id": user})).json()["token"]
+
+    response = await client.delete(f"{API}/exercises", params={"ids": str(squat)})
+    assert response.json()["deleted"] == [squat]
+
+    changes = (await client.get(f"{API}/sync", params={"user_id": user, "since": token})).json()
+    assert changes["deleted"]["exercises"] == [squat]
+    assert [(changed["id"], [exercise["id"] for exercise in changed["exercises"]])
+            for changed in changes["routine_templates"]] == [(template, [bench])]
@@ -0,0 +1,47 @@
+import pytest
+
+from tests.helpers import API, create_catalog
+
+pytestmark = pytest.mark.anyio
+
+
+async def pages(client, **params):
+    """ Follows next_cursor from the first cursor page to the last; returns the pages' names """
+    names, cursor = [], ""
+    while cursor is not None:
+        page = (await client.get(f"{API}/exercises/all", params={**params, "cursor": cursor})).json()
+        names.append([exercise["name"] for exercise in page["items"]])
+        cursor = page["next_cursor"]
+    return names
+
+
+async def test_cursor_pages_cover_every_exercise_once(client):
+    await create_catalog(client, exercises=("Squat", "Bench Press", "Deadlift", "Row", "Bench Press"))
+    other_category = (await client.post(f"{API}/category", json={"name": "Cardio", "description": "", "type": "exercise"})).json()["id"]
+    await client.post(f"{API}/exercise", json={"name": "Assault Bike", "description": "", "category_id": other_category})
+
+    assert await pages(client, page_size=2) == [
+        ["Assault Bike", "Bench Press"], ["Bench Press", "Deadlift"], ["Row", "Squat"]]
+    assert await pages(client, page_size=10, category_id=other_category) == [["Assault Bike"]]
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "W1tdLHt9XQ", "WyJCZW5jaCBQcmVzcyJd"])
+async def test_malformed_cursor_is_a_400(client, cursor):
+    response = await client.get(f"{API}/exercises/all", params={"cursor": cursor})
+    assert response.status_code == 400
+
+
+async def test_exercise_list_revalidates_until_an_exercise_changes(client):
+    bench, _ = await create_catalog(client)
+    response = await client.get(f"{API}/exercises/all", params={"cursor": ""})
+    etag = response.headers["etag"]
+
+    for params in ({"cursor": ""}, {"page": 1}):
+        response = await client.get(f"{API}/exercises/all", params=params, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag and response.content == b""
+
+    await client.delete(f"{API}/exercises", params={"ids": str(bench)})
+    response = await client.get(f"{API}/exercises/all", params={"cursor": ""}, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
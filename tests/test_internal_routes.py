@@ -0,0 +1,8 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_internal_routes_are_not_mounted_by_default(client):
+    for path in ("/internal/poolStats", "/internal/sqlLog", "/internal/tokenCacheStats", "/internal/admissionStats"):
+        assert (await client.get(path)).status_code == 404
@@ -0,0 +1,124 @@
+from datetime import datetime
+
+import pytest
+
+from db.models.session_set import sets_from_breakdown
+from tests.helpers import API, create_catalog, create_template, create_user, monthly_stats, records, session_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_sessions_cannot_use_another_users_template(client):
+    owner, other = await create_user(client, "owner"), await create_user(client, "other")
+    bench, _ = await create_catalog(client)
+    private_template = await create_template(client, [bench], user_id=owner)
+    body = session_body(private_template, other, {str(bench): [{"reps": 5, "weight": 100}]})
+
+    response = await client.post(f"{API}/routineSessions", json=body)
+    assert response.status_code == 422
+    assert "routine_template_id" in response.json()
+
+    response = await client.post(f"{API}/routineSessions/batch", json=[body])
+    assert response.json()["inserted"] == 0
+
+    response = await client.post(f"{API}/routineSessions", json={**body, "user_id": owner})
+    assert response.status_code == 200
+
+
+async def test_deleting_a_user_keeps_other_users_sessions(client):
+    owner, other = await create_user(client, "owner"), await create_user(client, "other")
+    bench, _ = await create_catalog(client)
+    private_template = await create_template(client, [bench], user_id=owner)
+    shared_template = await create_template(client, [bench])
+    breakdown = {str(bench): [{"reps": 5, "weight": 100}]}
+    await client.post(f"{API}/routineSessions", json=session_body(private_template, owner, breakdown))
+    response = await client.post(f"{API}/routineSessions", json=session_body(shared_template, other, breakdown))
+    other_session = response.json()["id"]
+    records_before = (await client.get(f"{API}/users/{other}/records")).json()
+    stats_before = (await client.get(f"{API}/users/{other}/stats", params={"granularity": "month", "from": "2026-01-01"})).json()
+
+    assert (await client.delete(f"{API}/users/{owner}")).json() is True
+
+    assert (await client.get(f"{API}/routineTemplates/{private_template}")).json() == {}
+    assert (await client.get(f"{API}/routineSessions/{other_session}")).json()["user_id"] == other
+    assert (await client.get(f"{API}/users/{other}/records")).json() == records_before
+    assert (await client.get(f"{API}/users/{other}/stats",
+                             params={"granularity": "month", "from": "2026-01-01"})).json() == stats_before
+
+
+async def test_fractional_reps_are_rejected(client):
+    user = await create_user(client, "lifter")
+    bench, _ = await create_catalog(client)
+    template = await create_template(client, [bench])
+
+    response = await client.post(f"{API}/routineSessions", json=session_body(
+        template, user, {str(bench): [{"reps": 5, "weight": 100}, {"reps": 5.9, "weight": 100}]}))
+    assert response.status_code == 422
+    assert list(response.json()) == [f"exercise-{bench}-set-1"]
+
+
+def test_set_rows_skip_values_that_are_not_finite_numbers():
+    rows = sets_from_breakdown(1, {"1": [{"reps": "5.9", "weight": "1e999"}, {"reps": 5.0, "weight": "100.5", "rpe": "nan"}]},
+                               datetime(2026, 1, 1))
+    assert [(row["reps"], row["weight"], row["rpe"]) for row in rows] == [(None, None, None), (5, 100.5, None)]
+
+
+async def test_user_history_pages_by_before(client):
+    user, other = await create_user(client, "lifter"), await create_user(client, "other")
+    bench, _ = await create_catalog(client)
+    template = await create_template(client, [bench])
+    created = []
+    for day in (1, 2, 2, 3):
+        response = await client.post(f"{API}/routineSessions", json=session_body(
+            template, user, {str(bench): [{"reps": 5, "weight": 100}]}, day=day))
+        created.append(response.json()["id"])
+    await client.post(f"{API}/routineSessions", json=session_body(template, other, {}, day=4))
+
+    seen, before = [], None
+    while True:
+        params = {"limit": 2, **({"before": before} if before else {})}
+        page = (await client.get(f"{API}/users/{user}/sessions", params=params)).json()
+        seen.extend(session["id"] for session in page["sessions"])
+        before = page["next_before"]
+        if before is None:
+            break
+    assert seen == [created[3], created[2], created[1], created[0]]
+
+    response = await client.get(f"{API}/users/{user}/sessions", params={"before": "garbage"})
+    assert response.status_code == 400
+
+
+async def test_updating_a_session_recomputes_records(client):
+    user = await create_user(client, "lifter")
+    bench, squat = await create_catalog(client)
+    template = await create_template(client, [bench, squat])
+    await client.post(f"{API}/routineSessions", json=session_body(
+        template, user, {str(bench): [{"reps": 5, "weight": 100}]}, day=1))
+    response = await client.post(f"{API}/routineSessions", json=session_body(
+        template, user, {str(bench): [{"reps": 5, "weight": 120}]}, day=2))
+    session_id = response.json()["id"]
+    assert await records(client, user) == {(bench, 5): 120.0}
+
+    await client.put(f"{API}/routineSessions/{session_id}", json=session_body(
+        template, user, {str(bench): [{"reps": 5, "weight": 90}]}, day=2))
+    assert await records(client, user) == {(bench, 5): 100.0}
+
+    await client.put(f"{API}/routineSessions/{session_id}", json=session_body(
+        template, user, {str(squat): [{"reps": 3, "weight": 150}]}, day=2))
+    assert await records(client, user) == {(bench, 5): 100.0, (squat, 3): 150.0}
+
+
+async def test_updating_a_session_moves_its_rollups(client):
+    user = await create_user(client, "lifter")
+    bench, squat = await create_catalog(client)
+    template = await create_template(client, [bench, squat])
+    await client.post(f"{API}/routineSessions", json=session_body(
+        template, user, {str(bench): [{"reps": 5, "weight": 100}]}, day=1))
+    response = await client.post(f"{API}/routineSessions", json=session_body(
+        template, user, {str(bench): [{"reps": 5, "weight": 100}, {"reps": 5, "weight": 100}]}, day=2))
+    session_id = response.json()["id"]
+    assert await monthly_stats(client, user) == [(2, 3, 1500.0)]
+
+    await client.put(f"{API}/routineSessions/{session_id}", json=session_body(
+        template, user, {str(squat): [{"reps": 3, "weight": 150}]}, day=2, month=2))
+    assert await monthly_stats(client, user) == [(1, 1, 500.0), (1, 1, 450.0)]
@@ -0,0 +1,62 @@
+import pytest
+
+from tests.helpers import API, create_catalog, create_template, create_user, session_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_template_with_a_missing_exercise_is_not_created(client):
+    bench, squat = await create_catalog(client)
+    token = (await client.get(f"{API}/sync")).json()["token"]
+
+    response = await client.post(f"{API}/routineTemplates", json={
+        "name": "Template", "sets": {}, "exercises": [bench, 999, squat], "user_id": None})
+    assert response.json() == {"exercise-999": "Exercise (id#999) does not exist."}
+    assert (await client.get(f"{API}/sync", params={"since": token})).json()["routine_templates"] == []
+
+    response = await client.post(f"{API}/routineTemplates", json={
+        "name": "Template", "sets": {}, "exercises": [squat, bench, squat], "user_id": None})
+    assert [exercise["id"] for exercise in response.json()["exercises"]] == [squat, bench]
+    template = (await client.get(f"{API}/routineTemplates/{response.json()['id']}")).json()
+    assert sorted(exercise["id"] for exercise in template["exercises"]) == sorted([bench, squat])
+
+
+async def test_template_sessions_page_by_cursor(client):
+    user = await create_user(client, "lifter")
+    bench, _ = await create_catalog(client)
+    template = await create_template(client, [bench])
+    created = []
+    for day in (3, 1, 2, 2):
+        response = await client.post(f"{API}/routineSessions", json=session_body(
+            template, user, {str(bench): [{"reps": 5, "weight": 100}]}, day=day))
+        created.append(response.json()["id"])
+
+    seen, cursor = [], None
+    while True:
+        params = {"include": "sessions", "sessions_limit": 3, **({"sessions_cursor": cursor} if cursor else {})}
+        body = (await client.get(f"{API}/routineTemplates/{template}", params=params)).json()
+        seen.append([session["id"] for session in body["routine_sessions"]])
+        cursor = body["sessions_next_cursor"]
+        if cursor is None:
+            break
+    # Newest first, ties on start_time broken by the higher id
+    assert [session_id for page in seen for session_id in page] == [created[0], created[3], created[2], created[1]]
+
+    response = await client.get(f"{API}/routineTemplates/{template}", params={"include": "sessions", "sessions_cursor": "garbage"})
+    assert response.status_code == 400
+
+
+async def test_template_revalidates_until_it_or_the_catalog_changes(client):
+    bench, squat = await create_catalog(client)
+    template = await create_template(client, [bench, squat])
+    etag = (await client.get(f"{API}/routineTemplates/{template}")).headers["etag"]
+
+    response = await client.get(f"{API}/routineTemplates/{template}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    await client.delete(f"{API}/exercises", params={"ids": str(squat)})
+    response = await client.get(f"{API}/routineTemplates/{template}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [exercise["id"] for exercise in response.json()["exercises"]] == [bench]
+    response = await client.get(f"{API}/routineTemplates/{template}", headers={"If-None-Match": response.headers["etag"]})
+    assert response.status_code == 304
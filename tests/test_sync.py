@@ -0,0 +1,52 @@
+import pytest
+
+from core.utility.pagination import encode_cursor
+from tests.helpers import API, create_catalog, create_template, create_user, session_body
+
+pytestmark = pytest.mark.anyio
+
+
+async def sync(client, user_id, token=None):
+    params = {key: value for key, value in (("user_id", user_id), ("since", token)) if value is not None}
+    return (await client.get(f"{API}/sync", params=params)).json()
+
+
+async def test_session_changes_and_tombstones_reach_only_their_user(client):
+    user, other = await create_user(client, "lifter"), await create_user(client, "other")
+    bench, _ = await create_catalog(client)
+    template = await create_template(client, [bench])
+    private_template = await create_template(client, [bench], user_id=other)
+    kept = (await client.post(f"{API}/routineSessions", json=session_body(template, user, {}, day=1))).json()["id"]
+    deleted = (await client.post(f"{API}/routineSessions", json=session_body(template, user, {}, day=2))).json()["id"]
+    others = (await client.post(f"{API}/routineSessions", json=session_body(template, other, {}, day=3))).json()["id"]
+
+    full = await sync(client, user)
+    other_token, anonymous_token = (await sync(client, other))["token"], (await sync(client, None))["token"]
+    assert sorted(session["id"] for session in full["routine_sessions"]) == [kept, deleted]
+    assert [changed["id"] for changed in full["routine_templates"]] == [template]
+    assert len(full["exercises"]) == 2 and len(full["categories"]) == 1
+    unchanged = await sync(client, user, full["token"])
+    assert unchanged["routine_sessions"] == [] and unchanged["exercises"] == []
+    assert unchanged["token"] == full["token"]
+
+    await client.put(f"{API}/routineSessions/{kept}", json=session_body(template, user, {str(bench): [{"reps": 1}]}, day=1))
+    await client.delete(f"{API}/routineSessions/{deleted}")
+    await client.delete(f"{API}/routineSessions/{others}")
+    await client.delete(f"{API}/routineTemplates/{private_template}")
+
+    changes = await sync(client, user, full["token"])
+    assert [session["id"] for session in changes["routine_sessions"]] == [kept]
+    assert changes["deleted"]["routine_sessions"] == [deleted]
+    assert changes["deleted"]["routine_templates"] == []
+    other_changes = await sync(client, other, other_token)
+    assert other_changes["deleted"]["routine_sessions"] == [others]
+    assert other_changes["deleted"]["routine_templates"] == [private_template]
+    assert (await sync(client, None, anonymous_token))["deleted"] == {
+        "categories": [], "exercises": [], "routine_templates": [], "routine_sessions": []}
+
+
+# Not base64 JSON, too few versions, a negative version, and a version the server has not reached
+@pytest.mark.parametrize("token", ["garbage", encode_cursor(1), encode_cursor(-1, 0, 0, 0), encode_cursor(999, 0, 0, 0)])
+async def test_invalid_sync_token_is_a_400(client, token):
+    response = await client.get(f"{API}/sync", params={"since": token})
+    assert response.status_code == 400
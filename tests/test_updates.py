@@ -0,0 +1,41 @@
+import pytest
+
+from core.schemas.common import CreateUpdateCategory, CreateUpdateExercise
+from db.models.category import update_category
+from db.models.exercise import update_exercise
+from tests.helpers import API, create_catalog
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_updating_an_exercise_reaches_search_and_sync(client, db):
+    bench, _ = await create_catalog(client)
+    category_id = (await client.get(f"{API}/exercise/{bench}")).json()["category_id"]
+    token = (await client.get(f"{API}/sync")).json()["token"]
+
+    updated = await update_exercise(db, bench, CreateUpdateExercise(name="Incline Press", description="", category_id=category_id))
+    assert updated == {"id": bench, "name": "Incline Press", "description": "", "category_id": category_id}
+    assert await update_exercise(db, 999, CreateUpdateExercise(name="Missing", description="", category_id=category_id)) is None
+
+    assert [exercise["id"] for exercise in (await client.get(f"{API}/exercise/search", params={"query": "incline"})).json()] == [bench]
+    assert (await client.get(f"{API}/exercise/search", params={"query": "bench"})).json() == []
+    changes = (await client.get(f"{API}/sync", params={"since": token})).json()
+    assert [exercise["name"] for exercise in changes["exercises"]] == ["Incline Press"]
+
+
+async def test_updating_a_category_refreshes_the_cache_and_sync(client, db):
+    await create_catalog(client)
+    response = await client.get(f"{API}/categories/all")
+    category_id, etag = response.json()[0]["id"], response.headers["etag"]
+    token = (await client.get(f"{API}/sync")).json()["token"]
+
+    updated = await update_category(db, category_id, CreateUpdateCategory(name="Power", description="", type="exercise"))
+    assert updated == {"id": category_id, "name": "Power", "description": "", "type": "exercise"}
+    assert await update_category(db, 999, CreateUpdateCategory(name="Missing", description="", type="exercise")) is None
+
+    response = await client.get(f"{API}/categories/all", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert [category["name"] for category in response.json()] == ["Power"]
+    assert (await client.get(f"{API}/category/{category_id}")).json()["name"] == "Power"
+    changes = (await client.get(f"{API}/sync", params={"since": token})).json()
+    assert [category["name"] for category in changes["categories"]] == ["Power"]